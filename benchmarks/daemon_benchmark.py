@@ -0,0 +1,97 @@
+#  Copyright (c) Eric Draken, 2021.
+"""
+Drive CPUDaemon._run against the FadeStick emulator and report ticks per
+second and reconnects. With several sticks, only the first one is slowed
+and unplugged, so the others show whether it holds them back. Run from
+the project root:
+
+    python -m benchmarks.daemon_benchmark --seconds 5 --period-ms 10 --latency-ms 1 --sticks 4
+"""
+import argparse
+import logging
+import signal
+import threading
+import time
+from typing import Optional
+
+from core.CPUDaemon import CPUDaemon
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+from core.emulator.UeventEmulator import EmulatedUeventSource
+
+
+def run(seconds: float, period_ms: int, latency_ms: float,
+        failure_rate: float, unplug_every_s: float, sticks: int = 1,
+        psi: Optional[str] = None, adaptive: bool = False, record: Optional[str] = None,
+        hotplug: bool = False) -> dict:
+    device = EmulatedFadeStick(latency_ms=latency_ms, failure_rate=failure_rate, seed=1)
+    others = [EmulatedFadeStick(serial=f"BS{n:06d}-1.5") for n in range(1, sticks)]
+    # Without uevents the daemon rescans every period while the stick is out
+    backend = EmulatorBackend([device, *others], uevents=EmulatedUeventSource() if hotplug else None)
+    daemon = CPUDaemon(backend=backend, period_ms=period_ms, retry_s=period_ms / 1000.0,
+                       psi=psi, adaptive=adaptive, record_path=record)
+
+    thread = threading.Thread(target=daemon._run, daemon=True)
+    start = time.monotonic()
+    cpu_start = time.process_time()
+    thread.start()
+
+    deadline = start + seconds
+    next_unplug = start + unplug_every_s if unplug_every_s else None
+    while time.monotonic() < deadline:
+        if next_unplug and time.monotonic() >= next_unplug:
+            backend.detach(device.serial_number)
+            time.sleep(period_ms / 1000.0)
+            backend.attach(device)
+            next_unplug += unplug_every_s
+        time.sleep(0.01)
+
+    daemon._end(signal.SIGINT)
+    thread.join()
+    elapsed = time.monotonic() - start
+    cpu_s = time.process_time() - cpu_start
+    phases = {f"{name}_p99_ms": round(h.quantile(0.99) * 1000.0, 3)
+              for name, h in daemon._stats.phases.items()}
+    return {
+        "seconds": round(elapsed, 3),
+        "ticks": daemon._ticks,
+        "ticks_per_second": round(daemon._ticks / elapsed, 2),
+        "reconnects": daemon._sticks.connects - sticks,
+        "suppressed": daemon._sticks.suppressed,
+        "missed_deadlines": daemon._scheduler.missed,
+        "period_ms": daemon._period_ms,
+        "adaptations": daemon._adaptations(),
+        "transfers": device.transfers,
+        "injected_failures": device.failures,
+        "other_transfers_min": min((d.transfers for d in others), default=0),
+        "errors": daemon._errors(),
+        "self_cpu_percent": round(100.0 * cpu_s / elapsed, 3),
+        **phases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--period-ms", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--unplug-every-s", type=float, default=0.0)
+    parser.add_argument("--sticks", type=int, default=1)
+    parser.add_argument("--adaptive", action="store_true", help="Stretch the period while load is stable")
+    parser.add_argument("--psi", choices=["some", "full"], help="Sleep on PSI triggers while quiet")
+    parser.add_argument("--record", metavar="PATH", help="Record every tick to this ring file")
+    parser.add_argument("--hotplug", action="store_true", help="Wait for emulated uevents while unplugged")
+    args = parser.parse_args()
+
+    # Keep syslog out of the measurement
+    logging.disable(logging.CRITICAL)
+
+    results = run(args.seconds, args.period_ms, args.latency_ms,
+                  args.failure_rate, args.unplug_every_s, args.sticks, args.psi, args.adaptive, args.record,
+                  args.hotplug)
+    for k, v in results.items():
+        print(f"{k:>20}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#  Copyright (c) Eric Draken, 2021.
+"""
+Time and allocations per call on the per-tick hot path: RGB, RangeInt,
+Pattern.addColorAndDuration() and setColor(). Run from the project root:
+
+    python -m benchmarks.hotpath_benchmark --iterations 200000
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable, NamedTuple
+
+from benchmarks.pattern_benchmark import PyUSBLikeDevice
+from core.FadeStick import FadeStick
+from core.FadeStickBase import FadeStickBase
+from core.pattern.Pattern import ColorDuration, Pattern
+from exceptions.FadeStickColorException import FadeStickColorException
+from exceptions.NumberExceptions import RangeIntException
+from utils.Types import RGB, RangeInt, checkRange
+
+
+class LegacyRGB(NamedTuple("RGB", [("red", int), ("green", int), ("blue", int)])):
+    """RGB before the fast path"""
+
+    def __new__(cls, red, green, blue):
+        if not all([
+            0 <= red <= 255,
+            0 <= green <= 255,
+            0 <= blue <= 255,
+        ]):
+            raise FadeStickColorException("Out of range")
+        # noinspection PyArgumentList
+        return super().__new__(cls, int(red), int(green), int(blue))
+
+
+class LegacyRangeInt(int):
+    """RangeInt before the fast path"""
+
+    def __init__(self, val: int, min: int, max: int, nice_name: str) -> None:
+        self._min: int = min
+        self._max: int = max
+        self._nice_name: str = nice_name
+        self._val = val
+
+    def __new__(cls, *value):
+        _val = int(value[0])
+        _min = int(value[1])
+        _max = int(value[2])
+        _nice_name = str(value[3])
+        if not _min < _max or not _min <= _val <= _max:
+            raise RangeIntException("Out of range")
+        return int.__new__(cls, _val)
+
+
+def measure(fn: Callable[[int], object], iterations: int) -> dict:
+    fn(0)  # Warm up
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+
+    # Allocations still alive after a batch of calls, per call
+    tracemalloc.start()
+    kept = [fn(i) for i in range(1000)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return {"ns_per_call": elapsed / iterations * 1e9, "bytes_per_call": current / 1000}
+
+
+def fill(i: int) -> Pattern:
+    pattern = Pattern()
+    color = RGB(i % 256, 0, 0)
+    for _ in range(Pattern.MAX_BUFFER_SIZE):
+        pattern.addColorAndDuration(color, 16)
+    return pattern
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    fs = FadeStick(FadeStickBase())
+    fs.setDevice(PyUSBLikeDevice())
+    red = RGB(255, 0, 0)
+
+    cases = {
+        "LegacyRGB": lambda i: LegacyRGB(i % 256, 1, 2),
+        "RGB": lambda i: RGB(i % 256, 1, 2),
+        "RGB.trusted": lambda i: RGB.trusted(i % 256, 1, 2),
+        "LegacyRangeInt": lambda i: LegacyRangeInt(i % 2550, 0, 2550, "duration"),
+        "RangeInt": lambda i: RangeInt(i % 2550, 0, 2550, "duration"),
+        "checkRange": lambda i: checkRange(i % 2550, 0, 2550, "duration"),
+        "ColorDuration": lambda i: ColorDuration(red, i % 2550),
+        "ColorDuration.trusted": lambda i: ColorDuration.trusted(red, i % 2550),
+        "setColor(RGB)": lambda i: fs.setColor(red),
+        "_setRGB": lambda i: fs._setRGB(red),
+    }
+    print(f"{'':>24} {'ns/call':>10} {'bytes/call':>11}")
+    for name, fn in cases.items():
+        r = measure(fn, n)
+        print(f"{name:>24} {r['ns_per_call']:>10.1f} {r['bytes_per_call']:>11.1f}")
+
+    r = measure(fill, max(1, n // Pattern.MAX_BUFFER_SIZE))
+    per_entry = r["ns_per_call"] / Pattern.MAX_BUFFER_SIZE
+    print(f"{'addColorAndDuration':>24} {per_entry:>10.1f} {r['bytes_per_call']:>11.1f} (per full pattern)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#  Copyright (c) Eric Draken, 2021.
+"""
+Time and memory per FadeStick.morph(): the list-of-ColorDuration encoding it
+used to have versus the array-backed Pattern. Run from the project root:
+
+    python -m benchmarks.pattern_benchmark --iterations 20000
+"""
+import argparse
+import time
+import tracemalloc
+from math import floor
+from typing import Callable, List
+
+from usb import _interop
+
+from core.FadeStick import FadeStick
+from core.FadeStickBase import FadeStickBase
+from core.pattern.Pattern import ColorDuration, Pattern
+from utils.Colors import RED, GREEN
+from utils.Types import RGB, RangeInt
+
+
+class PyUSBLikeDevice:
+    """Does what pyusb does with the data before it reaches libusb"""
+
+    def is_kernel_driver_active(self, _interface: int) -> bool:
+        return False
+
+    def ctrl_transfer(self, _bmRequestType, _bRequest, _wValue=0, _wIndex=0,
+                      data_or_wLength=None, _timeout=None):
+        return len(_interop.as_array(data_or_wLength))
+
+
+def legacy_morph(device: PyUSBLikeDevice, start_color: RGB, end_color: RGB,
+                 duration: int = 1000, steps: int = Pattern.MAX_BUFFER_SIZE) -> None:
+    """FadeStick.morph() and Pattern encoding before the array-backed Pattern"""
+    duration = RangeInt(duration, 1, FadeStick.MAX_DURATION, "duration")
+    steps = RangeInt(steps, 1, FadeStick.MAX_STEPS, "steps")
+    r_end, g_end, b_end = end_color
+    r_start, g_start, b_start = start_color
+    pattern: List[ColorDuration] = []
+    ms_delay = floor(float(duration) / float(steps))
+    for n in range(0, steps):
+        d = 1.0 * (n + 1) / float(steps)
+        r = (r_start * (1 - d)) + (r_end * d)
+        g = (g_start * (1 - d)) + (g_end * d)
+        b = (b_start * (1 - d)) + (b_end * d)
+        pattern.append(ColorDuration(RGB(int(r), int(g), int(b)), ms_delay))
+
+    data: List[int] = [0] * Pattern.PATTERN_BUFFER_BYTE_LENGTH
+    data[0] = len(pattern)
+    for i, p in enumerate(pattern):
+        data[(i * 4) + 1:(i * 4) + 4] = [int(p.color.red), int(p.color.green), int(p.color.blue),
+                                         round(p.duration / Pattern.DURATION_RESOLUTION)]
+    payload = bytes([20]) + bytes(data[:])
+    device.ctrl_transfer(0x20, 0x9, 20, 0, payload, 5000)
+
+
+def measure(fn: Callable[[int], None], iterations: int) -> dict:
+    fn(0)  # Warm up
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"us_per_morph": elapsed / iterations * 1e6, "peak_bytes": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    device = PyUSBLikeDevice()
+    colors = (RED, GREEN)
+    before = measure(lambda i: legacy_morph(device, colors[i % 2], colors[(i + 1) % 2]),
+                     args.iterations)
+
+    fs = FadeStick(FadeStickBase())
+    fs.setDevice(device)
+    fs.setColor(RED)
+    after = measure(lambda i: fs.morph(colors[i % 2]), args.iterations)
+
+    print(f"{'':>16} {'us/morph':>10} {'peak bytes':>12}")
+    for name, r in (("before", before), ("after", after)):
+        print(f"{name:>16} {r['us_per_morph']:>10.1f} {r['peak_bytes']:>12}")
+
+
+if __name__ == "__main__":
+    main()
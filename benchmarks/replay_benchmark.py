@@ -0,0 +1,255 @@
+#  Copyright (c) Eric Draken, 2021.
+"""
+Replay /proc/stat traces through CPU, scaleToRGB and FadeStick.morph.
+The traces are synthetic, or captured from this machine with --capture.
+Every tick runs against the emulator on a virtual clock, so no live load
+or stick is needed. The benchmark reports:
+- per-stage latency
+- allocations per tick
+- transfers per minute
+- visual lag: from the start of a load change until the stick shows it
+
+Run from the project root:
+
+    python -m benchmarks.replay_benchmark --output results.json
+    python -m benchmarks.replay_benchmark --baseline benchmarks/baselines/replay_benchmark.json
+    python -m benchmarks.replay_benchmark --capture trace.stat --ticks 600 --period-ms 1000
+
+It exits with 1 when a result regresses past the baseline.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from core.CPU import CPU
+from core.ColorChangeFilter import ColorChangeFilter
+from core.FadeStick import FadeStick
+from core.FadeStickUSB import setBackend, findFirstFadeStick
+from core.emulator.ClockEmulator import EmulatedClock
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+from utils.Colors import scaleToRGB, OFF
+
+# Jiffies per second, as USER_HZ on Linux
+USER_HZ = 100
+# How often the virtual clock looks at the LED for visual lag
+LOOK_MS = 10
+# Per-channel distance at which the LED counts as showing a color
+TOLERANCE = 16
+
+# Baseline checks: metric suffix to allowed ratio over the baseline.
+# Timings vary between machines, the rest are deterministic. p99 timings
+# are reported but not checked, as one scheduler hiccup moves them.
+TOLERANCES = {"_us_mean": 3.0, "alloc_bytes_per_tick": 1.25,
+              "transfers_per_minute": 1.05, "visual_lag_ms_mean": 1.05, "visual_lag_ms_p95": 1.05}
+
+
+def statLines(cores: Sequence[List[int]]) -> bytes:
+    """A /proc/stat with the aggregate line and one line per core"""
+    total = [sum(column) for column in zip(*cores)]
+    lines = [b"cpu  " + b" ".join(b"%d" % v for v in total)]
+    lines += [b"cpu%d " % n + b" ".join(b"%d" % v for v in core) for n, core in enumerate(cores)]
+    return b"\n".join(lines) + b"\nintr 0\nctxt 0\n"
+
+
+def synthetic(kind: str, ticks: int, period_ms: int, cores: int = 8, seed: int = 1) -> List[bytes]:
+    """
+    idle: a few percent, sawtooth: 0 - 100% every minute at 1 Hz,
+    bursty: mostly idle with short bursts, 128-core: staggered sawtooths on 128 cores
+    """
+    rng = random.Random(seed)
+    if kind == "128-core":
+        cores = 128
+    jiffies = max(1, period_ms * USER_HZ // 1000)
+    # user nice system idle iowait irq softirq steal guest guest_nice
+    counters = [[0] * 10 for _ in range(cores)]
+    burst = 0
+    trace = [statLines(counters)]
+    for k in range(ticks):
+        if kind == "idle":
+            loads = [0.02 + 0.02 * rng.random() for _ in range(cores)]
+        elif kind == "sawtooth":
+            loads = [(k % 60) / 59.0] * cores
+        elif kind == "bursty":
+            if not burst and rng.random() < 0.05:
+                burst = rng.randint(1, 5)
+            loads = [0.95 if burst else 0.05] * cores
+            burst = max(0, burst - 1)
+        elif kind == "128-core":
+            loads = [((k + c) % 60) / 59.0 for c in range(cores)]
+        else:
+            raise ValueError(f"Unknown trace {kind}")
+        for core, load in zip(counters, loads):
+            busy = round(load * jiffies)
+            core[0] += busy
+            core[3] += jiffies - busy
+        trace.append(statLines(counters))
+    return trace
+
+
+def capture(path: str, ticks: int, period_ms: int) -> None:
+    """Record this machine's /proc/stat, one snapshot per period, blank-line separated"""
+    with open(path, "wb") as out:
+        for k in range(ticks + 1):
+            with open("/proc/stat", "rb") as f:
+                out.write(f.read().rstrip(b"\n") + b"\n\n")
+            if k < ticks:
+                time.sleep(period_ms / 1000.0)
+
+
+def load(path: str) -> List[bytes]:
+    with open(path, "rb") as f:
+        return [s + b"\n" for s in f.read().split(b"\n\n") if s.strip()]
+
+
+def quantile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def replay(trace: List[bytes], period_ms: int, track_allocations: bool = False) -> Dict[str, float]:
+    clock = EmulatedClock()
+    device = EmulatedFadeStick(clock=clock, sleep=clock.sleep)
+    previous_backend = setBackend(EmulatorBackend([device]))
+    try:
+        fs = FadeStick(findFirstFadeStick())
+        fs.setColor(OFF)
+        snapshots: Iterator[bytes] = iter(trace)
+        cpu = CPU(source=lambda: next(snapshots))
+        color_filter = ColorChangeFilter(clock=clock)
+        period_s = period_ms / 1000.0
+
+        cpu.getCPUSample(period_s)  # Primes the counters
+        stages: Dict[str, List[float]] = {"sample": [], "color": [], "transfer": []}
+        allocations: List[int] = []
+        lags: List[float] = []
+        pending = None  # (target, when the load changed)
+        shown_target = OFF
+        transfers_at_start = device.transfers
+
+        for _ in range(len(trace) - 1):
+            if track_allocations:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+            t_sample = time.perf_counter()
+            sample = cpu.getCPUSample(period_s)
+            t_color = time.perf_counter()
+            color = scaleToRGB(sample.utilization)
+            t_transfer = time.perf_counter()
+            if color_filter.shouldSend(color):
+                fs.morph(color, period_ms)
+                color_filter.markSent(color)
+            t_end = time.perf_counter()
+            if track_allocations:
+                _, peak = tracemalloc.get_traced_memory()
+                allocations.append(peak - before)
+            stages["sample"].append(t_color - t_sample)
+            stages["color"].append(t_transfer - t_color)
+            stages["transfer"].append(t_end - t_transfer)
+
+            # The load behind this color started one period ago
+            if max(abs(a - b) for a, b in zip(color, shown_target)) > TOLERANCE:
+                if pending:
+                    lags.append(clock.now - pending[1])
+                pending = (color, clock.now - period_s)
+                shown_target = color
+            # Watch the LED through the coming period
+            for _ in range(period_ms // LOOK_MS):
+                if pending and max(abs(a - b) for a, b in zip(device.shownColor(), pending[0])) <= TOLERANCE:
+                    lags.append(clock.now - pending[1])
+                    pending = None
+                clock.sleep(LOOK_MS / 1000.0)
+        minutes = clock.now / 60.0
+    finally:
+        setBackend(previous_backend)
+
+    results = {"ticks": len(trace) - 1}
+    for name, times in stages.items():
+        results[f"{name}_us_mean"] = round(statistics.fmean(times) * 1e6, 2)
+        results[f"{name}_us_p99"] = round(quantile(times, 0.99) * 1e6, 2)
+    if track_allocations:
+        results["alloc_bytes_per_tick"] = round(statistics.fmean(allocations), 1)
+    results["transfers_per_minute"] = round((device.transfers - transfers_at_start) / minutes, 2)
+    results["visual_lag_ms_mean"] = round(statistics.fmean(lags) * 1000.0, 1) if lags else 0.0
+    results["visual_lag_ms_p95"] = round(quantile(lags, 0.95) * 1000.0, 1)
+    return results
+
+
+def run(traces: Dict[str, List[bytes]], period_ms: int) -> Dict[str, Dict[str, float]]:
+    # Warm up imports and caches so the first trace is not charged for them
+    replay(synthetic("sawtooth", 60, period_ms), period_ms)
+    results = {}
+    for name, trace in traces.items():
+        results[name] = replay(trace, period_ms)
+        # Allocations are measured in a second pass, as tracing slows every stage
+        tracemalloc.start()
+        try:
+            results[name]["alloc_bytes_per_tick"] = replay(trace, period_ms, True)["alloc_bytes_per_tick"]
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                time_tolerance: Optional[float] = None) -> List[str]:
+    found = []
+    for trace, metrics in baseline.items():
+        for metric, expected in metrics.items():
+            tolerance = next((t for suffix, t in TOLERANCES.items() if metric.endswith(suffix)), None)
+            if tolerance is None or trace not in results or metric not in results[trace]:
+                continue
+            if time_tolerance and metric.endswith("_us_mean"):
+                tolerance = time_tolerance
+            actual = results[trace][metric]
+            # Tiny values are noise
+            if actual > max(expected * tolerance, expected + 1.0):
+                found.append(f"{trace} {metric}: {actual} > {expected} x {tolerance}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--period-ms", type=int, default=1000)
+    parser.add_argument("--trace", action="append", default=[], metavar="FILE",
+                        help="Replay a captured trace as well as the synthetic ones")
+    parser.add_argument("--output", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="Fail on regressions against these results")
+    parser.add_argument("--time-tolerance", type=float, help="Allowed slowdown of timings over the baseline")
+    parser.add_argument("--capture", metavar="FILE", help="Capture --ticks snapshots of /proc/stat and exit")
+    args = parser.parse_args()
+
+    if args.capture:
+        capture(args.capture, args.ticks, args.period_ms)
+        return 0
+
+    traces = {kind: synthetic(kind, args.ticks, args.period_ms)
+              for kind in ("idle", "sawtooth", "bursty", "128-core")}
+    traces.update({path: load(path) for path in args.trace})
+    results = run(traces, args.period_ms)
+
+    report = {"python": platform.python_version(), "ticks": args.ticks, "period_ms": args.period_ms,
+              "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f)["results"], args.time_tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+#  Copyright (c) Eric Draken, 2021.
+"""
+Startup time per CLI subcommand: import time, as python -X importtime
+reports it, and wall time from launch to the first line of output. Run
+from the project root, ideally with no daemon running:
+
+    python -m benchmarks.startup_benchmark --runs 10
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Sequence
+
+from main import CLIENT_COMMANDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# "import time: self [us] | cumulative | imported package", top level only
+IMPORT_TIME_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\S.*)$")
+
+
+def importMs(stderr: str) -> float:
+    return sum(int(m.group(1)) for m in map(IMPORT_TIME_RE.match, stderr.splitlines()) if m) / 1000.0
+
+
+def launch(argv: Sequence[str]) -> dict:
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-X", "importtime", *argv], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    proc.stdout.readline()
+    first_output = time.perf_counter() - start
+    _, stderr = proc.communicate(timeout=30)
+    return {"import_ms": importMs(stderr), "first_output_ms": first_output * 1000.0}
+
+
+def measure(argv: Sequence[str], runs: int) -> dict:
+    results: List[dict] = [launch(argv) for _ in range(runs)]
+    return {key: statistics.median(r[key] for r in results) for key in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    cases = {cmd: ["main.py", cmd] for cmd in CLIENT_COMMANDS if cmd not in ("stop", "kill")}
+    cases["set-period"] = ["main.py", "set-period", "1000"]
+    cases["usage"] = ["main.py"]
+    # start and restart daemonize, and stop and kill signal a live daemon,
+    # so time what those import instead of running them
+    cases["start (imports)"] = ["-c", "import main; main.daemon(); print()"]
+    cases["stop (imports)"] = ["-c", "import main; main.client(); print()"]
+
+    print(f"{'':>18} {'import ms':>10} {'first output ms':>16}")
+    for name, argv in cases.items():
+        r = measure(argv, args.runs)
+        print(f"{name:>18} {r['import_ms']:>10.1f} {r['first_output_ms']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
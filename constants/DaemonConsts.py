@@ -0,0 +1,11 @@
+#  Copyright (c) Eric Draken, 2021.
+from typing import Final
+
+APP_NAME: Final = "cpufadestick"
+PID_PATH: Final = f"/tmp/{APP_NAME}.pid"
+SOCKET_PATH: Final = f"/tmp/{APP_NAME}.sock"
+RECORD_PATH: Final = f"/tmp/{APP_NAME}.rec"
+# stop and kill wait this long before a SIGKILL
+KILL_GRACE_S: Final = 5.0
+# Sticks are faded off within this, well inside KILL_GRACE_S
+SHUTDOWN_DEADLINE_S: Final = 3.0
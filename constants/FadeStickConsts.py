@@ -11,3 +11,6 @@ FS_MESSAGE_ID: Final = 1033
 FS_USB_STRING: Final = "BS000000-1.5"
 FS_MODE_COLOR: Final = 1
 FS_MODE_PATTERN: Final = 20
+# Per-transfer timeouts. The largest write is a full pattern buffer.
+FS_WRITE_TIMEOUT_MS: Final = 500
+FS_READ_TIMEOUT_MS: Final = 250
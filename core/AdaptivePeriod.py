@@ -0,0 +1,68 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+from typing import Final, Optional
+
+from core.pattern.Pattern import ColorDuration
+from utils.Types import RangeInt
+
+
+class AdaptivePeriod:
+    """
+    Sampling period that follows the load. A jump in load drops the period
+    straight to the floor so a spike shows at once, and a run of stable
+    samples stretches it, up to the longest morph the FadeStick can play.
+    """
+    MAX_PERIOD_MS: Final = ColorDuration.MAX_DURATION
+
+    def __init__(self, min_ms: int, max_ms: int = MAX_PERIOD_MS,
+                 fast_delta: float = 0.1, stable_delta: float = 0.02,
+                 stable_ticks: int = 3, growth: float = 2.0) -> None:
+        """
+        :param min_ms: Floor, used whenever load is changing quickly
+        :param fast_delta: Change in load between samples that returns to the floor
+        :param stable_delta: Change in load below which a sample counts as stable
+        :param stable_ticks: Stable samples in a row before the period grows
+        :param growth: Factor the period grows by
+        """
+        self.max_ms: Final[int] = RangeInt(max_ms, 1, self.MAX_PERIOD_MS, "max_ms")
+        self.fast_delta: Final = fast_delta
+        self.stable_delta: Final = stable_delta
+        self.stable_ticks: Final = stable_ticks
+        self.growth: Final = growth
+        self.min_ms: int = 0
+        self.period_ms: int = 0
+        self.adaptations: int = 0
+        self._stable: int = 0
+        self._last: Optional[float] = None
+        self.setFloor(min_ms)
+
+    def setFloor(self, min_ms: int) -> None:
+        """Change the floor and restart from it"""
+        self.min_ms = RangeInt(min_ms, 1, self.max_ms, "min_ms")
+        self.period_ms = self.min_ms
+        self._stable = 0
+
+    def update(self, value: float) -> int:
+        """Feed the latest sample and return the period until the next one"""
+        last, self._last = self._last, value
+        if last is None:
+            return self.period_ms
+
+        change = abs(value - last)
+        period_ms = self.period_ms
+        if change >= self.fast_delta:
+            self._stable = 0
+            period_ms = self.min_ms
+        elif change <= self.stable_delta:
+            self._stable += 1
+            if self._stable >= self.stable_ticks:
+                self._stable = 0
+                period_ms = min(self.max_ms, int(period_ms * self.growth))
+        else:
+            self._stable = 0
+
+        if period_ms != self.period_ms:
+            self.period_ms = period_ms
+            self.adaptations += 1
+        return period_ms
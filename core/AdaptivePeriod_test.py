@@ -0,0 +1,38 @@
+#  Copyright (c) Eric Draken, 2021.
+from unittest import TestCase
+
+from core.AdaptivePeriod import AdaptivePeriod
+from exceptions.NumberExceptions import RangeIntException
+
+
+class TestAdaptivePeriod(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.period = AdaptivePeriod(500)
+
+    def test_stable_load_stretches(self):
+        periods = [self.period.update(0.3) for _ in range(10)]
+        self.assertEqual([500, 500, 500, 1000, 1000, 1000, 2000, 2000, 2000, 2550], periods)
+        self.assertEqual(3, self.period.adaptations)
+
+    def test_spike_returns_to_floor(self):
+        for _ in range(7):
+            self.period.update(0.3)
+        self.assertEqual(2000, self.period.period_ms)
+        self.assertEqual(500, self.period.update(0.9))
+
+    def test_moderate_change_holds(self):
+        values = [0.30, 0.35, 0.30, 0.35, 0.30, 0.35]
+        self.assertEqual([500] * 6, [self.period.update(v) for v in values])
+        self.assertEqual(0, self.period.adaptations)
+
+    def test_set_floor(self):
+        for _ in range(4):
+            self.period.update(0.3)
+        self.period.setFloor(100)
+        self.assertEqual(100, self.period.period_ms)
+        self.assertEqual(100, self.period.update(1.0))
+
+    def test_bad_floor(self):
+        with self.assertRaises(RangeIntException):
+            AdaptivePeriod(AdaptivePeriod.MAX_PERIOD_MS + 1)
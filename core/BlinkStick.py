@@ -33,7 +33,7 @@ class BlinkStick(FadeStickBase):
         for x in range(blinks):
             if x:
                 time.sleep(ms_delay)
-            self.setColor(color)
+            self._setRGB(color)
             time.sleep(ms_delay)
             self.turnOff()
 
@@ -60,9 +60,9 @@ class BlinkStick(FadeStickBase):
         ms_delay = float(duration) / float(1000 * steps)
 
         for grad in gradient:
-            self.setColor(grad)
+            self._setRGB(grad)
             time.sleep(ms_delay)
-        self.setColor(end_color)
+        self._setRGB(end_color)
 
     # Original pulse logic that slows the CPU
     def pulse(self, color: RGB, pulses: int = 1, duration: int = 1000, steps: int = 50) -> None:
@@ -36,24 +36,24 @@ class TestBlinkStick(TestCase):
 
     def test_blink(self):
         self.device.blink(colorToRGB("red"), 1, 50)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(colorToRGB("off"), curr_rgb)
 
     def test_blink_twice(self):
         self.device.blink(colorToRGB("blue"), 2, 50)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(colorToRGB("off"), curr_rgb)
 
     def test_morph_black_red(self):
         self.device.setColor("black")
         self.device.morph(colorToRGB("red"), 1000)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(colorToRGB("red"), curr_rgb)
 
     def test_morph_blue_red(self):
         self.device.setColor("blue")
         self.device.morph(colorToRGB("red"), 1000)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(colorToRGB("red"), curr_rgb)
 
     def test_morph_police(self):
@@ -63,19 +63,19 @@ class TestBlinkStick(TestCase):
         self.device.morph(colorToRGB("red"), 200)
         self.device.morph(colorToRGB("blue"), 200)
         self.device.morph(colorToRGB("off"), 200)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(colorToRGB("off"), curr_rgb)
 
     def test_pulse(self):
         self.device.turnOff()
         self.device.pulse(colorToRGB("red"))
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(colorToRGB("off"), curr_rgb)
 
     def test_pulse_two(self):
         self.device.turnOff()
         self.device.pulse(colorToRGB("green"), 2, 500)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(colorToRGB("off"), curr_rgb)
 
     def test_pulse_bad1(self):
@@ -1,13 +1,236 @@
 #  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
 
-from typing import Tuple, List
+from array import array
+from collections import deque
+from heapq import heapify, heappop, heappush
+from typing import Callable, Dict, Final, Optional, Tuple, List
+
+from core.CPUSampler import CPUSampler, CPUSample
+from utils.Decorators import abstract
+from utils.Types import RangeInt
+
+
+class SmoothingFilter(object):
+    """Stateful filter over a stream of samples, each update in at most logarithmic time"""
+    MAX_WINDOW: Final = 1024
+
+    @abstract
+    def update(self, value: float) -> float:
+        """Add a sample and return the filtered value"""
+        ...
+
+    @abstract
+    def reset(self) -> None:
+        ...
+
+
+class EWMAFilter(SmoothingFilter):
+    """Exponentially weighted moving average"""
+
+    def __init__(self, alpha: float) -> None:
+        """
+        :param alpha: Weight of the newest sample, 0.0 - 1.0
+        """
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError(f"alpha must be in (0, 1], not {alpha}")
+        self.alpha: Final = alpha
+        self._value: Optional[float] = None
+
+    def update(self, value: float) -> float:
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+    def reset(self) -> None:
+        self._value = None
+
+
+class _RingFilter(SmoothingFilter):
+    """Keeps the last 'size' samples in a fixed ring buffer"""
+
+    def __init__(self, size: int) -> None:
+        self.size: Final[int] = RangeInt(size, 1, self.MAX_WINDOW, "size")
+        self._ring: Final = array("d", bytes(8 * self.size))
+        self._head: int = 0
+        self._count: int = 0
+
+    def _push(self, value: float) -> Optional[float]:
+        """Store a sample, returning the one it evicted once the ring is full"""
+        evicted = self._ring[self._head] if self._count == self.size else None
+        self._ring[self._head] = value
+        self._head = (self._head + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+        return evicted
+
+    def reset(self) -> None:
+        self._head = 0
+        self._count = 0
+
+
+class MeanFilter(_RingFilter):
+    """Mean of the last 'size' samples from a running sum"""
+
+    def __init__(self, size: int) -> None:
+        super().__init__(size)
+        self._sum: float = 0.0
+
+    def update(self, value: float) -> float:
+        evicted = self._push(value)
+        if evicted is not None:
+            self._sum -= evicted
+        self._sum += value
+        if not self._head:
+            # Shed floating point drift once per lap
+            self._sum = sum(self._ring[:self._count])
+        return self._sum / self._count
+
+    def reset(self) -> None:
+        super().reset()
+        self._sum = 0.0
+
+
+class MaxFilter(SmoothingFilter):
+    """Maximum of the last 'size' samples from a monotonic queue, amortized O(1)"""
+
+    def __init__(self, size: int) -> None:
+        self.size: Final[int] = RangeInt(size, 1, self.MAX_WINDOW, "size")
+        # (sequence, value) with values strictly decreasing, at most 'size' long
+        self._window: deque = deque()
+        self._seq: int = 0
+
+    def update(self, value: float) -> float:
+        window = self._window
+        while window and window[-1][1] <= value:
+            window.pop()
+        window.append((self._seq, value))
+        if window[0][0] <= self._seq - self.size:
+            window.popleft()
+        self._seq += 1
+        return window[0][1]
+
+    def reset(self) -> None:
+        self._window.clear()
+        self._seq = 0
+
+
+class MedianFilter(_RingFilter):
+    """
+    Median of the last 'size' samples from two heaps, the lower half in a
+    max-heap and the upper half in a min-heap, so each update is O(log size).
+    Samples are ordered by (value, sequence) so equal values stay distinct.
+    Evicted samples are only counted out and popped once they reach the
+    top; the heaps are rebuilt when stale entries outnumber live ones.
+    """
+
+    def __init__(self, size: int) -> None:
+        super().__init__(size)
+        # (-value, -seq) and (value, seq)
+        self._low: List[Tuple[float, int]] = []
+        self._high: List[Tuple[float, int]] = []
+        self._low_count: int = 0
+        self._high_count: int = 0
+        self._seq: int = 0
+        # Entries with an older sequence have left the window
+        self._oldest: int = 0
+
+    def update(self, value: float) -> float:
+        evicted = self._push(value)
+        seq = self._seq
+        self._seq += 1
+        if evicted is not None:
+            # The lower half holds every sample up to its top
+            top = self._lowTop()
+            if top is not None and (evicted, seq - self.size) <= top:
+                self._low_count -= 1
+            else:
+                self._high_count -= 1
+        self._oldest = seq - self._count + 1
+
+        top = self._lowTop()
+        if top is not None and (value, seq) < top:
+            heappush(self._low, (-value, -seq))
+            self._low_count += 1
+        else:
+            heappush(self._high, (value, seq))
+            self._high_count += 1
+
+        # The lower half has as many samples as the upper, or one more
+        while self._low_count > self._high_count + 1:
+            self._lowTop()
+            neg_value, neg_seq = heappop(self._low)
+            heappush(self._high, (-neg_value, -neg_seq))
+            self._low_count -= 1
+            self._high_count += 1
+        while self._high_count > self._low_count:
+            self._highTop()
+            moved_value, moved_seq = heappop(self._high)
+            heappush(self._low, (-moved_value, -moved_seq))
+            self._high_count -= 1
+            self._low_count += 1
+
+        if len(self._low) + len(self._high) > 2 * self.size:
+            self._compact()
+        if self._count % 2:
+            return self._lowTop()[0]
+        return (self._lowTop()[0] + self._highTop()[0]) / 2.0
+
+    def reset(self) -> None:
+        super().reset()
+        self._low.clear()
+        self._high.clear()
+        self._low_count = 0
+        self._high_count = 0
+        self._seq = 0
+        self._oldest = 0
+
+    # Internals #
+
+    def _lowTop(self) -> Optional[Tuple[float, int]]:
+        """The largest live (value, seq) of the lower half, popping evicted ones"""
+        low = self._low
+        while low and -low[0][1] < self._oldest:
+            heappop(low)
+        return (-low[0][0], -low[0][1]) if low else None
+
+    def _highTop(self) -> Optional[Tuple[float, int]]:
+        high = self._high
+        while high and high[0][1] < self._oldest:
+            heappop(high)
+        return high[0] if high else None
+
+    def _compact(self) -> None:
+        """Drop evicted entries buried below the tops, once every 'size' updates at most"""
+        self._low = [e for e in self._low if -e[1] >= self._oldest]
+        self._high = [e for e in self._high if e[1] >= self._oldest]
+        heapify(self._low)
+        heapify(self._high)
+
+
+# Filters by name, built from a window size in samples
+SMOOTHING_FILTERS: Final[Dict[str, Callable[[int], SmoothingFilter]]] = {
+    # The same center of mass as a mean over the window
+    "ewma": lambda window: EWMAFilter(2.0 / (window + 1)),
+    "mean": MeanFilter,
+    "max": MaxFilter,
+    "median": MedianFilter,
+}
 
 
 class CPU:
-    _prev_time_doing_things: int = 0
-    _prev_time_doing_nothing: int = 0
+    def __init__(self, path: str = "/proc/stat", smoothing: Optional[SmoothingFilter] = None,
+                 source: Optional[Callable[[], bytes]] = None):
+        """
+        :param source: Returns /proc/stat contents on each call, in place of reading path,
+                       e.g. to replay a recorded trace
+        """
+        self._sampler: Final = CPUSampler(None if source else path)
+        self._smoothing: Final = smoothing
+        self._source: Final = source
 
-    # TODO: Mutex
     # REF: https://stackoverflow.com/a/54461187/1938889
     @staticmethod
     def getCPUTimes() -> Tuple[int, int]:
@@ -39,19 +262,19 @@ class CPU:
 
         return time_doing_things, time_doing_nothing
 
-    # Range: 0.0 - 1.0
-    def getCPUTimeSlicePercentage(self) -> float:
-        time_doing_things, time_doing_nothing = CPU.getCPUTimes()
-        diff_time_doing_things = time_doing_things - self._prev_time_doing_things
-        diff_time_doing_nothing = time_doing_nothing - self._prev_time_doing_nothing
-        cpu_percentage = diff_time_doing_things / (
-                    diff_time_doing_things + diff_time_doing_nothing)
+    # Per-core and aggregate utilization with steal time. Thread-safe.
+    def getCPUSample(self, window_s: Optional[float] = None) -> CPUSample:
+        if self._source:
+            return self._sampler.sampleData(self._source(), window_s)
+        return self._sampler.sample(window_s)
 
-        # remember current values to subtract next iteration of the loop
-        self._prev_time_doing_things = time_doing_things
-        self._prev_time_doing_nothing = time_doing_nothing
+    # Range: 0.0 - 1.0, smoothed if a filter was given
+    def getCPUTimeSlicePercentage(self) -> float:
+        utilization = self.getCPUSample().utilization
+        return self._smoothing.update(utilization) if self._smoothing else utilization
 
-        return cpu_percentage
+    def close(self) -> None:
+        self._sampler.close()
 
 # if __name__ == "__main__":
 #     cpu: Final = CPU()
@@ -1,54 +1,44 @@
 #  Copyright (c) Eric Draken, 2021.
 import logging
 import os
-import select
 import signal
-import struct
 import sys
 import threading
 import time
 from logging import StreamHandler
 from logging.handlers import SysLogHandler
-from typing import Final, Union
+from typing import Dict, Final, Iterator, Optional, Sequence
 
 import daemon
 from lockfile.pidlockfile import PIDLockFile
-from usb.core import USBError
 
-from core.CPU import CPU
+from constants.DaemonConsts import APP_NAME, PID_PATH, RECORD_PATH, SOCKET_PATH
+from core.AdaptivePeriod import AdaptivePeriod
+from core import Exposition
+from core.CPU import SMOOTHING_FILTERS
+from core.ControlChannel import ControlServer
+from core.DaemonClient import DaemonClient
 from core.FadeStick import FadeStick
-from core.FadeStickUSB import findFirstFadeStick
-from exceptions.FadeStickUSBException import FadeStickUSBException
-from utils.Colors import scaleToRGB, OFF
-from utils.Types import RGB
+from core.FadeStickBackend import Backend
+from core.FadeStickUSB import getBackend, setBackend
+from core.HotplugWatcher import HotplugWatcher
+from core.Instrumentation import Instrumentation
+from core.MetricCollector import MetricCollector
+from core.MetricSource import CPUSource, PressureSource, METRIC_SOURCES
+from core.MetricsServer import MetricsServer
+from core.PressureTrigger import PressureTrigger
+from core.Recorder import Recorder
+from core.StickPool import StickPool
+from core.TickScheduler import TickScheduler
+from core.pattern.GradientEngine import GRADIENTS
+from utils.Colors import OFF
+from utils.Types import RGB, RangeInt
 
 
 class DaemonException(Exception):
     pass
 
 
-# REF: https://www.eadan.net/blog/ipc-with-named-pipes/
-def encode_msg_size(size: int) -> bytes:
-    return struct.pack("<I", size)
-
-
-def decode_msg_size(size_bytes: bytes) -> int:
-    return struct.unpack("<I", size_bytes)[0]
-
-
-def create_msg(content: bytes) -> bytes:
-    size = len(content)
-    return encode_msg_size(size) + content
-
-
-def get_message(fifo: int) -> str:
-    """Get a message from the named pipe."""
-    msg_size_bytes = os.read(fifo, 4)
-    msg_size = decode_msg_size(msg_size_bytes)
-    msg_content = os.read(fifo, msg_size).decode("ascii")
-    return msg_content
-
-
 def get_log_file_handles(logger):
     """Get a list of file handle numbers from the logger to preserve"""
     handles = []
@@ -87,17 +77,80 @@ class CPUDaemon:
     _main_log.addHandler(_console_handler)
     _daemon_log: Final = logging.getLogger("daemon")
 
-    _app_name: Final = "cpufadestick"
-    _pidpath: Final = os.path.join(f"/tmp/{_app_name}.pid")
+    _app_name: Final = APP_NAME
+    _pidpath: Final = PID_PATH
 
-    _named_pipe = f"/tmp/{_app_name}.pipe"
+    _socket_path: Final = SOCKET_PATH
 
     _cpu_per: float = 0.0
+    _value: float = 0.0
+    _smoothed: float = 0.0
     _cur_color: RGB = OFF
     _is_running: bool = False
     _fs_present: bool = False
+    _ticks: int = 0
     _lock: Final = threading.Lock()
 
+    def __init__(self, backend: Optional[Backend] = None,
+                 period_ms: int = 1000, retry_s: float = 5.0,
+                 color_delta: int = 2, max_stale_s: float = 30.0,
+                 stick_cores: Optional[Dict[str, Sequence[int]]] = None,
+                 metric: str = CPUSource.name,
+                 psi: Optional[str] = None, psi_threshold: float = 0.1, psi_fallback_s: float = 30.0,
+                 adaptive: bool = True, metrics_port: Optional[int] = None,
+                 smoothing: Optional[str] = None, smoothing_window: int = 5,
+                 record_path: Optional[str] = RECORD_PATH, record_capacity: int = Recorder.DEFAULT_CAPACITY,
+                 hotplug: bool = True):
+        """
+        :param backend: Device backend to drive, e.g. an EmulatorBackend; pyusb if None
+        :param period_ms: Sampling period and morph duration; the floor when adaptive
+        :param retry_s: Delay between scans for new or missing FadeSticks, unless hotplug events are watched
+        :param color_delta: Per-channel change below which a morph is skipped
+        :param max_stale_s: Resend the color at least this often
+        :param stick_cores: FadeStick serial to the CPU cores it shows, e.g. one stick per socket
+        :param metric: Name of the source in METRIC_SOURCES the sticks show, e.g. "memory"
+        :param psi: "some" or "full" to show CPU stall time and sleep on PSI triggers while quiet
+        :param psi_threshold: Stall fraction that wakes the daemon and ends quiet mode
+        :param psi_fallback_s: Longest sleep while quiet
+        :param adaptive: Stretch the period while load is stable, up to the longest morph
+        :param metrics_port: Serve Prometheus metrics on this localhost port, or not at all if None
+        :param smoothing: Filter in SMOOTHING_FILTERS applied before the gradient, e.g. "ewma"
+        :param smoothing_window: Samples the filter spans
+        :param record_path: Ring file each tick is recorded to, or None to log ticks at DEBUG instead
+        :param record_capacity: Ticks the ring file keeps
+        :param hotplug: Scan for FadeSticks when the kernel reports one rather than every retry_s
+        """
+        if smoothing and smoothing not in SMOOTHING_FILTERS:
+            raise DaemonException(f"Unknown smoothing {smoothing}, expected one of {', '.join(SMOOTHING_FILTERS)}")
+        new_filter = (lambda: SMOOTHING_FILTERS[smoothing](smoothing_window)) if smoothing else None
+        self._smoothing: Final = new_filter() if new_filter else None
+        if psi:
+            if psi not in ("some", "full"):
+                raise DaemonException(f"Unknown PSI kind {psi}, expected some or full")
+            metric = f"psi-{psi}"
+        if metric not in METRIC_SOURCES:
+            raise DaemonException(f"Unknown metric {metric}, expected one of {', '.join(METRIC_SOURCES)}")
+        self._metric: str = metric
+        self._psi: Final = psi
+        self._psi_threshold: Final = psi_threshold
+        self._psi_fallback_s: Final = psi_fallback_s
+        self._trigger: Optional[PressureTrigger] = None
+        self._use_hotplug: Final = hotplug
+        self._hotplug: Optional[HotplugWatcher] = None
+        self._backend: Final = backend
+        self._period_ms: int = period_ms
+        self._retry_s: Final = retry_s
+        self._stats: Final = Instrumentation()
+        # Sticks tied to cores smooth their own loads
+        self._sticks: Final = StickPool(stick_cores, color_delta, max_stale_s, retry_s, retry_s,
+                                        usb_latency=self._stats[Instrumentation.USB], smoothing=new_filter)
+        self._scheduler: Final = TickScheduler(period_ms)
+        self._adaptive: Final = AdaptivePeriod(period_ms) if adaptive else None
+        self._metrics_port: Final = metrics_port
+        self._client: Final = DaemonClient(self._pidpath, self._socket_path)
+        self._record_path: Final = record_path
+        self._record_capacity: Final = record_capacity
+
     def _get_context(self) -> daemon.DaemonContext:
         """Return a daemon context to use with 'with'"""
         return daemon.DaemonContext(
@@ -113,36 +166,167 @@ class CPUDaemon:
                 signal.SIGTERM: self._end,
                 signal.SIGTSTP: self._end,
                 signal.SIGINT: self._end,
-                signal.SIGUSR1: self._status,
-                signal.SIGUSR2: self._status,
             }
         )
 
     # Daemon methods #
 
-    def _status(self, signum: int, _frame=None):
-        self._daemon_log.debug(f"Daemon received {signal.Signals(signum).name}")
-        try:
-            with self._lock:
-                if not self._fs_present:
-                    msg = "Daemon running, but FadeStick not present."
-                else:
-                    msg = f"Daemon running. Current CPU load is {self._cpu_per * 100.0:.2f}% and is color {self._cur_color}."
-
-            self._daemon_log.info(msg)
-            # Pass messages from the daemon to the controller via a named pipe
-            pipe = os.open(self._named_pipe, os.O_WRONLY)
-            self._daemon_log.debug("Opened IPC pipe")
-            packet = create_msg(msg.encode("ascii"))
-            os.write(pipe, packet)
-            self._daemon_log.debug("Wrote to IPC pipe")
-            # Do not close the pipe in the daemon
-        except Exception as e:
-            self._daemon_log.error(f"Daemon status error: {e}")
+    def _status(self) -> str:
+        with self._lock:
+            if not self._fs_present:
+                return "Daemon running, but FadeStick not present."
+            return f"Daemon running. Current CPU load is {self._cpu_per * 100.0:.2f}%, " \
+                   f"{self._metric} is {self._value * 100.0:.2f}% and is color {self._cur_color}. " \
+                   f"{len(self._sticks)} FadeStick(s) present, " \
+                   f"{self._sticks.suppressed} transfers suppressed, " \
+                   f"{self._scheduler.missed} deadlines missed. " \
+                   f"Sampling every {self._period_ms} ms after {self._adaptations()} adaptations. " \
+                   f"{self._sticks.connects} connects. {self._stats.summary(self._errors())}."
+
+    def _metrics(self) -> str:
+        with self._lock:
+            metrics = {
+                "cpu": f"{self._cpu_per:.4f}",
+                "metric": self._metric,
+                "value": f"{self._value:.4f}",
+                "smoothed": f"{self._smoothed:.4f}",
+                "psi_wakeups": self._trigger.fired if self._trigger else 0,
+                "hotplug_attaches": self._hotplug.attached if self._hotplug else 0,
+                "color": ",".join(str(c) for c in self._cur_color),
+                "fs_present": int(self._fs_present),
+                "sticks": len(self._sticks),
+                "period_ms": self._period_ms,
+                "adaptations": self._adaptations(),
+                "ticks": self._ticks,
+                "reconnects": self._sticks.connects,
+                "transfers": self._sticks.transfers,
+                "transfers_suppressed": self._sticks.suppressed,
+                "circuits_open": self._sticks.circuits_open,
+                "pattern_compression": f"{GRADIENTS.optimizer.ratio:.2f}",
+                "deadlines_missed": self._scheduler.missed,
+                **self._stats.metrics(self._errors()),
+            }
+        return "\n".join(f"{k} {v}" for k, v in metrics.items())
+
+    def _set_period(self, period_ms: int) -> str:
+        # The period is also the morph duration
+        period_ms = RangeInt(period_ms, 1, FadeStick.MAX_DURATION, "period_ms")
+        with self._lock:
+            if self._adaptive:
+                # Adaptation stretches the period from here
+                self._adaptive.setFloor(period_ms)
+            self._scheduler.setPeriod(period_ms)
+            self._period_ms = period_ms
+        return f"Period set to {period_ms} ms."
+
+    def _exposition(self) -> Iterator[str]:
+        """
+        Prometheus metrics, rendered line by line. Reads without the lock:
+        each value is a single attribute, so a scrape never delays a tick.
+        """
+        prefix = self._app_name
+        yield from Exposition.gauge(f"{prefix}_cpu_utilization", "CPU utilization (0-1)", self._cpu_per)
+        yield from Exposition.gauge(f"{prefix}_metric_value", "Value of the displayed metric (0-1)",
+                                    self._value, {"metric": self._metric})
+        yield from Exposition.gauge(f"{prefix}_metric_smoothed", "Displayed metric after smoothing (0-1)",
+                                    self._smoothed, {"metric": self._metric})
+        color = self._cur_color
+        yield from Exposition.header(f"{prefix}_color", "gauge", "Current color channel (0-255)")
+        for channel, value in zip(("red", "green", "blue"), color):
+            yield Exposition.sample(f"{prefix}_color", value, {"channel": channel})
+        yield from Exposition.gauge(f"{prefix}_fs_present", "1 if a FadeStick is present", int(self._fs_present))
+        yield from Exposition.gauge(f"{prefix}_sticks", "FadeSticks being driven", len(self._sticks))
+        yield from Exposition.gauge(f"{prefix}_circuits_open", "FadeSticks with transfers paused after failing",
+                                    self._sticks.circuits_open)
+        yield from Exposition.gauge(f"{prefix}_period_ms", "Current sampling period", self._period_ms)
+        yield from Exposition.gauge(f"{prefix}_pattern_compression_ratio", "Fade steps per pattern entry sent",
+                                    GRADIENTS.optimizer.ratio)
+        yield from Exposition.counter(f"{prefix}_ticks_total", "Ticks sampled", self._ticks)
+        yield from Exposition.counter(f"{prefix}_connects_total", "FadeStick connects and reconnects",
+                                      self._sticks.connects)
+        yield from Exposition.counter(f"{prefix}_transfers_total", "Morphs sent to FadeSticks",
+                                      self._sticks.transfers)
+        yield from Exposition.counter(f"{prefix}_transfers_suppressed_total", "Morphs skipped as unchanged",
+                                      self._sticks.suppressed)
+        yield from Exposition.counter(f"{prefix}_deadlines_missed_total", "Tick deadlines missed",
+                                      self._scheduler.missed)
+        yield from Exposition.counter(f"{prefix}_adaptations_total", "Sampling period changes",
+                                      self._adaptations())
+        yield from Exposition.counter(f"{prefix}_psi_wakeups_total", "Wakeups by a PSI trigger",
+                                      self._trigger.fired if self._trigger else 0)
+        yield from Exposition.counter(f"{prefix}_hotplug_attaches_total", "FadeSticks reported attached by the kernel",
+                                      self._hotplug.attached if self._hotplug else 0)
+        yield from Exposition.counter(f"{prefix}_errors_total", "Errors in the daemon and stick workers",
+                                      self._errors())
+        yield from Exposition.counter(f"{prefix}_self_cpu_seconds_total", "CPU time used by the daemon",
+                                      self._stats.cpuSeconds())
+        yield from Exposition.histogram(f"{prefix}_phase_seconds", "Time spent in each phase of a tick",
+                                        "phase", self._stats.phases)
+
+    def _errors(self) -> int:
+        return self._stats.errors + self._sticks.errors
+
+    def _adaptations(self) -> int:
+        return self._adaptive.adaptations if self._adaptive else 0
+
+    def _adapt(self, value: float) -> None:
+        """Retune the period, and so the morph duration, to how fast the value moves"""
+        with self._lock:
+            period_ms = self._adaptive.update(value)
+            if period_ms != self._period_ms:
+                self._daemon_log.debug(f"Period adapted to {period_ms} ms")
+                self._scheduler.setPeriod(period_ms)
+                self._period_ms = period_ms
+
+    def _control(self, command: str) -> str:
+        """Answer a request from the control socket. Runs on the control thread."""
+        args = command.split()
+        self._daemon_log.debug(f"Daemon received command {args}")
+        if args == ["status"]:
+            return self._status()
+        if args == ["metrics"]:
+            return self._metrics()
+        if len(args) == 2 and args[0] == "set-period" and args[1].isdigit():
+            return self._set_period(int(args[1]))
+        return f"Unknown command: {command}"
 
     def _end(self, signum: int, _frame=None):
         self._daemon_log.debug(f"Daemon received {signal.Signals(signum).name}")
         self._is_running = False
+        self._scheduler.stop()
+        if self._trigger:
+            self._trigger.stop()
+        self._sticks.wake()
+
+    def _open_trigger(self) -> Optional[PressureTrigger]:
+        try:
+            return PressureTrigger("cpu", self._psi, self._psi_threshold)
+        except OSError as e:
+            self._daemon_log.warning(f"PSI triggers unavailable, sampling every period: {e}")
+            if not os.path.exists(PressureSource().path):
+                self._metric = CPUSource.name
+            return None
+
+    def _open_hotplug(self) -> Optional[HotplugWatcher]:
+        try:
+            return getBackend().openHotplug()
+        except OSError as e:
+            self._daemon_log.warning(f"Hotplug events unavailable, scanning every {self._retry_s} s: {e}")
+            return None
+
+    def _open_recorder(self) -> Optional[Recorder]:
+        if self._record_path is None:
+            return None
+        try:
+            return Recorder(self._record_path, self._record_capacity)
+        except (OSError, ValueError) as e:
+            self._daemon_log.error(f"Recorder unavailable, logging ticks instead: {e}")
+            return None
+
+    def _record(self, recorder: Optional[Recorder], error: int) -> None:
+        if recorder:
+            recorder.record(self._cpu_per, self._value, self._smoothed, self._metric, self._cur_color,
+                            self._stats[Instrumentation.USB].last, error, self._period_ms)
 
     def _run(self):
         if self._is_running:
@@ -150,58 +334,118 @@ class CPUDaemon:
 
         self._is_running = True
         self._daemon_log.info("Daemon started")
-        cpu: Final = CPU()
-        fs: Union[FadeStick, None] = None
-        period_ms = 1000
+        if self._backend:
+            setBackend(self._backend)
+        if self._psi:
+            self._trigger = self._open_trigger()
+        if self._use_hotplug:
+            # Opened before the first scan, so no attach is missed in between
+            self._hotplug = self._open_hotplug()
+        # CPU is always sampled for sticks tied to cores
+        cpu: Final = CPUSource()
+        sources = [cpu] if self._metric == cpu.name else [cpu, METRIC_SOURCES[self._metric]()]
+        collector: Final = MetricCollector(sources)
+        sticks = self._sticks
+        scheduler = self._scheduler
+        control: Final = ControlServer(self._socket_path, self._control)
+        exporter = MetricsServer(self._exposition, self._metrics_port) \
+            if self._metrics_port is not None else None
+        stats = self._stats
+        recorder: Final = self._open_recorder()
+        transfer_errors = 0
+        window_s: Optional[float] = None
         try:
+            stats.start()
+            # Scans and opens sticks on its own thread, woken by hotplug events if there are any
+            sticks.start(self._hotplug)
+            control.start()
+            if exporter:
+                try:
+                    exporter.start()
+                except OSError as e:
+                    # Monitoring is optional, the stick is not
+                    self._daemon_log.error(f"Metrics endpoint unavailable: {e}")
+                    exporter = None
             while True:
                 # Graceful exit condition
                 if not self._is_running:
                     break
 
-                # Handle the case when the USB is unplugged
-                if not fs:
-                    try:
-                        fs = FadeStick(findFirstFadeStick())
-                        if fs:
-                            with self._lock:
-                                self._fs_present = True
-                    except (USBError, FadeStickUSBException):
-                        with self._lock:
-                            self._fs_present = False
-                        time.sleep(5)
-                        continue
+                # Pick up the sticks the scanner has opened and drop unplugged ones
+                if sticks.sync():
+                    # New sticks must be sent a color straight away
+                    scheduler.reset()
+                with self._lock:
+                    self._fs_present = len(sticks) > 0
+                if not self._fs_present:
+                    self._record(recorder, Recorder.ERR_NO_STICK)
+                    # Until the scanner finds a stick
+                    sticks.wait()
+                    window_s = None
+                    continue
 
                 try:
-                    self._cpu_per = cpu.getCPUTimeSlicePercentage()
-                    self._daemon_log.debug(f"CPU {self._cpu_per * 100.0:.2f}%")
-                    self._cur_color = scaleToRGB(self._cpu_per)
-                    fs.morph(self._cur_color, period_ms)
-                    time.sleep(period_ms / 1000.0)
-                except (USBError, FadeStickUSBException):
-                    # Get a new USB handle next
-                    with self._lock:
-                        fs = None
-                        self._fs_present = True
+                    t_sample = time.perf_counter()
+                    values = collector.collect(window_s)
+                    t_color = time.perf_counter()
+                    self._cpu_per = values[cpu.name]
+                    self._value = values[self._metric]
+                    if not recorder:
+                        self._daemon_log.debug(f"CPU {self._cpu_per * 100.0:.2f}%, {self._metric} {self._value:.4f}")
+                    # Spikes still adapt the period at once; the LED follows the smoothed value
+                    self._smoothed = self._smoothing.update(self._value) if self._smoothing else self._value
+                    self._cur_color = GRADIENTS.loadToRGB(self._smoothed)
+                    self._ticks += 1
+                    if self._adaptive:
+                        self._adapt(self._value)
+                    # Each stick morphs on its own worker, over the coming period
+                    sticks.submit(cpu.sample, self._period_ms, self._smoothed)
+                    # Worker errors since the last tick
+                    failed = sticks.errors != transfer_errors
+                    transfer_errors = sticks.errors
+                    self._record(recorder, Recorder.ERR_TRANSFER if failed else Recorder.ERR_NONE)
+                    t_sleep = time.perf_counter()
+                    stats[Instrumentation.SAMPLE].observe(t_color - t_sample)
+                    stats[Instrumentation.COLOR].observe(t_sleep - t_color)
+                    if self._trigger and self._value < self._psi_threshold:
+                        # Quiet: sleep until the kernel reports a stall
+                        self._trigger.wait(self._psi_fallback_s)
+                        scheduler.reset()
+                        # The collector measures the window it slept through
+                        window_s = None
+                    else:
+                        scheduler.wait()
+                        # The scheduler knows the real window, late ticks included
+                        window_s = scheduler.window_s
+                    stats[Instrumentation.SLEEP].observe(time.perf_counter() - t_sleep)
                 except Exception as e:
                     self._daemon_log.error(f"Daemon exception: {e}")
-                    time.sleep(5)  # Don't flood syslog
+                    stats.errors += 1
+                    self._record(recorder, Recorder.ERR_TICK)
+                    scheduler.sleep(5)  # Don't flood syslog
         except Exception as e:
             self._daemon_log.error(f"Daemon fatal exception: {e}")
         finally:
-            self._daemon_log.debug("Shutting down FadeStick")
+            self._daemon_log.debug("Shutting down FadeSticks")
             try:
-                if self._fs_present:
-                    for _ in range(60):
-                        fs.turnOff()
-                        if fs.isOff():
-                            break
-                        else:
-                            # Don't flood FadeStick while it is processing
-                            time.sleep(1)
+                # The workers turn their sticks off concurrently
+                sticks.stop()
             except Exception as e:
                 self._daemon_log.error(f"Daemon shutdown error: {e}")
             finally:
+                control.stop()
+                if exporter:
+                    exporter.stop()
+                collector.close()
+                stats.close()
+                if recorder:
+                    recorder.close()
+                if self._trigger:
+                    self._trigger.close()
+                    self._trigger = None
+                if self._hotplug:
+                    self._hotplug.close()
+                    self._hotplug = None
                 with self._lock:
                     self._is_running = False
                     self._fs_present = False
@@ -219,101 +463,28 @@ class CPUDaemon:
             self._run()
             # This process will now die
 
-    def stop(self) -> str:
-        self._main_log.info("Daemon stop requested")
-        ctx = self._get_context()
-        pidf: PIDLockFile = ctx.pidfile
-        if not pidf.read_pid():
-            return "Daemon already stopped."
+    # Client-side commands, which main.py runs without importing this module
 
-        # The daemon will close the PID file itself
-        try:
-            pid = pidf.read_pid()
-            self._main_log.debug(f"Sending {signal.SIGINT.name} to PID {pid}")
-            os.kill(pid, signal.SIGINT)
-            return "Daemon stopping."
-        except ProcessLookupError:
-            # Remove the lock file with prejudice
-            pidf.break_lock()
-            return "Daemon not running or was killed."
-        except Exception as e:
-            self._main_log.error(f"Daemon stop error: {e}")
-            # No return message on purpose
+    def stop(self) -> str:
+        return self._client.stop()
 
     def kill(self) -> str:
-        # Try to gracefully stop first
-        self.stop()
-
-        # Give stop a chance to be graceful
-        time.sleep(5)
-        ctx = self._get_context()
-        pidf: PIDLockFile = ctx.pidfile
-        pid = pidf.read_pid()
-        if not pid:
-            return "Daemon not running."
-
-        self._main_log.info(f"Daemon kill requested for pid {pid}")
-        # Will remove the PID file after
-        try:
-            self._main_log.debug(f"Sending {signal.SIGKILL.name} to PID {pid}")
-            os.kill(pid, signal.SIGKILL)
-            return "Daemon was killed."
-        except Exception as e:
-            self._main_log.error(f"Daemon kill error: {e}")
-        finally:
-            # Remove the lock file with prejudice
-            pidf.break_lock()
+        return self._client.kill()
 
     def status(self) -> str:
-        self._main_log.info("Daemon status requested")
-        pid = self._get_context().pidfile.read_pid()
-        if not pid:
-            return "Daemon not running."
+        return self._client.status()
 
-        # Create the named pipe
-        try:
-            try:
-                os.mkfifo(self._named_pipe)
-                self._main_log.debug("Creating named IPC pipe")
-            except FileExistsError:
-                self._main_log.debug("IPC pipe already exists")
-                pass
-
-            # Open the pipe in non-blocking mode for reading
-            pipe = os.open(self._named_pipe, os.O_RDONLY | os.O_NONBLOCK)
-            self._main_log.debug("Opened IPC pipe")
-            try:
-                # Trigger the daemon to place a message in the queue
-                self._main_log.debug(f"Sending {signal.SIGUSR1.name} to PID {pid}")
-                os.kill(pid, signal.SIGUSR1)
-                self._main_log.debug(f"Waiting for reply")
-
-                # Create a polling object to monitor the pipe for new data
-                poll = select.poll()
-                poll.register(pipe, select.POLLIN)
-                try:
-                    # Check if there's data to read. Timeout after 5 sec.
-                    self._main_log.debug("Starting IPC poll")
-                    if (pipe, select.POLLIN) in poll.poll(5000):
-                        return get_message(pipe)
-                    else:
-                        self._main_log.error("Daemon did not respond in time.")
-                finally:
-                    poll.unregister(pipe)
-            except ProcessLookupError:
-                # Remove the lock file with prejudice
-                self._get_context().pidfile.break_lock()
-                return "Daemon not running or was killed."
-            finally:
-                os.close(pipe)
-        finally:
-            os.remove(self._named_pipe)
-            self._main_log.debug("Finished status request")
+    def metrics(self) -> str:
+        return self._client.metrics()
+
+    def set_period(self, period_ms: int) -> str:
+        return self._client.set_period(period_ms)
 
     def restart(self) -> str:
         self._main_log.debug("Daemon restart requested")
         try:
-            msg = self.stop()
+            # The old daemon holds the pidfile until it has exited
+            msg = self.kill()
             msg += self.start()
             return msg
         except Exception as e:
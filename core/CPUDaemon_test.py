@@ -0,0 +1,64 @@
+#  Copyright (c) Eric Draken, 2021.
+import errno
+import os
+import signal
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from usb.core import USBError
+
+from core.CPUDaemon import CPUDaemon
+from core.FadeStickUSB import getBackend, setBackend
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+
+
+class GlitchingBackend(EmulatorBackend):
+    """Fails to enumerate the bus once, on the given call"""
+
+    def __init__(self, fail_on: int) -> None:
+        super().__init__([EmulatedFadeStick()])
+        self.fail_on = fail_on
+        self.scans = 0
+
+    def findDevices(self):
+        self.scans += 1
+        if self.scans == self.fail_on:
+            raise USBError("enumeration glitch", errno=errno.EIO)
+        return super().findDevices()
+
+
+class TestDaemonScan(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.backend = GlitchingBackend(fail_on=3)
+        self.previous_backend = getBackend()
+        self.daemon = CPUDaemon(backend=self.backend, period_ms=20, retry_s=0.01, record_path=None,
+                                hotplug=False)
+        self.daemon._socket_path = os.path.join(self.dir.name, "test.sock")
+        self.thread = threading.Thread(target=self.daemon._run, daemon=True)
+        self.thread.start()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.daemon._end(signal.SIGINT)
+        self.thread.join(10)
+        setBackend(self.previous_backend)
+        self.dir.cleanup()
+
+    def waitFor(self, condition, timeout_s: float = 2.0) -> bool:
+        deadline = time.monotonic() + timeout_s
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def test_survives_enumeration_error(self):
+        self.assertTrue(self.waitFor(lambda: self.backend.scans > 3))
+        ticks = self.daemon._ticks
+        self.assertTrue(self.waitFor(lambda: self.daemon._ticks > ticks + 2))
+        self.assertTrue(self.thread.is_alive())
+        self.assertEqual(1, self.daemon._errors())
@@ -0,0 +1,185 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import os
+import threading
+import time
+from array import array
+from typing import Final, NamedTuple, Optional
+
+
+class CPUSample(NamedTuple):
+    """Fractions (0.0 - 1.0) of the window since the previous sample"""
+    utilization: float
+    steal: float
+    # Indexed by core number; cores that are offline read 0.0
+    core_utilization: array
+    core_steal: array
+    # Wall-clock length of the window in seconds
+    window_s: float
+
+
+class CPUSampler:
+    """
+    Per-core /proc/stat sampler. The file stays open and is reread with
+    preadv() into a reused buffer, so a sample costs one syscall. All the
+    cpu lines are parsed in one pass into array-backed counters.
+    Refer to "man 5 proc" for the meaning of each column.
+    """
+    # Columns after the cpu label
+    USER: Final = 0
+    NICE: Final = 1
+    SYSTEM: Final = 2
+    IDLE: Final = 3
+    IOWAIT: Final = 4
+    IRQ: Final = 5
+    SOFTIRQ: Final = 6
+    STEAL: Final = 7
+    _WIDTH: Final = 8
+
+    INITIAL_BUFFER_SIZE: Final = 64 * 1024
+
+    def __init__(self, path: Optional[str] = "/proc/stat") -> None:
+        """
+        :param path: File to sample, or None when the caller reads it and uses sampleData()
+        """
+        self._fd: int = os.open(path, os.O_RDONLY | os.O_CLOEXEC) if path else -1
+        self._buffer: bytearray = bytearray(self.INITIAL_BUFFER_SIZE)
+        self._lock = threading.Lock()
+        # Row 0 is the aggregate "cpu" line, row n + 1 is "cpun"
+        self._rows: int = 0
+        self._current: array = array("Q")
+        self._previous: array = array("Q")
+        self._utilization: array = array("d")
+        self._steal: array = array("d")
+        # Rows found by the last parse; a core that is offline has no line
+        self._seen: bytearray = bytearray()
+        self._primed: bool = False
+        self._sampled_at: float = time.monotonic()
+
+    def __enter__(self) -> CPUSampler:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    @property
+    def cores(self) -> int:
+        return max(0, self._rows - 1)
+
+    def sample(self, window_s: Optional[float] = None) -> CPUSample:
+        """
+        Utilization since the previous call, or since boot on the first call.
+        :param window_s: The window as measured by the caller's scheduler
+        """
+        with self._lock:
+            length = self._read()
+            return self._update(self._buffer, length, window_s)
+
+    def sampleData(self, data: bytes, window_s: Optional[float] = None) -> CPUSample:
+        """Like sample(), from /proc/stat contents the caller has already read"""
+        with self._lock:
+            return self._update(data, len(data), window_s)
+
+    # Internals #
+
+    def _update(self, buffer: bytes, length: int, window_s: Optional[float]) -> CPUSample:
+        now = time.monotonic()
+        if window_s is None:
+            window_s = now - self._sampled_at
+        self._sampled_at = now
+        self._current, self._previous = self._previous, self._current
+        self._parse(buffer, length)
+        self._compute()
+        return CPUSample(self._utilization[0], self._steal[0],
+                         self._utilization[1:], self._steal[1:], window_s)
+
+    def _read(self) -> int:
+        if self._fd < 0:
+            raise IOError("CPUSampler has no file; use sampleData()")
+        while True:
+            length = os.preadv(self._fd, [self._buffer], 0)
+            if length < len(self._buffer):
+                return length
+            self._buffer = bytearray(len(self._buffer) * 2)
+
+    def _resize(self, rows: int) -> None:
+        grow = (rows - self._rows) * self._WIDTH
+        self._current.extend(bytes(grow * self._current.itemsize))
+        self._previous.extend(bytes(grow * self._previous.itemsize))
+        self._utilization.extend([0.0] * (rows - self._rows))
+        self._steal.extend([0.0] * (rows - self._rows))
+        self._seen.extend(bytes(rows - self._rows))
+        self._rows = rows
+
+    def _parse(self, buffer: bytes, length: int) -> None:
+        width = self._WIDTH
+        current = self._current
+        seen = self._seen
+        seen[:] = bytes(self._rows)
+        pos = 0
+        # The cpu lines always come first
+        while buffer.startswith(b"cpu", pos, length):
+            end = buffer.find(b"\n", pos, length)
+            if end < 0:
+                end = length
+            fields = buffer[pos:end].split()
+            name = fields[0]
+            row = 0 if len(name) == 3 else int(name[3:]) + 1
+            if row >= self._rows:
+                self._resize(row + 1)
+                current = self._current
+            seen[row] = 1
+            offset = row * width
+            # Older kernels have fewer columns
+            for i in range(min(width, len(fields) - 1)):
+                current[offset + i] = int(fields[i + 1])
+            pos = end + 1
+
+        if not pos:
+            raise IOError("First line of /proc/stat not recognized")
+
+    def _compute(self) -> None:
+        current, previous = self._current, self._previous
+        width = self._WIDTH
+        for row in range(self._rows):
+            o = row * width
+            if not self._seen[row]:
+                # Offline: it counts from zero if it comes back
+                for i in range(width):
+                    current[o + i] = 0
+                self._utilization[row] = self._steal[row] = 0.0
+                continue
+            if self._primed:
+                busy = ((current[o + self.USER] - previous[o + self.USER]) +
+                        (current[o + self.NICE] - previous[o + self.NICE]) +
+                        (current[o + self.SYSTEM] - previous[o + self.SYSTEM]) +
+                        (current[o + self.IRQ] - previous[o + self.IRQ]) +
+                        (current[o + self.SOFTIRQ] - previous[o + self.SOFTIRQ]))
+                idle = ((current[o + self.IDLE] - previous[o + self.IDLE]) +
+                        (current[o + self.IOWAIT] - previous[o + self.IOWAIT]))
+                steal = current[o + self.STEAL] - previous[o + self.STEAL]
+            else:
+                busy = (current[o + self.USER] + current[o + self.NICE] + current[o + self.SYSTEM] +
+                        current[o + self.IRQ] + current[o + self.SOFTIRQ])
+                idle = current[o + self.IDLE] + current[o + self.IOWAIT]
+                steal = current[o + self.STEAL]
+
+            if busy < 0 or idle < 0 or steal < 0:
+                # The counters went back, so this window cannot be measured
+                self._utilization[row] = self._steal[row] = 0.0
+                continue
+            total = busy + idle + steal
+            # Sampled within the same jiffy
+            if total <= 0:
+                continue
+            self._utilization[row] = busy / total
+            self._steal[row] = steal / total
+
+        # Later samples subtract these counters
+        self._primed = True
@@ -0,0 +1,116 @@
+#  Copyright (c) Eric Draken, 2021.
+import os
+import tempfile
+from unittest import TestCase
+
+from core.CPU import CPU
+from core.CPUSampler import CPUSampler
+
+STAT_TAIL = "intr 1234 0 0 0\nctxt 5678\nbtime 1600000000\nprocs_running 1\n"
+
+
+def stat(*rows) -> str:
+    lines = []
+    for name, values in rows:
+        lines.append(f"{name} {' '.join(str(v) for v in values)} 0 0")
+    return "\n".join(lines) + "\n" + STAT_TAIL
+
+
+class TestCPUSampler(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        os.remove(self.path)
+
+    def write(self, content: str) -> None:
+        with open(self.path, "w") as f:
+            f.write(content)
+
+    def test_since_boot(self):
+        #                user nice sys idle iowait irq softirq steal
+        self.write(stat(("cpu", [30, 0, 10, 50, 10, 0, 0, 0]),
+                        ("cpu0", [30, 0, 10, 50, 10, 0, 0, 0])))
+        with CPUSampler(self.path) as sampler:
+            sample = sampler.sample()
+            self.assertAlmostEqual(0.4, sample.utilization)
+            self.assertEqual(1, sampler.cores)
+            self.assertEqual(1, len(sample.core_utilization))
+
+    def test_window(self):
+        self.write(stat(("cpu", [0] * 8), ("cpu0", [0] * 8), ("cpu1", [0] * 8)))
+        with CPUSampler(self.path) as sampler:
+            sampler.sample()
+            self.write(stat(("cpu", [60, 0, 20, 100, 10, 5, 5, 0]),
+                            ("cpu0", [60, 0, 20, 10, 0, 5, 5, 0]),
+                            ("cpu1", [0, 0, 0, 90, 10, 0, 0, 0])))
+            sample = sampler.sample()
+            self.assertAlmostEqual(90 / 200, sample.utilization)
+            self.assertAlmostEqual(0.9, sample.core_utilization[0])
+            self.assertAlmostEqual(0.0, sample.core_utilization[1])
+
+    def test_irq_and_steal(self):
+        self.write(stat(("cpu", [0] * 8)))
+        with CPUSampler(self.path) as sampler:
+            sampler.sample()
+            self.write(stat(("cpu", [10, 0, 10, 40, 0, 10, 10, 20])))
+            sample = sampler.sample()
+            self.assertAlmostEqual(0.4, sample.utilization)
+            self.assertAlmostEqual(0.2, sample.steal)
+
+    def test_same_jiffy(self):
+        self.write(stat(("cpu", [50, 0, 0, 50, 0, 0, 0, 0])))
+        with CPUSampler(self.path) as sampler:
+            first = sampler.sample()
+            second = sampler.sample()
+            self.assertEqual(first.utilization, second.utilization)
+
+    def test_many_cores(self):
+        rows = [("cpu", [128] * 8)] + [(f"cpu{n}", [1] * 8) for n in range(128)]
+        self.write(stat(*rows) + "intr" + " 0" * 50_000 + "\n")
+        with CPUSampler(self.path) as sampler:
+            sample = sampler.sample()
+            self.assertEqual(128, sampler.cores)
+            self.assertAlmostEqual(5 / 8, sample.core_utilization[127])
+
+    def test_offline_core(self):
+        self.write(stat(("cpu", [0] * 8), ("cpu0", [0] * 8), ("cpu2", [10] * 8)))
+        with CPUSampler(self.path) as sampler:
+            sample = sampler.sample()
+            self.assertEqual(3, len(sample.core_utilization))
+            self.assertEqual(0.0, sample.core_utilization[1])
+
+    def test_core_goes_offline(self):
+        self.write(stat(("cpu", [0] * 8), ("cpu0", [0] * 8), ("cpu1", [0] * 8)))
+        with CPUSampler(self.path) as sampler:
+            sampler.sample()
+            self.write(stat(("cpu", [60, 0, 0, 60, 0, 0, 0, 0]),
+                            ("cpu0", [10, 0, 0, 30, 0, 0, 0, 0]),
+                            ("cpu1", [50, 0, 0, 30, 0, 0, 0, 0])))
+            self.assertAlmostEqual(0.625, sampler.sample().core_utilization[1])
+            # cpu1 is gone from the next read
+            self.write(stat(("cpu", [80, 0, 0, 80, 0, 0, 0, 0]),
+                            ("cpu0", [30, 0, 0, 50, 0, 0, 0, 0])))
+            sample = sampler.sample()
+            self.assertEqual(2, len(sample.core_utilization))
+            self.assertAlmostEqual(0.5, sample.core_utilization[0])
+            self.assertEqual(0.0, sample.core_utilization[1])
+            self.assertEqual(0.0, sample.core_steal[1])
+
+    def test_bad_file(self):
+        self.write("nope 1 2 3\n")
+        with CPUSampler(self.path) as sampler:
+            with self.assertRaises(IOError):
+                sampler.sample()
+
+    def test_proc_stat(self):
+        cpu = CPU()
+        try:
+            sample = cpu.getCPUSample()
+            self.assertGreaterEqual(len(sample.core_utilization), 1)
+            self.assertTrue(0.0 <= cpu.getCPUTimeSlicePercentage() <= 1.0)
+        finally:
+            cpu.close()
@@ -0,0 +1,79 @@
+#  Copyright (c) Eric Draken, 2021.
+import random
+import statistics
+from unittest import TestCase
+
+from core.CPU import CPU, EWMAFilter, MeanFilter, MaxFilter, MedianFilter, SMOOTHING_FILTERS
+from exceptions.NumberExceptions import RangeIntException
+
+
+class TestSmoothingFilters(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        rng = random.Random(7)
+        self.values = [rng.random() for _ in range(500)]
+
+    def windows(self, size: int):
+        for i in range(len(self.values)):
+            yield self.values[max(0, i - size + 1):i + 1]
+
+    def test_ewma(self):
+        f = EWMAFilter(0.5)
+        self.assertEqual([1.0, 0.5, 0.75], [f.update(v) for v in (1.0, 0.0, 1.0)])
+        with self.assertRaises(ValueError):
+            EWMAFilter(0.0)
+
+    def test_mean(self):
+        f = MeanFilter(7)
+        for value, window in zip(self.values, self.windows(7)):
+            self.assertAlmostEqual(statistics.mean(window), f.update(value))
+
+    def test_max(self):
+        f = MaxFilter(7)
+        for value, window in zip(self.values, self.windows(7)):
+            self.assertEqual(max(window), f.update(value))
+
+    def test_median(self):
+        f = MedianFilter(6)
+        for value, window in zip(self.values, self.windows(6)):
+            self.assertAlmostEqual(statistics.median(window), f.update(value))
+
+    def test_median_window(self):
+        rng = random.Random(7)
+        for size in (1, 2, 5, 64):
+            f = MedianFilter(size)
+            # Few distinct values, so many samples tie
+            values = [rng.choice((0.0, 0.25, 0.5, 1.0)) if i % 3 else rng.random() for i in range(1000)]
+            for n, value in enumerate(values):
+                self.assertAlmostEqual(statistics.median(values[max(0, n + 1 - size):n + 1]), f.update(value))
+            # Evicted samples do not pile up below the tops
+            self.assertLessEqual(len(f._low) + len(f._high), 2 * size + 1)
+
+    def test_spike_rejected(self):
+        f = MedianFilter(5)
+        outputs = [f.update(v) for v in (0.2, 0.2, 0.2, 1.0, 0.2, 0.2)]
+        self.assertEqual(0.2, max(outputs[2:]))
+
+    def test_reset(self):
+        for name, make in SMOOTHING_FILTERS.items():
+            f = make(3)
+            f.update(1.0)
+            f.reset()
+            self.assertEqual(0.25, f.update(0.25), name)
+
+    def test_bad_size(self):
+        with self.assertRaises(RangeIntException):
+            MeanFilter(0)
+
+
+class TestCPUSource(TestCase):
+    def test_replay(self):
+        trace = iter([b"cpu  0 0 0 0 0 0 0 0\ncpu0 0 0 0 0 0 0 0 0\n",
+                      b"cpu  30 0 0 70 0 0 0 0\ncpu0 30 0 0 70 0 0 0 0\n",
+                      b"cpu  130 0 0 70 0 0 0 0\ncpu0 130 0 0 70 0 0 0 0\n"])
+        cpu = CPU(source=lambda: next(trace))
+        cpu.getCPUSample(1.0)
+        sample = cpu.getCPUSample(1.0)
+        self.assertAlmostEqual(0.3, sample.utilization)
+        self.assertEqual(1.0, sample.window_s)
+        self.assertAlmostEqual(1.0, cpu.getCPUTimeSlicePercentage())
@@ -0,0 +1,63 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import time
+from typing import Callable, Final
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing device. After `threshold` failures in a row
+    the circuit opens and allow() refuses calls for a cooldown. Then one
+    trial call is let through: success closes the circuit, failure opens
+    it again for twice as long, up to max_cooldown_s.
+    """
+    CLOSED: Final = "closed"
+    OPEN: Final = "open"
+    HALF_OPEN: Final = "half-open"
+
+    def __init__(self, threshold: int = 3, cooldown_s: float = 1.0, max_cooldown_s: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param threshold: Failures in a row that open the circuit
+        :param cooldown_s: First time the circuit stays open
+        """
+        self._threshold: Final = threshold
+        self._first_cooldown_s: Final = cooldown_s
+        self._max_cooldown_s: Final = max_cooldown_s
+        self._clock = clock
+        self.state: str = self.CLOSED
+        self.failures: int = 0
+        # Times the circuit has opened
+        self.opened: int = 0
+        self._cooldown_s: float = cooldown_s
+        self._retry_at: float = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may be made now; once the cooldown passes, allows one trial call"""
+        if self.state == self.OPEN:
+            if self._clock() < self._retry_at:
+                return False
+            self.state = self.HALF_OPEN
+        return True
+
+    def success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._cooldown_s = self._first_cooldown_s
+
+    def failure(self) -> bool:
+        """Count a failed call. Returns True if this opened the circuit."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self._cooldown_s = min(self._cooldown_s * 2, self._max_cooldown_s)
+        elif self.failures < self._threshold:
+            return False
+        self.state = self.OPEN
+        self.opened += 1
+        self._retry_at = self._clock() + self._cooldown_s
+        return True
+
+    def retryIn(self) -> float:
+        """Seconds until the next trial call, 0 if calls are allowed"""
+        return max(0.0, self._retry_at - self._clock()) if self.state == self.OPEN else 0.0
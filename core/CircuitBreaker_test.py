@@ -0,0 +1,58 @@
+#  Copyright (c) Eric Draken, 2021.
+from unittest import TestCase
+
+from core.CircuitBreaker import CircuitBreaker
+from core.emulator.ClockEmulator import EmulatedClock
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = EmulatedClock()
+        self.breaker = CircuitBreaker(threshold=3, cooldown_s=1.0, max_cooldown_s=4.0, clock=self.clock)
+
+    def trip(self) -> None:
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.failure()
+
+    def test_opens_after_threshold(self):
+        self.assertFalse(self.breaker.failure())
+        self.assertFalse(self.breaker.failure())
+        self.assertTrue(self.breaker.failure())
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(1.0, self.breaker.retryIn())
+
+    def test_success_resets_count(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        self.breaker.success()
+        self.assertFalse(self.breaker.failure())
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
+    def test_trial_call_closes(self):
+        self.trip()
+        self.clock.now += 1.0
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(CircuitBreaker.HALF_OPEN, self.breaker.state)
+        self.breaker.success()
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.assertEqual(0.0, self.breaker.retryIn())
+
+    def test_failed_trial_backs_off(self):
+        self.trip()
+        for cooldown_s in (2.0, 4.0, 4.0):
+            self.clock.now += 10.0
+            self.assertTrue(self.breaker.allow())
+            # One failed trial reopens the circuit
+            self.assertTrue(self.breaker.failure())
+            self.assertEqual(cooldown_s, self.breaker.retryIn())
+        self.assertEqual(4, self.breaker.opened)
+
+        # A later success starts over from the first cooldown
+        self.clock.now += 10.0
+        self.breaker.allow()
+        self.breaker.success()
+        self.trip()
+        self.assertEqual(1.0, self.breaker.retryIn())
@@ -0,0 +1,50 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import time
+from typing import Callable, Final, Optional
+
+from utils.Types import RGB, RangeInt
+
+
+class ColorChangeFilter:
+    """
+    Dirty check for colors headed to the FadeStick. A color within 'delta'
+    of the last sent color on every channel is suppressed, unless the last
+    transfer is older than 'max_stale_s'.
+    """
+    MAX_DELTA: Final = 255
+
+    def __init__(self, delta: int = 2, max_stale_s: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.delta: Final[int] = RangeInt(delta, 0, self.MAX_DELTA, "delta")
+        self.max_stale_s: Final[float] = max_stale_s
+        self.sent: int = 0
+        self.suppressed: int = 0
+        self._clock = clock
+        self._last_color: Optional[RGB] = None
+        self._last_sent: float = 0.0
+
+    def reset(self) -> None:
+        """Forget the last color so the next one is always sent, e.g. after a reconnect"""
+        self._last_color = None
+
+    def isDirty(self, color: RGB) -> bool:
+        last = self._last_color
+        if last is None or self._clock() - self._last_sent >= self.max_stale_s:
+            return True
+        return (abs(color.red - last.red) > self.delta or
+                abs(color.green - last.green) > self.delta or
+                abs(color.blue - last.blue) > self.delta)
+
+    def shouldSend(self, color: RGB) -> bool:
+        """Dirty check that also counts suppressed colors"""
+        if self.isDirty(color):
+            return True
+        self.suppressed += 1
+        return False
+
+    def markSent(self, color: RGB) -> None:
+        self._last_color = color
+        self._last_sent = self._clock()
+        self.sent += 1
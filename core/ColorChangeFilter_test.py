@@ -0,0 +1,62 @@
+#  Copyright (c) Eric Draken, 2021.
+from unittest import TestCase
+
+from core.ColorChangeFilter import ColorChangeFilter
+from core.emulator.ClockEmulator import EmulatedClock
+from exceptions.NumberExceptions import RangeIntException
+from utils.Types import RGB
+
+
+class TestColorChangeFilter(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = EmulatedClock()
+        self.filter = ColorChangeFilter(delta=2, max_stale_s=30.0, clock=self.clock)
+
+    def send(self, color: RGB) -> bool:
+        if self.filter.shouldSend(color):
+            self.filter.markSent(color)
+            return True
+        return False
+
+    def test_first_color_sent(self):
+        self.assertTrue(self.send(RGB(0, 0, 0)))
+
+    def test_within_delta_suppressed(self):
+        self.send(RGB(10, 245, 0))
+        self.assertFalse(self.send(RGB(12, 243, 0)))
+        self.assertFalse(self.send(RGB(8, 247, 0)))
+        self.assertEqual(2, self.filter.suppressed)
+        self.assertEqual(1, self.filter.sent)
+
+    def test_over_delta_sent(self):
+        self.send(RGB(10, 245, 0))
+        self.assertTrue(self.send(RGB(13, 245, 0)))
+        self.assertTrue(self.send(RGB(13, 245, 3)))
+
+    def test_delta_measured_from_last_sent(self):
+        self.send(RGB(10, 0, 0))
+        self.assertFalse(self.send(RGB(12, 0, 0)))
+        self.assertTrue(self.send(RGB(13, 0, 0)))
+
+    def test_max_staleness(self):
+        self.send(RGB(10, 0, 0))
+        self.clock.now = 29.9
+        self.assertFalse(self.send(RGB(10, 0, 0)))
+        self.clock.now = 30.0
+        self.assertTrue(self.send(RGB(10, 0, 0)))
+
+    def test_reset(self):
+        self.send(RGB(10, 0, 0))
+        self.filter.reset()
+        self.assertTrue(self.send(RGB(10, 0, 0)))
+
+    def test_zero_delta(self):
+        f = ColorChangeFilter(delta=0, clock=self.clock)
+        f.markSent(RGB(1, 1, 1))
+        self.assertFalse(f.shouldSend(RGB(1, 1, 1)))
+        self.assertTrue(f.shouldSend(RGB(1, 1, 2)))
+
+    def test_bad_delta(self):
+        with self.assertRaises(RangeIntException):
+            ColorChangeFilter(delta=-1)
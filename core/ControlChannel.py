@@ -0,0 +1,190 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Final, Optional
+
+
+# REF: https://www.eadan.net/blog/ipc-with-named-pipes/
+def encode_msg_size(size: int) -> bytes:
+    return struct.pack("<I", size)
+
+
+def decode_msg_size(size_bytes: bytes) -> int:
+    return struct.unpack("<I", size_bytes)[0]
+
+
+def create_msg(content: bytes) -> bytes:
+    size = len(content)
+    return encode_msg_size(size) + content
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Control socket closed mid-message")
+        data += chunk
+    return bytes(data)
+
+
+def sendCommand(path: str, command: str, timeout: float = 5.0) -> str:
+    """Send one command to a ControlServer and return its reply"""
+    deadline = time.monotonic() + timeout
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        while True:
+            try:
+                sock.connect(path)
+                break
+            except BlockingIOError:
+                # The listen backlog is full, so wait for the server to accept
+                if time.monotonic() >= deadline:
+                    raise socket.timeout(f"Could not connect to {path}")
+                time.sleep(0.001)
+        sock.sendall(create_msg(command.encode("ascii")))
+        size = decode_msg_size(_recv_exactly(sock, 4))
+        return _recv_exactly(sock, size).decode("ascii")
+
+
+class _Client:
+    def __init__(self) -> None:
+        self.inbound = bytearray()
+        self.outbound = bytearray()
+
+
+class ControlServer:
+    """
+    Length-prefixed request/reply server on an AF_UNIX stream socket. One
+    selector thread serves any number of clients, and a client may keep its
+    connection open and send commands repeatedly.
+    """
+    MAX_MSG_SIZE: Final = 64 * 1024
+    MODE: Final = 0o600
+    _RECV_SIZE: Final = 4096
+
+    _log: Final = logging.getLogger("control")
+
+    def __init__(self, path: str, handler: Callable[[str], str]) -> None:
+        self.path: Final[str] = path
+        self._handler = handler
+        self._sock: Optional[socket.socket] = None
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake_r: int = -1
+        self._wake_w: int = -1
+
+    def start(self) -> None:
+        # A stale socket is left behind if the daemon was killed
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        # Only the daemon's user may send commands; DaemonContext sets a umask
+        # of 0. Nobody can connect before listen(), so there is no window.
+        os.chmod(self.path, self.MODE)
+        self._sock.listen(socket.SOMAXCONN)
+        self._sock.setblocking(False)
+        self._wake_r, self._wake_w = os.pipe()
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._sock, selectors.EVENT_READ)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._serve, name="control", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self._thread:
+            return
+        os.write(self._wake_w, b"\0")
+        self._thread.join()
+        self._thread = None
+        for key in list(self._selector.get_map().values()):
+            if isinstance(key.fileobj, socket.socket):
+                key.fileobj.close()
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    # Internals #
+
+    def _serve(self) -> None:
+        while True:
+            for key, mask in self._selector.select():
+                if key.fileobj == self._wake_r:
+                    return
+                if key.fileobj is self._sock:
+                    self._accept()
+                else:
+                    self._service(key.fileobj, key.data, mask)
+
+    def _accept(self) -> None:
+        # Drain the backlog so waiting clients are not refused
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            conn.setblocking(False)
+            self._selector.register(conn, selectors.EVENT_READ, _Client())
+
+    def _close(self, conn: socket.socket) -> None:
+        self._selector.unregister(conn)
+        conn.close()
+
+    def _service(self, conn: socket.socket, client: _Client, mask: int) -> None:
+        try:
+            if mask & selectors.EVENT_READ:
+                data = conn.recv(self._RECV_SIZE)
+                if not data:
+                    self._close(conn)
+                    return
+                client.inbound += data
+                if not self._dispatch(client):
+                    self._close(conn)
+                    return
+
+            if client.outbound:
+                sent = conn.send(client.outbound)
+                del client.outbound[:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._close(conn)
+            return
+
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbound else 0)
+        self._selector.modify(conn, events, client)
+
+    def _dispatch(self, client: _Client) -> bool:
+        """Answer every complete request. Returns False on a bad frame."""
+        inbound = client.inbound
+        while len(inbound) >= 4:
+            size = decode_msg_size(bytes(inbound[:4]))
+            if size > self.MAX_MSG_SIZE:
+                self._log.error(f"Control message too large: {size}")
+                return False
+            if len(inbound) < 4 + size:
+                break
+            command = inbound[4:4 + size].decode("ascii", "replace")
+            del inbound[:4 + size]
+            try:
+                reply = self._handler(command)
+            except Exception as e:
+                reply = f"Error: {e}"
+            client.outbound += create_msg(reply.encode("ascii", "replace"))
+        return True
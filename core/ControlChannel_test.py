@@ -0,0 +1,125 @@
+#  Copyright (c) Eric Draken, 2021.
+import os
+import socket
+import tempfile
+import threading
+from unittest import TestCase
+
+from core.CPUDaemon import CPUDaemon, DaemonException
+from core.ControlChannel import ControlServer, sendCommand, create_msg, decode_msg_size, \
+    encode_msg_size
+from exceptions.NumberExceptions import RangeIntException
+
+
+class TestControlChannel(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "test.sock")
+        self.server = ControlServer(self.path, self.handle)
+        self.server.start()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.server.stop()
+        self.dir.cleanup()
+
+    @staticmethod
+    def handle(command: str) -> str:
+        if command == "boom":
+            raise ValueError("bad")
+        return command.upper()
+
+    def test_framing(self):
+        self.assertEqual(5, decode_msg_size(encode_msg_size(5)))
+        self.assertEqual(b"\x02\x00\x00\x00hi", create_msg(b"hi"))
+
+    def test_command(self):
+        self.assertEqual("STATUS", sendCommand(self.path, "status"))
+
+    def test_handler_error(self):
+        self.assertEqual("Error: bad", sendCommand(self.path, "boom"))
+
+    def test_persistent_connection(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(self.path)
+            # Two requests in one write, answered in order
+            sock.sendall(create_msg(b"one") + create_msg(b"two"))
+            replies = b""
+            while len(replies) < 14:
+                replies += sock.recv(64)
+            self.assertEqual(create_msg(b"ONE") + create_msg(b"TWO"), replies)
+
+    def test_concurrent_clients(self):
+        results = {}
+
+        def client(n: int):
+            results[n] = [sendCommand(self.path, f"c{n}-{i}") for i in range(5)]
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual({n: [f"C{n}-{i}" for i in range(5)] for n in range(20)}, results)
+
+    def test_oversize_message_closes(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(self.path)
+            sock.sendall(encode_msg_size(ControlServer.MAX_MSG_SIZE + 1))
+            self.assertEqual(b"", sock.recv(4))
+        self.assertEqual("OK", sendCommand(self.path, "ok"))
+
+    def test_owner_only(self):
+        old_umask = os.umask(0)
+        try:
+            self.server.stop()
+            self.server.start()
+        finally:
+            os.umask(old_umask)
+        self.assertEqual(0o600, os.stat(self.path).st_mode & 0o777)
+
+    def test_stop_removes_socket(self):
+        self.server.stop()
+        self.assertFalse(os.path.exists(self.path))
+        self.server.start()
+
+
+class TestDaemonControl(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.daemon = CPUDaemon()
+
+    def test_status(self):
+        self.assertEqual("Daemon running, but FadeStick not present.", self.daemon._control("status"))
+
+    def test_metrics(self):
+        metrics = dict(line.split(" ") for line in self.daemon._control("metrics").splitlines())
+        self.assertEqual("1000", metrics["period_ms"])
+        self.assertEqual("0", metrics["fs_present"])
+
+    def test_set_period(self):
+        self.assertEqual("Period set to 500 ms.", self.daemon._control("set-period 500"))
+        self.assertEqual(0.5, self.daemon._scheduler.period_s)
+
+    def test_adapted_period(self):
+        for _ in range(4):
+            self.daemon._adapt(0.5)
+        self.assertEqual("1", dict(l.split(" ") for l in self.daemon._control("metrics").splitlines())["adaptations"])
+        self.assertEqual(2.0, self.daemon._scheduler.period_s)
+        self.daemon._control("set-period 250")
+        self.assertEqual(0.25, self.daemon._scheduler.period_s)
+
+    def test_set_period_too_long(self):
+        with self.assertRaises(RangeIntException):
+            self.daemon._control("set-period 100000")
+
+    def test_unknown(self):
+        self.assertEqual("Unknown command: dance", self.daemon._control("dance"))
+
+    def test_psi_mode_metric(self):
+        self.assertIn("metric psi-full", CPUDaemon(psi="full")._control("metrics"))
+        with self.assertRaises(DaemonException):
+            CPUDaemon(psi="most")
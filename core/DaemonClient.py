@@ -0,0 +1,145 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import time
+from typing import Final, Optional
+
+from constants.DaemonConsts import KILL_GRACE_S, PID_PATH, SOCKET_PATH
+from core.ControlChannel import sendCommand
+
+
+class DaemonClient:
+    """
+    The commands that talk to a running daemon. They need only its pidfile
+    and control socket, so this imports neither python-daemon, pyusb nor
+    the device code, and does not connect to syslog. Health checks that
+    call `status` every few seconds start as fast as the interpreter.
+    """
+    # Give stop a chance to be graceful before a kill
+    KILL_GRACE_S: Final = KILL_GRACE_S
+    # Waiting for the daemon to exit polls with exponential backoff
+    FIRST_POLL_S: Final = 0.01
+    MAX_POLL_S: Final = 0.25
+
+    _log: Final = logging.getLogger("main")
+
+    def __init__(self, pidpath: str = PID_PATH, socket_path: str = SOCKET_PATH) -> None:
+        self._pidpath: Final = pidpath
+        self._socket_path: Final = socket_path
+
+    def readPid(self) -> Optional[int]:
+        """The PID in the pidfile, as PIDLockFile reads it, or None"""
+        try:
+            with open(self._pidpath, "r") as f:
+                return int(f.readline().strip())
+        except (OSError, ValueError):
+            return None
+
+    def breakLock(self) -> None:
+        try:
+            os.remove(self._pidpath)
+        except FileNotFoundError:
+            pass
+
+    def stop(self) -> str:
+        self._log.info("Daemon stop requested")
+        pid = self.readPid()
+        if not pid:
+            return "Daemon already stopped."
+
+        # The daemon will close the PID file itself
+        try:
+            self._log.debug(f"Sending {signal.SIGINT.name} to PID {pid}")
+            os.kill(pid, signal.SIGINT)
+            return "Daemon stopping."
+        except ProcessLookupError:
+            # Remove the lock file with prejudice
+            self.breakLock()
+            return "Daemon not running or was killed."
+        except Exception as e:
+            self._log.error(f"Daemon stop error: {e}")
+            # No return message on purpose
+
+    def waitForExit(self, timeout_s: float = KILL_GRACE_S) -> bool:
+        """Poll until the daemon in the pidfile has exited. Returns False if it is still running after timeout_s."""
+        deadline = time.monotonic() + timeout_s
+        poll_s = self.FIRST_POLL_S
+        while True:
+            pid = self.readPid()
+            if not pid:
+                return True
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                # Gone without removing its pidfile
+                self.breakLock()
+                return True
+            except PermissionError:
+                # Running as another user
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(poll_s, remaining))
+            poll_s = min(poll_s * 2, self.MAX_POLL_S)
+
+    def kill(self) -> str:
+        if not self.readPid():
+            return "Daemon not running."
+
+        # Try to gracefully stop first
+        self.stop()
+        if self.waitForExit(self.KILL_GRACE_S):
+            return "Daemon stopped."
+        pid = self.readPid()
+        if not pid:
+            return "Daemon stopped."
+
+        self._log.info(f"Daemon kill requested for pid {pid}")
+        # Will remove the PID file after
+        try:
+            self._log.debug(f"Sending {signal.SIGKILL.name} to PID {pid}")
+            os.kill(pid, signal.SIGKILL)
+            return "Daemon was killed."
+        except Exception as e:
+            self._log.error(f"Daemon kill error: {e}")
+        finally:
+            # Remove the lock file with prejudice
+            self.breakLock()
+
+    def status(self) -> str:
+        self._log.info("Daemon status requested")
+        return self._send("status")
+
+    def metrics(self) -> str:
+        self._log.info("Daemon metrics requested")
+        return self._send("metrics")
+
+    def set_period(self, period_ms: int) -> str:
+        self._log.info(f"Daemon period change to {period_ms} ms requested")
+        return self._send(f"set-period {period_ms}")
+
+    # Internals #
+
+    def _send(self, command: str) -> str:
+        pid = self.readPid()
+        if not pid:
+            return "Daemon not running."
+
+        try:
+            return sendCommand(self._socket_path, command)
+        except (FileNotFoundError, ConnectionRefusedError):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                # Remove the lock file with prejudice
+                self.breakLock()
+                return "Daemon not running or was killed."
+            self._log.error("Daemon control socket is not available.")
+        except OSError as e:
+            self._log.error(f"Daemon did not respond in time: {e}")
+        finally:
+            self._log.debug(f"Finished {command} request")
@@ -0,0 +1,99 @@
+#  Copyright (c) Eric Draken, 2021.
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from core.ControlChannel import ControlServer
+from core.DaemonClient import DaemonClient
+
+
+class TestDaemonClient(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.pidpath = os.path.join(self.dir.name, "test.pid")
+        self.socket_path = os.path.join(self.dir.name, "test.sock")
+        self.client = DaemonClient(self.pidpath, self.socket_path)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.dir.cleanup()
+
+    def writePid(self, pid: int) -> None:
+        with open(self.pidpath, "w") as f:
+            f.write(f"{pid}\n")
+
+    def test_not_running(self):
+        self.assertIsNone(self.client.readPid())
+        self.assertEqual("Daemon not running.", self.client.status())
+        self.assertEqual("Daemon already stopped.", self.client.stop())
+
+    def test_stale_pidfile(self):
+        # A PID that cannot exist, left behind by a killed daemon
+        self.writePid(2 ** 22 + 1)
+        self.assertEqual("Daemon not running or was killed.", self.client.status())
+        self.assertFalse(os.path.exists(self.pidpath))
+
+    def spawn(self, on_sigint: str) -> subprocess.Popen:
+        """A stand-in daemon that has written its pidfile"""
+        script = ("import signal, sys, time; "
+                  f"signal.signal(signal.SIGINT, {on_sigint}); print(flush=True); time.sleep(30)")
+        process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE)
+        process.stdout.readline()
+        self.addCleanup(process.stdout.close)
+        self.addCleanup(process.kill)
+        # Reaped at once, as init reaps the detached daemon
+        threading.Thread(target=process.wait, daemon=True).start()
+        self.writePid(process.pid)
+        return process
+
+    def test_kill_returns_once_stopped(self):
+        self.spawn("lambda *_: sys.exit(0)")
+        start = time.monotonic()
+        self.assertEqual("Daemon stopped.", self.client.kill())
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertIsNone(self.client.readPid())
+        self.assertEqual("Daemon not running.", self.client.kill())
+
+    def test_kill_after_grace(self):
+        process = self.spawn("signal.SIG_IGN")
+        self.client.KILL_GRACE_S = 0.2
+        start = time.monotonic()
+        self.assertEqual("Daemon was killed.", self.client.kill())
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual(-signal.SIGKILL, process.wait(5))
+        self.assertIsNone(self.client.readPid())
+
+    def test_wait_for_exit(self):
+        self.spawn("signal.SIG_IGN")
+        self.assertFalse(self.client.waitForExit(0.1))
+        self.writePid(2 ** 22 + 1)
+        self.assertTrue(self.client.waitForExit(0.1))
+        self.assertFalse(os.path.exists(self.pidpath))
+
+    def test_status(self):
+        self.writePid(os.getpid())
+        server = ControlServer(self.socket_path, lambda command: f"{command} ok")
+        server.start()
+        try:
+            self.assertEqual("status ok", self.client.status())
+            self.assertEqual("set-period 250 ok", self.client.set_period(250))
+        finally:
+            server.stop()
+
+
+class TestLazyStartup(TestCase):
+    def test_client_commands_skip_daemon_imports(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        script = ("import sys, main; main.client(); "
+                  "print(','.join(m for m in ('core.CPUDaemon', 'daemon', 'usb', 'multipledispatch') "
+                  "if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", script], cwd=root,
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(0, result.returncode, result.stderr)
+        self.assertEqual("", result.stdout.strip())
@@ -0,0 +1,63 @@
+#  Copyright (c) Eric Draken, 2021.
+"""
+Prometheus text exposition format, version 0.0.4. Each helper yields
+lines, so a scrape is written out as it is rendered.
+"""
+from __future__ import annotations
+
+from typing import Dict, Final, Iterator, Mapping, Optional, Union
+
+from core.LatencyHistogram import LatencyHistogram
+
+CONTENT_TYPE: Final = "text/plain; version=0.0.4; charset=utf-8"
+
+Number = Union[int, float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: Optional[Mapping[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _value(value: Number) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def header(name: str, kind: str, help_text: str) -> Iterator[str]:
+    yield f"# HELP {name} {help_text}\n"
+    yield f"# TYPE {name} {kind}\n"
+
+
+def sample(name: str, value: Number, labels: Optional[Mapping[str, str]] = None) -> str:
+    return f"{name}{_labels(labels)} {_value(value)}\n"
+
+
+def gauge(name: str, help_text: str, value: Number,
+          labels: Optional[Mapping[str, str]] = None) -> Iterator[str]:
+    yield from header(name, "gauge", help_text)
+    yield sample(name, value, labels)
+
+
+def counter(name: str, help_text: str, value: Number) -> Iterator[str]:
+    yield from header(name, "counter", help_text)
+    yield sample(name, value)
+
+
+def histogram(name: str, help_text: str, label: str,
+              histograms: Dict[str, LatencyHistogram]) -> Iterator[str]:
+    """One histogram family, labelled by the keys of histograms"""
+    yield from header(name, "histogram", help_text)
+    for key, h in histograms.items():
+        # The +Inf bucket must equal _count, so read them together
+        buckets, total_s, count = h.snapshot()
+        for bound, n in buckets:
+            yield sample(f"{name}_bucket", n, {label: key, "le": _value(bound)})
+        yield sample(f"{name}_sum", total_s, {label: key})
+        yield sample(f"{name}_count", count, {label: key})
@@ -1,14 +1,15 @@
 #  Copyright (c) Eric Draken, 2021.
 from __future__ import annotations
 
-from math import floor
-from typing import Final
+from typing import Final, Iterable
 
 from constants.FadeStickConsts import FS_MODE_PATTERN
 from core.FadeStickBase import FadeStickBase
+from core.pattern.GradientEngine import GRADIENTS
 from core.pattern.Pattern import Pattern, ColorDuration
+from core.pattern.PatternStreamer import PatternStreamer, Step
 from utils.Colors import OFF
-from utils.Types import RGB, RangeInt
+from utils.Types import RGB, RangeInt, checkRange
 
 
 class FadeStick(FadeStickBase):
@@ -25,7 +26,7 @@ class FadeStick(FadeStickBase):
         return string
 
     def __init__(self, fs: FadeStickBase):
-        super().__init__(fs.device)
+        super().__init__(fs.device, fs.serial)
 
     def _get_buffer_bytes(self):
         from core.FadeStickUSB import sendControlTransfer, R_USB_RECV, R_SET_CONFIG
@@ -47,27 +48,29 @@ class FadeStick(FadeStickBase):
                 pattern.addColorAndDuration(OFF, delay_ms)
             pattern.addColorAndDuration(color, delay_ms)
         pattern.addColorAndDuration(OFF, 0)
+        self._sendPattern(pattern)
 
-        from core.FadeStickUSB import sendControlTransfer, R_USB_SEND, R_SET_CONFIG
-        sendControlTransfer(self, R_USB_SEND, R_SET_CONFIG, FS_MODE_PATTERN, pattern.getBytePattern())
-
-    # noinspection DuplicatedCode
     def morph(self, end_color: RGB, duration: int = 1000, steps: int = MAX_STEPS) -> None:
-        duration = RangeInt(duration, 1, self.MAX_DURATION, "duration")
-        steps = RangeInt(steps, 1, self.MAX_STEPS, "steps")
-
-        r_end, g_end, b_end = end_color
-        start_color = self.getColor()
-        r_start, g_start, b_start = start_color
-        pattern: Pattern = Pattern()
-        ms_delay = floor(float(duration) / float(steps))
-
-        for n in range(0, steps):  # Range is exclusive
-            d = 1.0 * (n + 1) / float(steps)
-            r = (r_start * (1 - d)) + (r_end * d)
-            g = (g_start * (1 - d)) + (g_end * d)
-            b = (b_start * (1 - d)) + (b_end * d)
-            pattern.addColorAndDuration(RGB(int(r), int(g), int(b)), ms_delay)
-
+        # Called every tick, so validate without building RangeInts
+        duration = checkRange(duration, 1, self.MAX_DURATION, "duration")
+        steps = checkRange(steps, 1, self.MAX_STEPS, "steps")
+        # Once, so the trusted steps of the fade are built between valid colors
+        end_color = RGB(*end_color)
+
+        # steps is an upper bound: a short or narrow fade needs fewer entries
+        pattern = GRADIENTS.keyframePattern(self.getColor(), end_color, duration, steps)
+        self._sendPattern(pattern)
+
+    def play(self, animation: Iterable[Step]) -> int:
+        """
+        Play an animation longer than one pattern buffer, gaplessly.
+        Returns the number of transfers it took.
+        """
+        return PatternStreamer(self).play(animation)
+
+    def _sendPattern(self, pattern: Pattern) -> None:
         from core.FadeStickUSB import sendControlTransfer, R_USB_SEND, R_SET_CONFIG
-        sendControlTransfer(self, R_USB_SEND, R_SET_CONFIG, FS_MODE_PATTERN, pattern.getBytePattern())
+        sendControlTransfer(self, R_USB_SEND, R_SET_CONFIG, FS_MODE_PATTERN, pattern.getTransferBuffer())
+        if len(pattern):
+            # The device holds the last entry once the pattern drains
+            self._color = pattern.getLastColor()
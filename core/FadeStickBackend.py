@@ -0,0 +1,56 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+from typing import Hashable, Iterable
+
+import usb.core
+import usb.util
+
+from constants.FadeStickConsts import FS_VENDOR_ID, FS_PRODUCT_ID, FS_MESSAGE_ID, FS_READ_TIMEOUT_MS
+from core.HotplugWatcher import HotplugWatcher
+from utils.Decorators import abstract
+from utils.Types import USBDevice
+
+
+class Backend(object):
+    """
+    Source of FadeStick device handles. A handle must provide the subset of
+    the pyusb Device API this project uses: ctrl_transfer(),
+    is_kernel_driver_active() and detach_kernel_driver().
+    """
+
+    @abstract
+    def findDevices(self) -> Iterable[USBDevice]:
+        ...
+
+    @abstract
+    def getString(self, device: USBDevice, index: int) -> str:
+        ...
+
+    def getDeviceKey(self, device: USBDevice) -> Hashable:
+        """Identity of a handle across enumerations, without touching the device"""
+        return id(device)
+
+    def openHotplug(self) -> HotplugWatcher:
+        """Events of sticks being attached or detached. Raises OSError if there are none to watch."""
+        raise OSError(f"{self.__class__.__name__} does not report hotplug events")
+
+
+class PyUSBBackend(Backend):
+    """Real FadeSticks on the USB bus via pyusb"""
+
+    def findDevices(self) -> Iterable[USBDevice]:
+        for device in usb.core.find(find_all=True, idVendor=FS_VENDOR_ID, idProduct=FS_PRODUCT_ID):
+            # String descriptors are read with the device's default timeout
+            device.default_timeout = FS_READ_TIMEOUT_MS
+            yield device
+
+    def getString(self, device: USBDevice, index: int) -> str:
+        return usb.util.get_string(device, index, FS_MESSAGE_ID)
+
+    def getDeviceKey(self, device: USBDevice) -> Hashable:
+        # A re-plugged device gets a new address
+        return device.bus, device.address
+
+    def openHotplug(self) -> HotplugWatcher:
+        return HotplugWatcher(FS_VENDOR_ID, FS_PRODUCT_ID)
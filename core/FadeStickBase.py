@@ -1,7 +1,7 @@
 #  Copyright (c) Eric Draken, 2021.
 from __future__ import annotations
 
-from typing import Final
+from typing import Final, Optional
 
 from multipledispatch import dispatch
 
@@ -17,28 +17,47 @@ class FadeStickBase(object):
     serial: str = ""
     device: USBDevice = None
     inverse: bool = False
+    # Last committed color, or None when the device must be asked
+    _color: Optional[RGB] = None
 
-    def __init__(self, device: USBDevice = None):
+    def __init__(self, device: USBDevice = None, serial: Optional[str] = None):
+        """
+        :param serial: The device's serial if already known, which saves reading it again
+        """
         if device:
-            from core.FadeStickUSB import openUSBDevice, getUSBString
-            self.device: Final = device
+            from core.FadeStickUSB import openUSBDevice, _getUSBString
+            self.device = device
             openUSBDevice(device)
-            self.serial: Final = getUSBString(device, FS_SERIAL_INDEX)
+            self.serial: Final = serial if serial else _getUSBString(device, FS_SERIAL_INDEX)
+
+    def setDevice(self, device: USBDevice) -> None:
+        """Replace a stale handle with a rediscovered one for the same serial"""
+        from core.FadeStickUSB import openUSBDevice
+        openUSBDevice(device)
+        self.device = device
+        # A re-enumerated device may have been reset
+        self._color = None
+
+    # Dispatch happens once, at the public API. Each overload, and every
+    # internal caller, goes straight to _setRGB().
 
     @dispatch(str)
     def setColor(self, name_or_hex: str) -> RGB:
         try:
-            return self.setColor(hexToRGB(colorToHex(name_or_hex)))
+            return self._setRGB(hexToRGB(colorToHex(name_or_hex)))
         except FadeStickColorException:
-            return self.setColor(hexToRGB(name_or_hex))
+            return self._setRGB(hexToRGB(name_or_hex))
 
     @dispatch(int, int, int)
     def setColor(self, red: int, green: int, blue: int) -> RGB:
-        return self.setColor(RGB(red, green, blue))
+        return self._setRGB(RGB(red, green, blue))
 
-    # noinspection PyBroadException
     @dispatch(RGB)
     def setColor(self, rgb: RGB) -> RGB:
+        return self._setRGB(rgb)
+
+    def _setRGB(self, rgb: RGB) -> RGB:
+        color = rgb
         if self.inverse:
             rgb: RGB = invertRGB(rgb)
 
@@ -46,16 +65,33 @@ class FadeStickBase(object):
 
         from core.FadeStickUSB import sendControlTransfer, R_USB_SEND, R_SET_CONFIG
         sendControlTransfer(self, R_USB_SEND, R_SET_CONFIG, FS_MODE_COLOR, payload)
+        self._color = color
         return rgb
 
     def turnOff(self) -> None:
-        self.setColor(Colors.OFF)
-
-    def getColor(self) -> RGB:
+        self._setRGB(Colors.OFF)
+
+    def getColor(self, fresh: bool = False) -> RGB:
+        """
+        Return the last committed color, which for a pattern is its end color.
+        With fresh, read what the device shows right now without caching it.
+        """
+        if fresh:
+            return self._readColor()
+        if self._color is None:
+            self._color = self._readColor()
+        return self._color
+
+    def resync(self) -> RGB:
+        """Replace the cached color with the one on the device"""
+        self._color = self._readColor()
+        return self._color
+
+    def _readColor(self) -> RGB:
         from core.FadeStickUSB import sendControlTransfer, R_USB_RECV, R_CLEAR_FEATURE
         device_bytes = sendControlTransfer(self, R_USB_RECV, R_CLEAR_FEATURE,
                                            FS_MODE_COLOR, dataOrLength=4)
-        rgb = RGB(device_bytes[1], device_bytes[2], device_bytes[3])
+        rgb = RGB.trusted(device_bytes[1], device_bytes[2], device_bytes[3])
         return invertRGB(rgb) if self.inverse else rgb
 
     def isOff(self) -> bool:
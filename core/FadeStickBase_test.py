@@ -46,19 +46,19 @@ class TestFadeStickBase(TestCase):
     def test_get_color_black(self):
         rgb = self.device.setColor(0, 0, 0)
         self.assertEqual(RGB(0, 0, 0), rgb)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(RGB(0, 0, 0), curr_rgb)
 
     def test_get_color_white(self):
         rgb = self.device.setColor(255, 255, 255)
         self.assertEqual(RGB(255, 255, 255), rgb)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(RGB(255, 255, 255), curr_rgb)
 
     def test_get_color_mixed(self):
         rgb = self.device.setColor(10, 20, 30)
         self.assertEqual(RGB(10, 20, 30), rgb)
-        curr_rgb = self.device.getColor()
+        curr_rgb = self.device.getColor(fresh=True)
         self.assertEqual(RGB(10, 20, 30), curr_rgb)
 
     def test_try_all_colors(self):
@@ -72,7 +72,7 @@ class TestFadeStickBase(TestCase):
                     lambda color=k: None if (
                         self.log.info(f"Testing color {color}"),
                         setRGB := self.device.setColor(color),
-                        getRGB := self.device.getColor(),
+                        getRGB := self.device.getColor(fresh=True),
                         self.assertEqual(setRGB, getRGB, f"Testing color {color}"),
                         time.sleep(0.2)  # Pleasing delay_ms to see the colors
                     ) else None)
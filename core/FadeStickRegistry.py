@@ -0,0 +1,95 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from constants.FadeStickConsts import FS_SERIAL_INDEX
+from core.FadeStickBackend import Backend
+from utils.Types import USBDevice
+
+
+class FadeStickRegistry:
+    """
+    Device handles indexed by serial. The bus is enumerated once, then kept
+    up to date incrementally: a rescan only reads the serial string
+    descriptor of handles it has not seen before, and lookups are O(1).
+    """
+
+    def __init__(self, backend: Backend) -> None:
+        self._backend: Backend = backend
+        self._by_serial: Dict[str, USBDevice] = {}
+        self._by_key: Dict[Hashable, str] = {}
+        self._filled: bool = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._by_serial)
+
+    def __contains__(self, serial: str) -> bool:
+        return serial in self._by_serial
+
+    def add(self, serial: str, device: USBDevice) -> None:
+        with self._lock:
+            self._index(serial, device)
+
+    def remove(self, serial: str) -> Optional[USBDevice]:
+        with self._lock:
+            return self._drop(serial)
+
+    def get(self, serial: str) -> Optional[USBDevice]:
+        """Return the indexed handle, filling the registry on first use"""
+        if not self._filled:
+            self.refresh()
+        return self._by_serial.get(serial)
+
+    def serials(self) -> List[str]:
+        return list(self._by_serial.keys())
+
+    def items(self) -> List[Tuple[str, USBDevice]]:
+        """(serial, handle) pairs in the order they were found"""
+        with self._lock:
+            return list(self._by_serial.items())
+
+    def refresh(self) -> None:
+        """Sync with the bus, reading serials of new handles only"""
+        with self._lock:
+            self._scan()
+
+    def rediscover(self, serial: str) -> Optional[USBDevice]:
+        """Invalidate a stale handle and return a fresh one, if the device is still attached"""
+        with self._lock:
+            self._drop(serial)
+            self._scan()
+            return self._by_serial.get(serial)
+
+    # Internals #
+
+    def _index(self, serial: str, device: USBDevice) -> None:
+        self._drop(serial)
+        self._by_serial[serial] = device
+        self._by_key[self._backend.getDeviceKey(device)] = serial
+
+    def _drop(self, serial: str) -> Optional[USBDevice]:
+        device = self._by_serial.pop(serial, None)
+        if device is not None:
+            self._by_key.pop(self._backend.getDeviceKey(device), None)
+        return device
+
+    def _scan(self) -> None:
+        seen = set()
+        for device in self._backend.findDevices():
+            key = self._backend.getDeviceKey(device)
+            seen.add(key)
+            if key in self._by_key:
+                continue
+            try:
+                self._index(self._backend.getString(device, FS_SERIAL_INDEX), device)
+            except Exception:
+                # Unreadable handles are retried on the next scan
+                seen.discard(key)
+
+        # Forget handles that left the bus
+        for key in [k for k in self._by_key if k not in seen]:
+            self._by_serial.pop(self._by_key.pop(key), None)
+        self._filled = True
@@ -0,0 +1,105 @@
+#  Copyright (c) Eric Draken, 2021.
+from unittest import TestCase
+
+from core.FadeStickBase import FadeStickBase
+from core.FadeStickRegistry import FadeStickRegistry
+from core.FadeStickUSB import setBackend, getRegistry, findFadeStickBySerial, findAllFadeSticks, \
+    findFirstFadeStick
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+from exceptions.FadeStickUSBException import FadeStickUSBException
+from utils.Colors import RED
+
+
+class TestFadeStickRegistry(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.devices = [EmulatedFadeStick(serial=f"BS{n:06d}-1.5") for n in range(30)]
+        self.backend = EmulatorBackend(self.devices)
+        self.registry = FadeStickRegistry(self.backend)
+
+    def string_reads(self) -> int:
+        return sum(d.string_reads for d in self.backend.devices())
+
+    def test_filled_once(self):
+        self.assertIs(self.devices[3], self.registry.get("BS000003-1.5"))
+        self.assertEqual(30, len(self.registry))
+        self.assertEqual(30, self.string_reads())
+
+        self.registry.get("BS000007-1.5")
+        self.registry.refresh()
+        self.assertEqual(30, self.string_reads())
+
+    def test_unknown_serial(self):
+        self.assertIsNone(self.registry.get("nope"))
+
+    def test_rediscover_reads_only_new_handles(self):
+        self.registry.refresh()
+        serial = self.devices[5].serial_number
+        self.backend.detach(serial)
+        fresh = self.backend.attach(EmulatedFadeStick(serial=serial))
+
+        self.assertIs(fresh, self.registry.rediscover(serial))
+        self.assertEqual(1, fresh.string_reads)
+        self.assertEqual(30, sum(d.string_reads for d in self.devices))
+
+    def test_rediscover_removed(self):
+        self.registry.refresh()
+        serial = self.devices[0].serial_number
+        self.backend.detach(serial)
+        self.assertIsNone(self.registry.rediscover(serial))
+        self.assertNotIn(serial, self.registry)
+        self.assertEqual(29, len(self.registry))
+
+    def test_add_remove(self):
+        device = EmulatedFadeStick(serial="BS999999-1.5")
+        self.registry.add(device.serial_number, device)
+        self.assertIn(device.serial_number, self.registry)
+        self.assertIs(device, self.registry.remove(device.serial_number))
+        self.assertNotIn(device.serial_number, self.registry)
+
+
+class TestRegistryReconnect(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.stale = EmulatedFadeStick()
+        self.backend = EmulatorBackend([self.stale])
+        self.previous = setBackend(self.backend)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        setBackend(self.previous)
+
+    def test_retry_uses_fresh_handle(self):
+        fs = findFadeStickBySerial(self.stale.serial_number)
+        self.backend.detach(self.stale.serial_number)
+        fresh = self.backend.attach(EmulatedFadeStick())
+
+        fs.setColor(RED)
+        self.assertIs(fresh, fs.device)
+        self.assertEqual(RED, fs.getColor(fresh=True))
+        self.assertIs(fresh, getRegistry().get(fs.serial))
+
+    def test_retry_device_gone(self):
+        fs = FadeStickBase(device=self.stale)
+        self.backend.detach(self.stale.serial_number)
+        with self.assertRaises(FadeStickUSBException):
+            fs.setColor(RED)
+
+
+class TestFindFromRegistry(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.devices = [EmulatedFadeStick(serial=f"BS{n:06d}-1.5") for n in range(5)]
+        self.previous = setBackend(EmulatorBackend(self.devices))
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        setBackend(self.previous)
+
+    def test_serials_read_once(self):
+        self.assertEqual([d.serial_number for d in self.devices], [fs.serial for fs in findAllFadeSticks()])
+        self.assertEqual("BS000000-1.5", findFirstFadeStick().serial)
+        findAllFadeSticks()
+        self.assertEqual([1] * 5, [d.string_reads for d in self.devices])
+        self.assertIs(self.devices[2], getRegistry().get("BS000002-1.5"))
+
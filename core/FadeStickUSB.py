@@ -1,14 +1,18 @@
 #  Copyright (c) Eric Draken, 2021.
 from __future__ import annotations
 
-from typing import Optional, List, Final, Union
+import os
+from array import array
+from typing import Iterable, List, Final, Optional, Union
 
 import usb
 from multipledispatch import dispatch
 
-from constants.FadeStickConsts import FS_VENDOR_ID, FS_PRODUCT_ID, FS_MESSAGE_ID, \
-    FS_SERIAL_INDEX, FS_MANUFACTURER_INDEX, FS_DESCRIPTION_INDEX
+from constants.FadeStickConsts import FS_MANUFACTURER_INDEX, FS_DESCRIPTION_INDEX, \
+    FS_WRITE_TIMEOUT_MS, FS_READ_TIMEOUT_MS
+from core.FadeStickBackend import Backend, PyUSBBackend
 from core.FadeStickBase import FadeStickBase
+from core.FadeStickRegistry import FadeStickRegistry
 from exceptions.FadeStickUSBException import FadeStickUSBException
 from utils.Types import USBDevice
 
@@ -24,6 +28,37 @@ R_USB_RECV: Final = RT_DEVICE_TO_HOST | RT_TYPE_VENDOR
 R_SET_CONFIG: Final = 0x9
 R_CLEAR_FEATURE: Final = 0x1
 
+# Set to "emulator" to use an in-process software FadeStick
+BACKEND_ENV: Final = "FADESTICK_BACKEND"
+
+
+def _defaultBackend() -> Backend:
+    if os.environ.get(BACKEND_ENV, "").strip().lower() == "emulator":
+        from core.emulator.FadeStickEmulator import EmulatorBackend
+        return EmulatorBackend()
+    return PyUSBBackend()
+
+
+_backend: Backend = _defaultBackend()
+_registry: FadeStickRegistry = FadeStickRegistry(_backend)
+
+
+def getBackend() -> Backend:
+    return _backend
+
+
+def setBackend(backend: Backend) -> Backend:
+    """Swap the device backend and return the previous one"""
+    global _backend, _registry
+    previous = _backend
+    _backend = backend
+    _registry = FadeStickRegistry(backend)
+    return previous
+
+
+def getRegistry() -> FadeStickRegistry:
+    return _registry
+
 
 def setUSBUDevRule():
     try:
@@ -44,54 +79,66 @@ def setUSBUDevRule():
 
 
 def findAllFadeSticks() -> List[FadeStickBase]:
-    results: List[FadeStickBase] = []
-    for d in _findFadeSticksAsGenerator():
-        results.extend([FadeStickBase(device=d)])
-    return results
+    # Only handles the registry has not seen have their serials read
+    _registry.refresh()
+    return [FadeStickBase(device=d, serial=serial) for serial, d in _registry.items()]
 
 
 def findFirstFadeStick() -> FadeStickBase:
-    for d in _findFadeSticksAsGenerator():
-        return FadeStickBase(device=d)
+    _registry.refresh()
+    for serial, d in _registry.items():
+        return FadeStickBase(device=d, serial=serial)
 
     raise FadeStickUSBException("No FadeSticks found")
 
 
 def findFadeStickBySerial(serial: str) -> FadeStickBase:
-    devices: List[USBDevice] = []
-    for d in _findFadeSticksAsGenerator():
-        try:
-            if usb.util.get_string(d, FS_SERIAL_INDEX, FS_MESSAGE_ID) == serial:
-                devices = [d]
-                break
-        except Exception as e:
-            print("{0}".format(e))
+    device = _registry.get(serial)
+    if device is None:
+        device = _registry.rediscover(serial)
+
+    if device is not None:
+        # The registry has already read the serial
+        return FadeStickBase(device=device, serial=serial)
+
+
+def _reacquire(fs: FadeStickBase) -> bool:
+    """Swap a fresh handle for the stale one in fs, if the device is still attached"""
+    device = _registry.rediscover(fs.serial)
+    if device is None:
+        return False
+    fs.setDevice(device)
+    return True
 
-    if devices:
-        return FadeStickBase(device=devices[0])
 
+def _findFadeSticksAsGenerator() -> Iterable[USBDevice]:
+    return _backend.findDevices()
 
-def _findFadeSticksAsGenerator() -> Optional[USBDevice]:
-    return usb.core.find(find_all=True, idVendor=FS_VENDOR_ID, idProduct=FS_PRODUCT_ID)
 
+# Each overload resolves straight to _getUSBString(), which internal callers use directly
 
 @dispatch(FadeStickBase, int)
 def getUSBString(fs: FadeStickBase, index: int) -> str:
-    return getUSBString(fs.device, index, "")
+    return _getUSBString(fs.device, index)
 
 
-@dispatch(USBDevice, int)
+# Devices are dispatched as object so backends may supply their own handles
+@dispatch(object, int)
 def getUSBString(device: USBDevice, index: int) -> str:
-    return getUSBString(device, index, "")
+    return _getUSBString(device, index)
 
 
-@dispatch(USBDevice, int, str)
+@dispatch(FadeStickBase, int, str)
 def getUSBString(fs: FadeStickBase, index: int, serial: str) -> str:
-    return getUSBString(fs.device, index, serial)
+    return _getUSBString(fs.device, index, serial)
 
 
-@dispatch(USBDevice, int, str)
+@dispatch(object, int, str)
 def getUSBString(device: USBDevice, index: int, serial: str) -> str:
+    return _getUSBString(device, index, serial)
+
+
+def _getUSBString(device: USBDevice, index: int, serial: str = "") -> str:
     """
     Returns the serial number of device.::
         FSnnnnnn-1.5
@@ -101,14 +148,14 @@ def getUSBString(device: USBDevice, index: int, serial: str) -> str:
         ||----------- Denotes FadeStick device
     """
     try:
-        return usb.util.get_string(device, index, FS_MESSAGE_ID)
+        return _backend.getString(device, index)
     except usb.USBError:
         if serial and len(serial):
             # Could not communicate with FadeStick device
             # attempt to find it again based on serial
-            device = findFadeStickBySerial(serial)
-            if device:
-                return usb.util.get_string(device, index, FS_MESSAGE_ID)
+            device = _registry.rediscover(serial)
+            if device is not None:
+                return _backend.getString(device, index)
             else:
                 raise FadeStickUSBException(
                     f"Could not communicate with FadeStick {serial} - it may have been removed")
@@ -118,11 +165,11 @@ def getUSBString(device: USBDevice, index: int, serial: str) -> str:
 
 
 def getManufacturer(fs: FadeStickBase):
-    return getUSBString(fs.device, FS_MANUFACTURER_INDEX)
+    return _getUSBString(fs.device, FS_MANUFACTURER_INDEX)
 
 
 def getDescription(fs: FadeStickBase):
-    return getUSBString(fs.device, FS_DESCRIPTION_INDEX)
+    return _getUSBString(fs.device, FS_DESCRIPTION_INDEX)
 
 
 def openUSBDevice(device: USBDevice):
@@ -142,19 +189,25 @@ def sendControlTransfer(fs: FadeStickBase,
                         requestType: int,
                         request: int,
                         valueOrMode: int,
-                        dataOrLength: Union[bytes, int],
-                        timeout: int = 5000):
-    # Widen the data and add the value
+                        dataOrLength: Union[bytes, array, int],
+                        timeout: Optional[int] = None):
+    if timeout is None:
+        timeout = FS_READ_TIMEOUT_MS if requestType & RT_DEVICE_TO_HOST else FS_WRITE_TIMEOUT_MS
+    # Widen the data and add the value. An array('B') already starts
+    # with the mode byte and is passed through pyusb without a copy.
     if type(dataOrLength) is bytes:
         dataOrLength = bytes([valueOrMode]) + dataOrLength
 
     try:
         return fs.device.ctrl_transfer(requestType, request, valueOrMode, 0,
                                        dataOrLength, timeout)
+    except usb.core.USBTimeoutError:
+        # The device is there but not answering; a fresh handle will not help
+        raise
     except usb.USBError:
         # Could not communicate with FadeStick device
         # attempt to find it again based on serial
-        if findFadeStickBySerial(fs.serial):
+        if _reacquire(fs):
             return fs.device.ctrl_transfer(requestType, request, valueOrMode, 0,
                                            dataOrLength, timeout)
         else:
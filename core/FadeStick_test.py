@@ -6,6 +6,7 @@ from unittest import TestCase
 from core.FadeStick import FadeStick
 from core.FadeStickUSB import findFirstFadeStick
 from core.pattern.Pattern import Pattern
+from exceptions.FadeStickColorException import FadeStickColorException
 from exceptions.NumberExceptions import RangeIntException
 from utils.Colors import RED, GREEN, BLUE, OFF
 
@@ -60,20 +61,26 @@ class TestFadeStick(TestCase):
     def test_morph(self):
         duration = 1000
         self.device.setColor(RED)
-        self.assertEqual(RED, self.device.getColor())
+        self.assertEqual(RED, self.device.getColor(fresh=True))
         self.device.morph(BLUE, duration, 60)
         time.sleep((duration / 1000.0) * 2)
-        self.assertEqual(BLUE, self.device.getColor())
+        self.assertEqual(BLUE, self.device.getColor(fresh=True))
         self.device.turnOff()
-        self.assertEqual(OFF, self.device.getColor())
+        self.assertEqual(OFF, self.device.getColor(fresh=True))
+
+    def test_morph_bad_color(self):
+        with self.assertRaises(FadeStickColorException):
+            self.device.morph((300, 0, 0), 10)
+        with self.assertRaises(FadeStickColorException):
+            self.device.morph([0, -1, 0], 10)
 
     def test_morph_default_steps(self):
         duration = 1000
         self.device.setColor(RED)
-        self.assertEqual(RED, self.device.getColor())
+        self.assertEqual(RED, self.device.getColor(fresh=True))
         self.device.morph(GREEN, duration)
         time.sleep((duration / 1000.0) * 2)
-        self.assertEqual(GREEN, self.device.getColor())
+        self.assertEqual(GREEN, self.device.getColor(fresh=True))
         self.device.turnOff()
 
     def test_morph_many_steps(self):
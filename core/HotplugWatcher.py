@@ -0,0 +1,178 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import errno
+import os
+import select
+import socket
+import time
+from typing import Dict, Final, Optional
+
+from constants.FadeStickConsts import FS_VENDOR_ID, FS_PRODUCT_ID
+
+
+class HotplugWatcher:
+    """
+    Attach and detach events of one USB vendor and product from the kernel
+    uevent netlink socket. wait() blocks in poll() until such an event
+    arrives, so while no stick is attached the caller neither wakes nor
+    scans the bus. Events of other devices are read and ignored.
+    """
+    NETLINK_KOBJECT_UEVENT: Final = 15
+    # Kernel events; udevd rebroadcasts them on group 2 once its rules have run
+    KERNEL_GROUP: Final = 1
+    RECV_BYTES: Final = 8192
+    # The kernel reports a stick before udev has set up its device node, so
+    # the bus is rescanned after each of these delays until it is found
+    SETTLE_S: Final = (0.05, 0.2, 0.5, 1.0, 2.0)
+
+    def __init__(self, vendor_id: int = FS_VENDOR_ID, product_id: int = FS_PRODUCT_ID,
+                 sock: Optional[socket.socket] = None) -> None:
+        """
+        :param sock: Datagram socket to read uevents from instead of netlink, e.g. an EmulatedUeventSource's
+        """
+        # PRODUCT is vendor/product/bcdDevice in hex without leading zeros
+        self._product: Final = f"{vendor_id:x}/{product_id:x}/"
+        self.attached: int = 0
+        self.detached: int = 0
+        self._settle: int = len(self.SETTLE_S)
+        # When the next settle rescan is due
+        self._settle_at: float = 0.0
+        self._stopped: bool = False
+        if sock is None:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC,
+                                 self.NETLINK_KOBJECT_UEVENT)
+            try:
+                # Port 0 lets the kernel pick a unique port id
+                sock.bind((0, self.KERNEL_GROUP))
+            except OSError:
+                sock.close()
+                raise
+        self._sock: socket.socket = sock
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        self._poll: Final = select.poll()
+        self._poll.register(self._sock.fileno(), select.POLLIN)
+        self._poll.register(self._wake_r, select.POLLIN)
+
+    def __enter__(self) -> HotplugWatcher:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @staticmethod
+    def parse(data: bytes) -> Dict[str, str]:
+        """The properties of a kernel uevent, e.g. ACTION, SUBSYSTEM and PRODUCT"""
+        if data.startswith(b"libudev"):
+            # udevd's binary format, which is not sent to the kernel group
+            return {}
+        event = {}
+        # The first field is the summary, e.g. add@/devices/pci0000:00/...
+        for field in data.split(b"\0")[1:]:
+            key, sep, value = field.partition(b"=")
+            if sep:
+                event[key.decode("ascii", "replace")] = value.decode("utf-8", "replace")
+        return event
+
+    def matches(self, event: Dict[str, str]) -> bool:
+        # Each interface of the stick reports as well, the device itself only once
+        return event.get("SUBSYSTEM") == "usb" and event.get("DEVTYPE") == "usb_device" and \
+            event.get("ACTION") in ("add", "remove") and event.get("PRODUCT", "").startswith(self._product)
+
+    def pending(self) -> bool:
+        """Read the queued events without blocking. Returns True if a stick was attached or detached."""
+        found = False
+        while True:
+            try:
+                data = self._sock.recv(self.RECV_BYTES, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return found
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # The queue overflowed and events were lost, so assume an attach
+                self._startSettle()
+                found = True
+                continue
+            event = self.parse(data)
+            if not self.matches(event):
+                continue
+            found = True
+            if event["ACTION"] == "add":
+                self.attached += 1
+                self._startSettle()
+            else:
+                self.detached += 1
+                self._settle = len(self.SETTLE_S)
+
+    def wait(self, timeout_s: Optional[float] = None) -> bool:
+        """
+        Block until a stick is attached or detached, the timeout passes,
+        wake() or stop() is called. Shortly after an attach it also returns
+        once per settle delay. Returns True if the bus should be rescanned.
+        """
+        deadline = None if timeout_s is None else time.monotonic() + timeout_s
+        while not self._stopped:
+            if self.due():
+                return True
+            now = time.monotonic()
+            delay_s = None if deadline is None else max(0.0, deadline - now)
+            if self._settle < len(self.SETTLE_S):
+                settle_s = max(0.0, self._settle_at - now)
+                delay_s = settle_s if delay_s is None else min(delay_s, settle_s)
+            ready = self._poll.poll(None if delay_s is None else delay_s * 1000.0)
+            if not ready:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return self.due()
+                continue
+            if any(fd == self._wake_r for fd, _ in ready):
+                if self._stopped:
+                    return False
+                os.read(self._wake_r, 512)
+                return True
+            if self.pending():
+                return True
+        return False
+
+    def due(self) -> bool:
+        """
+        Whether a settle rescan is due, without blocking. Each one is
+        reported once, so a caller that is busy rather than in wait() can
+        poll this to keep to the settle schedule.
+        """
+        if self._settle >= len(self.SETTLE_S) or time.monotonic() < self._settle_at:
+            return False
+        self._settle += 1
+        if self._settle < len(self.SETTLE_S):
+            self._settle_at = time.monotonic() + self.SETTLE_S[self._settle]
+        return True
+
+    def settled(self) -> None:
+        """Stop the rescans after an attach, e.g. once the stick has been found"""
+        self._settle = len(self.SETTLE_S)
+
+    def wake(self) -> None:
+        """Make a wait() return True now, e.g. to rescan for a stick that failed; safe to call from a signal handler"""
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def stop(self) -> None:
+        """Make every wait() return False from now; safe to call from a signal handler"""
+        self._stopped = True
+        self.wake()
+
+    def close(self) -> None:
+        if self._wake_r >= 0:
+            self._sock.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._wake_r = -1
+
+    # Internals #
+
+    def _startSettle(self) -> None:
+        self._settle = 0
+        self._settle_at = time.monotonic() + self.SETTLE_S[0]
@@ -0,0 +1,203 @@
+#  Copyright (c) Eric Draken, 2021.
+import errno
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+from usb.core import USBError
+
+from core.CPUDaemon import CPUDaemon
+from core.FadeStickUSB import getBackend, setBackend
+from core.HotplugWatcher import HotplugWatcher
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+from core.emulator.UeventEmulator import EmulatedUeventSource, uevent
+
+
+def netlink_available() -> bool:
+    try:
+        HotplugWatcher().close()
+        return True
+    except OSError:
+        return False
+
+
+class NotReadyFadeStick(EmulatedFadeStick):
+    """A stick whose serial cannot be read yet when the kernel reports it, as before udev has run"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.not_ready: int = 1
+
+    def getString(self, index: int) -> str:
+        if self.not_ready:
+            self.not_ready -= 1
+            raise USBError("Access denied (insufficient permissions)", errno=errno.EACCES)
+        return super().getString(index)
+
+
+class TestHotplugWatcher(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.uevents = EmulatedUeventSource()
+        self.watcher = HotplugWatcher(sock=self.uevents.connect())
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.watcher.close()
+        self.uevents.close()
+
+    def test_parse(self):
+        event = HotplugWatcher.parse(uevent("add", "/devices/usb1/1-1", SUBSYSTEM="usb", PRODUCT="20a0/41e5/100"))
+        self.assertEqual({"ACTION": "add", "DEVPATH": "/devices/usb1/1-1", "SUBSYSTEM": "usb",
+                          "PRODUCT": "20a0/41e5/100"}, event)
+        self.assertEqual({}, HotplugWatcher.parse(b"libudev\0\xfe\xed\xca\xfe"))
+
+    def test_attach_wakes_wait(self):
+        threading.Timer(0.05, self.uevents.attach).start()
+        start = time.monotonic()
+        self.assertTrue(self.watcher.wait())
+        self.assertLess(time.monotonic() - start, 1.0)
+        # The interface event does not count again
+        self.assertEqual(1, self.watcher.attached)
+
+    def test_detach(self):
+        self.uevents.detach()
+        self.assertTrue(self.watcher.pending())
+        self.assertEqual((0, 1), (self.watcher.attached, self.watcher.detached))
+        self.assertFalse(self.watcher.pending())
+
+    def test_other_devices_ignored(self):
+        self.uevents.attach(vendor_id=0x046d, product_id=0xc52b)
+        self.uevents.send(uevent("change", "/devices/virtual/net/eth0", SUBSYSTEM="net"))
+        self.assertFalse(self.watcher.pending())
+        self.uevents.attach(vendor_id=0x046d, product_id=0xc52b)
+        self.assertFalse(self.watcher.wait(0.05))
+
+    def test_settles_after_attach(self):
+        self.uevents.attach()
+        self.assertTrue(self.watcher.pending())
+        # Rescans while udev sets up the stick, then blocks again
+        for delay_s in HotplugWatcher.SETTLE_S[:2]:
+            start = time.monotonic()
+            self.assertTrue(self.watcher.wait())
+            self.assertGreaterEqual(time.monotonic() - start, delay_s * 0.9)
+        self.watcher.settled()
+        self.assertFalse(self.watcher.wait(0.05))
+
+    def test_settle_without_waiting(self):
+        self.uevents.attach()
+        self.assertTrue(self.watcher.pending())
+        self.assertFalse(self.watcher.due())
+        time.sleep(HotplugWatcher.SETTLE_S[0])
+        self.assertTrue(self.watcher.due())
+        # Reported once per delay
+        self.assertFalse(self.watcher.due())
+
+    def test_stop_wakes_wait(self):
+        threading.Timer(0.05, self.watcher.stop).start()
+        self.assertFalse(self.watcher.wait())
+        self.assertFalse(self.watcher.wait())
+
+    def test_wake(self):
+        threading.Timer(0.05, self.watcher.wake).start()
+        self.assertTrue(self.watcher.wait())
+        # Once per wake
+        self.assertFalse(self.watcher.wait(0.05))
+
+    def test_emulator_reports_plugging(self):
+        backend = EmulatorBackend([], uevents=self.uevents)
+        device = backend.attach(EmulatedFadeStick())
+        backend.detach(device.serial_number)
+        self.assertTrue(self.watcher.pending())
+        self.assertEqual((1, 1), (self.watcher.attached, self.watcher.detached))
+        with self.assertRaises(OSError):
+            EmulatorBackend([]).openHotplug()
+
+    @unittest.skipUnless(netlink_available(), "Netlink uevents are not available")
+    def test_netlink(self):
+        with HotplugWatcher() as watcher:
+            self.assertFalse(watcher.wait(0.01))
+
+
+class TestDaemonHotplug(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.uevents = EmulatedUeventSource()
+        self.backend = EmulatorBackend([], uevents=self.uevents)
+        self.previous_backend = getBackend()
+        self.scans = 0
+        find_devices = self.backend.findDevices
+
+        def counted():
+            self.scans += 1
+            return find_devices()
+        self.backend.findDevices = counted
+        # Scanning every 10 ms would show up if hotplug events were not used.
+        # Only the first color is sent, so no transfer fails once a stick is gone.
+        self.daemon = CPUDaemon(backend=self.backend, period_ms=50, retry_s=0.01, record_path=None,
+                                color_delta=255, max_stale_s=3600.0)
+        self.daemon._socket_path = os.path.join(self.dir.name, "test.sock")
+        self.thread = threading.Thread(target=self.daemon._run, daemon=True)
+        self.thread.start()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.daemon._end(signal.SIGINT)
+        self.thread.join(10)
+        setBackend(self.previous_backend)
+        self.uevents.close()
+        self.dir.cleanup()
+
+    def waitFor(self, condition, timeout_s: float = 2.0) -> bool:
+        deadline = time.monotonic() + timeout_s
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def test_sleeps_until_attached(self):
+        self.assertTrue(self.waitFor(lambda: self.daemon._hotplug is not None))
+        time.sleep(0.2)
+        self.assertLessEqual(self.scans, 1)
+
+        device = self.backend.attach(EmulatedFadeStick())
+        start = time.monotonic()
+        self.assertTrue(self.waitFor(lambda: device.transfers > 0))
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual("1", dict(line.split(" ") for line in
+                                   self.daemon._control("metrics").splitlines())["hotplug_attaches"])
+
+    def test_sleeps_again_once_removed(self):
+        device = self.backend.attach(EmulatedFadeStick())
+        self.assertTrue(self.waitFor(lambda: device.transfers > 0))
+
+        self.backend.detach(device.serial_number)
+        # Dropped on the uevent, not when a transfer to it fails
+        self.assertTrue(self.waitFor(lambda: not self.daemon._fs_present, 1.0))
+        self.assertEqual(0, len(self.daemon._sticks))
+        self.assertEqual("Daemon running, but FadeStick not present.", self.daemon._control("status"))
+        ticks = self.daemon._ticks
+        time.sleep(0.2)
+        # Blocked in hotplug.wait() rather than ticking
+        self.assertEqual(ticks, self.daemon._ticks)
+
+    def test_second_stick_settles(self):
+        first = self.backend.attach(EmulatedFadeStick(serial="BS000001-1.5"))
+        self.assertTrue(self.waitFor(lambda: first.transfers > 0))
+        scans = self.scans
+
+        second = self.backend.attach(NotReadyFadeStick(serial="BS000002-1.5"))
+        # Missed by the scan on its attach, found by a settle rescan
+        start = time.monotonic()
+        self.assertTrue(self.waitFor(lambda: second.transfers > 0))
+        self.assertLess(time.monotonic() - start, sum(HotplugWatcher.SETTLE_S[:2]) + 0.5)
+        self.assertEqual(0, second.not_ready)
+        time.sleep(0.5)
+        # No periodic scans every retry_s while sticks are attached
+        self.assertLessEqual(self.scans - scans, len(HotplugWatcher.SETTLE_S) + 1)
@@ -0,0 +1,85 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import os
+import time
+from typing import Dict, Final, Optional
+
+from core.LatencyHistogram import LatencyHistogram
+
+
+class Instrumentation:
+    """
+    Always-on self-measurement of the daemon: one latency histogram per
+    phase of a tick, an error count and the process's own CPU time from
+    /proc/self/stat. Memory use is fixed however long the daemon runs.
+    """
+    SAMPLE: Final = "sample"
+    COLOR: Final = "color"
+    USB: Final = "usb"
+    SLEEP: Final = "sleep"
+    PHASES: Final = (SAMPLE, COLOR, USB, SLEEP)
+
+    STAT_PATH: Final = "/proc/self/stat"
+    # Fields after the ")" that ends the command name, from "state"
+    _UTIME: Final = 11
+    _STIME: Final = 12
+
+    def __init__(self) -> None:
+        self.phases: Final[Dict[str, LatencyHistogram]] = {p: LatencyHistogram() for p in self.PHASES}
+        self.errors: int = 0
+        self._clk_tck: Final = os.sysconf("SC_CLK_TCK")
+        self._fd: int = -1
+        self._started: float = time.monotonic()
+        self._cpu_at_start: float = 0.0
+
+    def __getitem__(self, phase: str) -> LatencyHistogram:
+        return self.phases[phase]
+
+    def start(self) -> None:
+        """Open /proc/self/stat, which must happen in the process being measured"""
+        self.close()
+        self._fd = os.open(self.STAT_PATH, os.O_RDONLY | os.O_CLOEXEC)
+        self._started = time.monotonic()
+        self._cpu_at_start = self.cpuSeconds()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def cpuSeconds(self) -> float:
+        """User plus system CPU time of the whole process, all threads included"""
+        if self._fd < 0:
+            return 0.0
+        # A fresh buffer each time, as status and scrapes may read concurrently
+        stat = os.pread(self._fd, 1024, 0)
+        # The command name may itself contain spaces and parentheses
+        fields = stat[stat.rindex(b")") + 2:].split()
+        return (int(fields[self._UTIME]) + int(fields[self._STIME])) / self._clk_tck
+
+    def cpuPercent(self, now: Optional[float] = None) -> float:
+        """Share of one core used since start()"""
+        elapsed = (now if now is not None else time.monotonic()) - self._started
+        if self._fd < 0 or elapsed <= 0:
+            return 0.0
+        return 100.0 * (self.cpuSeconds() - self._cpu_at_start) / elapsed
+
+    def summary(self, errors: Optional[int] = None) -> str:
+        """
+        :param errors: Total errors including those counted elsewhere, e.g. by the stick workers
+        """
+        errors = self.errors if errors is None else errors
+        phases = ", ".join(f"{name} p50 {h.quantile(0.5) * 1000.0:.3f} ms p99 {h.quantile(0.99) * 1000.0:.3f} ms"
+                           for name, h in self.phases.items() if h.count)
+        return f"Daemon CPU {self.cpuPercent():.3f}%, {errors} errors" + (f"; {phases}" if phases else "")
+
+    def metrics(self, errors: Optional[int] = None) -> Dict[str, str]:
+        errors = self.errors if errors is None else errors
+        metrics = {"self_cpu_percent": f"{self.cpuPercent():.4f}", "errors": str(errors)}
+        for name, h in self.phases.items():
+            metrics[f"{name}_count"] = str(h.count)
+            metrics[f"{name}_p50_ms"] = f"{h.quantile(0.5) * 1000.0:.3f}"
+            metrics[f"{name}_p99_ms"] = f"{h.quantile(0.99) * 1000.0:.3f}"
+            metrics[f"{name}_max_ms"] = f"{h.max * 1000.0:.3f}"
+        return metrics
@@ -0,0 +1,41 @@
+#  Copyright (c) Eric Draken, 2021.
+import time
+from unittest import TestCase
+
+from core.Instrumentation import Instrumentation
+
+
+class TestInstrumentation(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.stats = Instrumentation()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.stats.close()
+
+    def test_not_started(self):
+        self.assertEqual(0.0, self.stats.cpuSeconds())
+        self.assertEqual(0.0, self.stats.cpuPercent())
+
+    def test_own_cpu_time(self):
+        self.stats.start()
+        before = self.stats.cpuSeconds()
+        end = time.process_time() + 0.2
+        while time.process_time() < end:
+            pass
+        self.assertGreater(self.stats.cpuSeconds(), before)
+        self.assertGreater(self.stats.cpuPercent(), 0.0)
+
+    def test_summary(self):
+        self.stats[Instrumentation.USB].observe(0.002)
+        self.stats.errors = 2
+        self.assertIn("2 errors; usb p50 2.000 ms", self.stats.summary())
+        self.assertIn("5 errors", self.stats.summary(5))
+
+    def test_metrics(self):
+        self.stats[Instrumentation.SAMPLE].observe(0.0001)
+        metrics = self.stats.metrics()
+        self.assertEqual("1", metrics["sample_count"])
+        self.assertEqual("0", metrics["usb_count"])
+        self.assertEqual("0", metrics["errors"])
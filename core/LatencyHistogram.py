@@ -0,0 +1,73 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Final, List, Tuple
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram with O(1) memory. Bucket upper bounds
+    double from 1 us to about 16.8 s, with one more bucket for anything
+    slower. Safe to observe from several threads.
+    """
+    BOUNDS: Final[Tuple[float, ...]] = tuple(1e-6 * 2 ** k for k in range(25))
+
+    def __init__(self) -> None:
+        self._counts: array = array("Q", bytes(8 * (len(self.BOUNDS) + 1)))
+        self._lock = threading.Lock()
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.max: float = 0.0
+        # Most recent observation, for per-tick recording
+        self.last: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        i = bisect_left(self.BOUNDS, seconds)
+        with self._lock:
+            self._counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            self.last = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile, capped at the max seen"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self._counts):
+                seen += n
+                if seen >= rank and n:
+                    return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
+            return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """Cumulative (upper bound, count) pairs ending with +Inf"""
+        return self.snapshot()[0]
+
+    def snapshot(self) -> Tuple[List[Tuple[float, int]], float, int]:
+        """Buckets as buckets() returns them, sum and count, all read at one instant"""
+        with self._lock:
+            counts = self._counts.tolist()
+            total_s = self.sum
+            count = self.count
+        return self._cumulative(counts), total_s, count
+
+    # Internals #
+
+    def _cumulative(self, counts: List[int]) -> List[Tuple[float, int]]:
+        total = 0
+        result = []
+        for bound, n in zip((*self.BOUNDS, float("inf")), counts):
+            total += n
+            result.append((bound, total))
+        return result
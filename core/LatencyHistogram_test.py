@@ -0,0 +1,68 @@
+#  Copyright (c) Eric Draken, 2021.
+import threading
+from unittest import TestCase
+
+from core.LatencyHistogram import LatencyHistogram
+
+
+class TestLatencyHistogram(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.histogram = LatencyHistogram()
+
+    def test_empty(self):
+        self.assertEqual(0.0, self.histogram.quantile(0.99))
+        self.assertEqual(0.0, self.histogram.mean())
+
+    def test_quantiles(self):
+        for _ in range(98):
+            self.histogram.observe(0.0001)
+        self.histogram.observe(0.05)
+        self.histogram.observe(0.2)
+        # 100 us falls in the (64 us, 128 us] bucket
+        self.assertAlmostEqual(128e-6, self.histogram.quantile(0.5))
+        self.assertAlmostEqual(0.065536, self.histogram.quantile(0.99))
+        self.assertEqual(0.2, self.histogram.quantile(1.0))
+        self.assertEqual(100, self.histogram.count)
+
+    def test_overflow_bucket(self):
+        self.histogram.observe(60.0)
+        self.assertEqual(60.0, self.histogram.quantile(0.5))
+        self.assertEqual((float("inf"), 1), self.histogram.buckets()[-1])
+        self.assertEqual(0, self.histogram.buckets()[-2][1])
+
+    def test_fixed_memory(self):
+        for i in range(10_000):
+            self.histogram.observe(i * 1e-5)
+        self.assertEqual(len(LatencyHistogram.BOUNDS) + 1, len(self.histogram.buckets()))
+
+    def test_threads(self):
+        def observe():
+            for _ in range(1000):
+                self.histogram.observe(0.001)
+
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(8000, self.histogram.count)
+        self.assertEqual(8000, self.histogram.buckets()[-1][1])
+
+    def test_snapshot_consistent(self):
+        done = threading.Event()
+
+        def observe():
+            while not done.is_set():
+                self.histogram.observe(0.001)
+
+        thread = threading.Thread(target=observe)
+        thread.start()
+        try:
+            for _ in range(1000):
+                buckets, total_s, count = self.histogram.snapshot()
+                self.assertEqual(count, buckets[-1][1])
+                self.assertAlmostEqual(count * 0.001, total_s, places=6)
+        finally:
+            done.set()
+            thread.join()
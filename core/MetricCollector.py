@@ -0,0 +1,86 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Final, Iterable, List, Optional
+
+from core.MetricSource import MetricSource
+
+
+class MetricCollector:
+    """
+    Reads every file the sources need in one pass per tick, then hands the
+    contents to each source. Files stay open and are reread with preadv()
+    into reused buffers, and a file shared by several sources is read once,
+    so adding a source adds at most one syscall per new file.
+    """
+    INITIAL_BUFFER_SIZE: Final = 4096
+
+    _log: Final = logging.getLogger("daemon")
+
+    def __init__(self, sources: Iterable[MetricSource]) -> None:
+        self.sources: Final[List[MetricSource]] = list(sources)
+        self._fds: Dict[str, int] = {}
+        self._buffers: Dict[str, bytearray] = {}
+        self._lock = threading.Lock()
+        self._collected_at: float = time.monotonic()
+        # preadv() calls, for overhead accounting
+        self.reads: int = 0
+        for source in self.sources:
+            for path in source.getPaths():
+                if path not in self._fds:
+                    self._fds[path] = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+                    self._buffers[path] = bytearray(self.INITIAL_BUFFER_SIZE)
+
+    def __enter__(self) -> MetricCollector:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+
+    @property
+    def paths(self) -> List[str]:
+        return list(self._fds.keys())
+
+    def collect(self, window_s: Optional[float] = None) -> Dict[str, float]:
+        """
+        Read all files once and update every source.
+        :param window_s: The window as measured by the caller's scheduler
+        :return: Source name to value
+        """
+        with self._lock:
+            now = time.monotonic()
+            if window_s is None:
+                window_s = now - self._collected_at
+            self._collected_at = now
+            contents = {path: self._read(path, fd) for path, fd in self._fds.items()}
+
+        values: Dict[str, float] = {}
+        for source in self.sources:
+            try:
+                values[source.name] = source.update(contents, window_s)
+            except (ValueError, IndexError, KeyError) as e:
+                # A malformed file should not take down the other sources
+                self._log.error(f"Metric source {source.name} failed: {e}")
+                values[source.name] = 0.0
+        return values
+
+    # Internals #
+
+    def _read(self, path: str, fd: int) -> bytes:
+        buffer = self._buffers[path]
+        while True:
+            self.reads += 1
+            length = os.preadv(fd, [buffer], 0)
+            if length < len(buffer):
+                return bytes(memoryview(buffer)[:length])
+            buffer = self._buffers[path] = bytearray(len(buffer) * 2)
@@ -0,0 +1,108 @@
+#  Copyright (c) Eric Draken, 2021.
+import os
+import tempfile
+from unittest import TestCase
+
+from core.MetricCollector import MetricCollector
+from core.MetricSource import MemorySource, LoadAverageSource, DiskSource, NetworkSource, \
+    ThermalSource, CPUSource, PressureSource, METRIC_SOURCES
+
+NET_DEV = """Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo: {lo} 10 0 0 0 0 0 0 {lo} 10 0 0 0 0 0 0
+  eth0: {rx} 10 0 0 0 0 0 0 {tx} 10 0 0 0 0 0 0
+"""
+
+DISKSTATS = """   8       0 sda 100 0 {read} 0 100 0 {written} 0 0 0 0
+   8       1 sda1 100 0 {read} 0 100 0 {written} 0 0 0 0
+   7       0 loop0 100 0 99999 0 100 0 99999 0 0 0 0
+"""
+
+
+class TestMetricCollector(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.dir.cleanup()
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def source(self, source, path: str):
+        # Point a built-in source at a fixture file
+        source.PATH = path
+        return source
+
+    def test_memory(self):
+        path = self.write("meminfo", "MemTotal: 1000 kB\nMemFree: 100 kB\nMemAvailable: 250 kB\n")
+        with MetricCollector([self.source(MemorySource(), path)]) as collector:
+            self.assertAlmostEqual(0.75, collector.collect(1.0)["memory"])
+
+    def test_load(self):
+        path = self.write("loadavg", "3.00 2.00 1.00 1/100 1234\n")
+        with MetricCollector([self.source(LoadAverageSource(cores=4), path)]) as collector:
+            self.assertAlmostEqual(0.75, collector.collect(1.0)["load"])
+
+    def test_network_rate(self):
+        path = self.write("dev", NET_DEV.format(lo=0, rx=0, tx=0))
+        source = self.source(NetworkSource(full_scale=1000), path)
+        with MetricCollector([source]) as collector:
+            self.assertEqual(0.0, collector.collect(1.0)["network"])
+            self.write("dev", NET_DEV.format(lo=10**9, rx=600, tx=400))
+            self.assertAlmostEqual(0.5, collector.collect(2.0)["network"])
+
+    def test_disk_whole_disks_only(self):
+        path = self.write("diskstats", DISKSTATS.format(read=0, written=0))
+        source = self.source(DiskSource(full_scale=1024, disks=["sda"]), path)
+        with MetricCollector([source]) as collector:
+            collector.collect(1.0)
+            self.write("diskstats", DISKSTATS.format(read=1, written=1))
+            self.assertAlmostEqual(1.0, collector.collect(1.0)["disk"])
+            self.write("diskstats", DISKSTATS.format(read=2, written=1))
+            self.assertAlmostEqual(0.5, collector.collect(1.0)["disk"])
+
+    def test_thermal_hottest_zone(self):
+        zones = [self.write("zone0", "40000\n"), self.write("zone1", "60000\n")]
+        with MetricCollector([ThermalSource(30, 90, zones)]) as collector:
+            self.assertAlmostEqual(0.5, collector.collect(1.0)["thermal"])
+
+    def test_pressure(self):
+        psi = "some avg10=0.00 avg60=0.00 avg300=0.00 total={some}\nfull avg10=0.00 avg60=0.00 avg300=0.00 total=0\n"
+        source = PressureSource("cpu", "some")
+        source.path = self.write("cpu", psi.format(some=1_000_000))
+        with MetricCollector([source]) as collector:
+            self.assertEqual(0.0, collector.collect(2.0)["psi-some"])
+            self.write("cpu", psi.format(some=1_500_000))
+            self.assertAlmostEqual(0.25, collector.collect(2.0)["psi-some"])
+
+    def test_shared_file_read_once(self):
+        path = self.write("loadavg", "1.00 1.00 1.00 1/100 1234\n")
+        one = self.source(LoadAverageSource(cores=1), path)
+        two = self.source(LoadAverageSource(cores=2), path)
+        two.name = "load2"
+        with MetricCollector([one, two]) as collector:
+            values = collector.collect(1.0)
+            self.assertEqual(1, collector.reads)
+            self.assertEqual({"load": 1.0, "load2": 0.5}, values)
+
+    def test_malformed_file(self):
+        path = self.write("loadavg", "\n")
+        with MetricCollector([self.source(LoadAverageSource(), path)]) as collector:
+            self.assertEqual(0.0, collector.collect(1.0)["load"])
+
+    def test_proc(self):
+        sources = [METRIC_SOURCES[name]() for name in METRIC_SOURCES]
+        with MetricCollector(sources) as collector:
+            collector.collect()
+            values = collector.collect()
+            self.assertEqual(set(METRIC_SOURCES), set(values))
+            for value in values.values():
+                self.assertTrue(0.0 <= value <= 1.0)
+            self.assertIsNotNone(sources[0].sample)
+            self.assertIsInstance(sources[0], CPUSource)
@@ -0,0 +1,228 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import glob
+import os
+from typing import Callable, Dict, Final, Mapping, Optional, Sequence, Tuple
+
+from core.CPUSampler import CPUSampler, CPUSample
+from utils.Decorators import abstract
+
+# Path to the file contents read this tick
+Contents = Mapping[str, bytes]
+
+
+def _clamp(value: float) -> float:
+    return 0.0 if value < 0.0 else 1.0 if value > 1.0 else value
+
+
+class MetricSource(object):
+    """
+    A value to show on the FadeStick, in the range 0.0 - 1.0. A source names
+    the files it needs and a MetricCollector reads them, so each file costs
+    one read per tick however many sources share it.
+    """
+    name: str = ""
+
+    @abstract
+    def getPaths(self) -> Sequence[str]:
+        ...
+
+    @abstract
+    def update(self, contents: Contents, window_s: float) -> float:
+        """
+        :param contents: The contents of every path in getPaths() for this tick
+        :param window_s: Time since the previous update
+        """
+        ...
+
+
+class _RateSource(MetricSource):
+    """Rate of a monotonic counter, scaled to a full-scale rate"""
+
+    def __init__(self, full_scale: float) -> None:
+        self.full_scale: Final[float] = full_scale
+        self._last: Optional[int] = None
+
+    def _rate(self, counter: int, window_s: float) -> float:
+        last, self._last = self._last, counter
+        # Nothing to compare on the first tick, and counters reset on wrap
+        if last is None or counter < last or window_s <= 0:
+            return 0.0
+        return _clamp((counter - last) / window_s / self.full_scale)
+
+
+class CPUSource(MetricSource):
+    """Aggregate CPU utilization, keeping the full sample for per-core use"""
+    name = "cpu"
+    PATH: Final = "/proc/stat"
+
+    def __init__(self) -> None:
+        self._sampler: Final = CPUSampler(None)
+        self.sample: Optional[CPUSample] = None
+
+    def getPaths(self) -> Sequence[str]:
+        return self.PATH,
+
+    def update(self, contents: Contents, window_s: float) -> float:
+        self.sample = self._sampler.sampleData(contents[self.PATH], window_s)
+        return self.sample.utilization
+
+
+class MemorySource(MetricSource):
+    """Fraction of memory that is not available for new allocations"""
+    name = "memory"
+    PATH: Final = "/proc/meminfo"
+
+    def getPaths(self) -> Sequence[str]:
+        return self.PATH,
+
+    def update(self, contents: Contents, window_s: float) -> float:
+        total = available = 0
+        for line in contents[self.PATH].splitlines():
+            if line.startswith(b"MemTotal:"):
+                total = int(line.split()[1])
+            elif line.startswith(b"MemAvailable:"):
+                available = int(line.split()[1])
+                break
+        return _clamp(1.0 - available / total) if total else 0.0
+
+
+class LoadAverageSource(MetricSource):
+    """One-minute load average per core"""
+    name = "load"
+    PATH: Final = "/proc/loadavg"
+
+    def __init__(self, cores: Optional[int] = None) -> None:
+        self.cores: Final[int] = cores or os.cpu_count() or 1
+
+    def getPaths(self) -> Sequence[str]:
+        return self.PATH,
+
+    def update(self, contents: Contents, window_s: float) -> float:
+        return _clamp(float(contents[self.PATH].split(maxsplit=1)[0]) / self.cores)
+
+
+class DiskSource(_RateSource):
+    """Bytes read and written per second across whole disks"""
+    name = "disk"
+    PATH: Final = "/proc/diskstats"
+    SECTOR_SIZE: Final = 512
+    # Partitions and virtual devices would count the same I/O twice
+    _SKIP: Final = ("loop", "ram", "zram", "dm-", "md")
+
+    def __init__(self, full_scale: float = 500e6, disks: Optional[Sequence[str]] = None) -> None:
+        """
+        :param full_scale: Bytes per second shown as full load
+        :param disks: Device names to count, or every whole disk in /sys/block if None
+        """
+        super().__init__(full_scale)
+        if disks is None:
+            disks = [d for d in os.listdir("/sys/block") if not d.startswith(self._SKIP)] \
+                if os.path.isdir("/sys/block") else []
+        self.disks: Final = frozenset(d.encode() for d in disks)
+
+    def getPaths(self) -> Sequence[str]:
+        return self.PATH,
+
+    def update(self, contents: Contents, window_s: float) -> float:
+        sectors = 0
+        for line in contents[self.PATH].splitlines():
+            # major minor name reads merged sectors_read ms writes merged sectors_written ...
+            fields = line.split()
+            if len(fields) > 9 and fields[2] in self.disks:
+                sectors += int(fields[5]) + int(fields[9])
+        return self._rate(sectors * self.SECTOR_SIZE, window_s)
+
+
+class NetworkSource(_RateSource):
+    """Bytes received and sent per second across interfaces"""
+    name = "network"
+    PATH: Final = "/proc/net/dev"
+
+    def __init__(self, full_scale: float = 125e6, exclude: Sequence[str] = ("lo",)) -> None:
+        """
+        :param full_scale: Bytes per second shown as full load, 1 Gb/s by default
+        """
+        super().__init__(full_scale)
+        self.exclude: Final = frozenset(i.encode() for i in exclude)
+
+    def getPaths(self) -> Sequence[str]:
+        return self.PATH,
+
+    def update(self, contents: Contents, window_s: float) -> float:
+        total = 0
+        # Two header lines, then "iface: rx_bytes (7 more) tx_bytes ..."
+        for line in contents[self.PATH].splitlines()[2:]:
+            iface, _, counters = line.partition(b":")
+            if iface.strip() in self.exclude:
+                continue
+            fields = counters.split()
+            if len(fields) > 8:
+                total += int(fields[0]) + int(fields[8])
+        return self._rate(total, window_s)
+
+
+class ThermalSource(MetricSource):
+    """Hottest thermal zone, scaled between min_c and max_c"""
+    name = "thermal"
+
+    def __init__(self, min_c: float = 30.0, max_c: float = 90.0,
+                 zones: Optional[Sequence[str]] = None) -> None:
+        """
+        :param zones: Paths to "temp" files, or every /sys/class/thermal zone if None
+        """
+        self.min_c: Final[float] = min_c
+        self.max_c: Final[float] = max_c
+        self.zones: Final[Tuple[str, ...]] = tuple(
+            zones if zones is not None else sorted(glob.glob("/sys/class/thermal/thermal_zone*/temp")))
+
+    def getPaths(self) -> Sequence[str]:
+        return self.zones
+
+    def update(self, contents: Contents, window_s: float) -> float:
+        temps = [int(contents[z]) for z in self.zones if contents.get(z, b"").strip()]
+        if not temps:
+            return 0.0
+        # Millidegrees Celsius
+        return _clamp((max(temps) / 1000.0 - self.min_c) / (self.max_c - self.min_c))
+
+
+class PressureSource(_RateSource):
+    """
+    Share of the window in which some (or all) tasks stalled on a resource,
+    from the PSI stall-time counter rather than the kernel's 10 s average
+    """
+
+    def __init__(self, resource: str = "cpu", kind: str = "some", full_scale: float = 1.0) -> None:
+        """
+        :param full_scale: Stall fraction shown as full load
+        """
+        # The counter is in microseconds
+        super().__init__(full_scale * 1e6)
+        self.name = f"psi-{kind}" if resource == "cpu" else f"psi-{resource}-{kind}"
+        self.path: Final[str] = f"/proc/pressure/{resource}"
+        self.kind: Final[bytes] = kind.encode("ascii")
+
+    def getPaths(self) -> Sequence[str]:
+        return self.path,
+
+    def update(self, contents: Contents, window_s: float) -> float:
+        # some avg10=0.00 avg60=0.00 avg300=0.00 total=0
+        for line in contents[self.path].splitlines():
+            if line.startswith(self.kind):
+                return self._rate(int(line.rpartition(b"total=")[2]), window_s)
+        return 0.0
+
+
+# Built-in sources by name
+METRIC_SOURCES: Final[Dict[str, Callable[[], MetricSource]]] = {
+    CPUSource.name: CPUSource,
+    MemorySource.name: MemorySource,
+    LoadAverageSource.name: LoadAverageSource,
+    DiskSource.name: DiskSource,
+    NetworkSource.name: NetworkSource,
+    ThermalSource.name: ThermalSource,
+    "psi-some": lambda: PressureSource("cpu", "some"),
+    "psi-full": lambda: PressureSource("cpu", "full"),
+}
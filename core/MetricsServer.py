@@ -0,0 +1,85 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Final, Iterable, Optional
+
+from core.Exposition import CONTENT_TYPE
+
+
+class MetricsServer:
+    """
+    Serves GET /metrics in Prometheus text format from its own thread.
+    The page is rendered line by line as it is written, without taking
+    the daemon's lock, so a scrape never holds up a tick.
+    """
+    DEFAULT_PORT: Final = 9101
+    # A client that stalls mid-request is dropped after this long
+    TIMEOUT_S: Final = 5.0
+
+    _log: Final = logging.getLogger("metrics")
+
+    def __init__(self, render: Callable[[], Iterable[str]],
+                 port: int = DEFAULT_PORT, host: str = "127.0.0.1") -> None:
+        """
+        :param render: Yields the exposition one line at a time
+        :param port: TCP port, or 0 for any free port
+        """
+        self._render = render
+        self._address: Final = (host, port)
+        self._httpd: Optional[HTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1] if self._httpd else self._address[1]
+
+    def start(self) -> None:
+        self._httpd = HTTPServer(self._address, self._handler())
+        self._httpd.timeout = self.TIMEOUT_S
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        self._log.info(f"Serving metrics on http://{self._address[0]}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        if not self._httpd:
+            return
+        self._httpd.shutdown()
+        self._thread.join()
+        self._httpd.server_close()
+        self._httpd = None
+        self._thread = None
+
+    # Internals #
+
+    def _handler(self) -> type:
+        render = self._render
+        log = self._log
+        timeout = self.TIMEOUT_S
+
+        class Handler(BaseHTTPRequestHandler):
+            def setup(self) -> None:
+                self.timeout = timeout
+                super().setup()
+
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.end_headers()
+                # Without Content-Length the end of the body is the end of the connection
+                self.close_connection = True
+                try:
+                    for line in render():
+                        self.wfile.write(line.encode("utf-8"))
+                except Exception as e:
+                    log.error(f"Metrics render error: {e}")
+
+            def log_message(self, fmt: str, *args) -> None:
+                log.debug(fmt % args)
+
+        return Handler
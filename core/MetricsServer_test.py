@@ -0,0 +1,63 @@
+#  Copyright (c) Eric Draken, 2021.
+import threading
+import urllib.error
+import urllib.request
+from unittest import TestCase
+
+from core import Exposition
+from core.CPUDaemon import CPUDaemon
+from core.LatencyHistogram import LatencyHistogram
+from core.MetricsServer import MetricsServer
+
+
+class TestExposition(TestCase):
+    def test_gauge(self):
+        self.assertEqual(["# HELP x_up Up\n", "# TYPE x_up gauge\n", 'x_up{job="a\\"b"} 1\n'],
+                         list(Exposition.gauge("x_up", "Up", 1, {"job": 'a"b'})))
+
+    def test_histogram(self):
+        h = LatencyHistogram()
+        h.observe(0.5)
+        lines = list(Exposition.histogram("x_seconds", "Latency", "phase", {"usb": h}))
+        self.assertIn('x_seconds_bucket{phase="usb",le="+Inf"} 1\n', lines)
+        self.assertIn('x_seconds_count{phase="usb"} 1\n', lines)
+        self.assertIn('x_seconds_sum{phase="usb"} 0.5\n', lines)
+
+
+class TestMetricsServer(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.server = MetricsServer(lambda: iter(["a 1\n", "b 2\n"]), port=0)
+        self.server.start()
+        self.url = f"http://127.0.0.1:{self.server.port}"
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.server.stop()
+
+    def test_scrape(self):
+        with urllib.request.urlopen(f"{self.url}/metrics", timeout=5) as response:
+            self.assertEqual(Exposition.CONTENT_TYPE, response.headers["Content-Type"])
+            self.assertEqual(b"a 1\nb 2\n", response.read())
+
+    def test_not_found(self):
+        with self.assertRaises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(f"{self.url}/", timeout=5)
+        self.assertEqual(404, e.exception.code)
+
+
+class TestDaemonExposition(TestCase):
+    def test_render_without_lock(self):
+        daemon = CPUDaemon()
+        lines = []
+        with daemon._lock:
+            # Rendering must not wait for the tick loop's lock
+            thread = threading.Thread(target=lambda: lines.extend(daemon._exposition()))
+            thread.start()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertIn("cpufadestick_fs_present 0\n", lines)
+        self.assertIn('cpufadestick_color{channel="red"} 0\n', lines)
+        self.assertIn('cpufadestick_phase_seconds_count{phase="usb"} 0\n', lines)
+        for line in lines:
+            self.assertTrue(line.startswith(("# HELP cpufadestick_", "# TYPE cpufadestick_", "cpufadestick_")))
@@ -0,0 +1,88 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import os
+import select
+from typing import Final
+
+from utils.Types import RangeInt
+
+
+class PressureTrigger:
+    """
+    Kernel PSI trigger, see Documentation/accounting/psi.rst. poll() only
+    returns when the stall time within a window crosses the threshold, so
+    an idle host never wakes the caller. The kernel reports at most one
+    event per window.
+    """
+    ROOT: Final = "/proc/pressure"
+    # Unprivileged triggers need a window that is a multiple of 2 s
+    WINDOW_US: Final = 2_000_000
+    MIN_WINDOW_US: Final = 500_000
+    MAX_WINDOW_US: Final = 10_000_000
+
+    def __init__(self, resource: str = "cpu", kind: str = "some", threshold: float = 0.1,
+                 window_us: int = WINDOW_US, root: str = ROOT) -> None:
+        """
+        :param kind: "some" when any task stalls, "full" when all non-idle tasks stall
+        :param threshold: Fraction of the window spent stalled that fires the trigger
+        """
+        if kind not in ("some", "full"):
+            raise ValueError(f"PSI kind must be 'some' or 'full', not {kind}")
+        window_us = RangeInt(window_us, self.MIN_WINDOW_US, self.MAX_WINDOW_US, "window_us")
+        stall_us = max(1, int(window_us * threshold))
+
+        self.path: Final[str] = os.path.join(root, resource)
+        self.fired: int = 0
+        self._stopped: bool = False
+        self._fd: int = os.open(self.path, os.O_RDWR | os.O_NONBLOCK | os.O_CLOEXEC)
+        try:
+            os.write(self._fd, f"{kind} {stall_us} {window_us}\0".encode("ascii"))
+        except OSError:
+            os.close(self._fd)
+            raise
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        self._poll: Final = select.poll()
+        self._poll.register(self._fd, select.POLLPRI)
+        self._poll.register(self._wake_r, select.POLLIN)
+
+    def __enter__(self) -> PressureTrigger:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def wait(self, timeout_s: float) -> bool:
+        """
+        Block until the threshold is crossed, the timeout passes or stop()
+        is called. Returns True only if the threshold was crossed.
+        """
+        if self._stopped:
+            return False
+        fired = False
+        for fd, events in self._poll.poll(timeout_s * 1000.0):
+            if fd == self._wake_r:
+                return False
+            if events & select.POLLERR:
+                raise IOError(f"PSI trigger on {self.path} is no longer available")
+            if events & select.POLLPRI:
+                fired = True
+        if fired:
+            self.fired += 1
+        return fired
+
+    def stop(self) -> None:
+        """Wake any wait() now; safe to call from a signal handler"""
+        self._stopped = True
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            self._fd = -1
@@ -0,0 +1,59 @@
+#  Copyright (c) Eric Draken, 2021.
+import multiprocessing
+import os
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+from core.PressureTrigger import PressureTrigger
+
+
+def burn(seconds: float) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def psi_available() -> bool:
+    try:
+        PressureTrigger().close()
+        return True
+    except OSError:
+        return False
+
+
+@unittest.skipUnless(psi_available(), "PSI triggers are not available")
+class TestPressureTrigger(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.trigger = PressureTrigger("cpu", "some", 0.01)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.trigger.close()
+
+    def test_stop_wakes_wait(self):
+        threading.Timer(0.05, self.trigger.stop).start()
+        start = time.monotonic()
+        self.assertFalse(self.trigger.wait(60))
+        self.assertLess(time.monotonic() - start, 5.0)
+        self.assertFalse(self.trigger.wait(60))
+
+    def test_fires_on_contention(self):
+        # More busy processes than cores makes runnable tasks wait
+        burners = [multiprocessing.Process(target=burn, args=(10,), daemon=True)
+                   for _ in range(2 * (os.cpu_count() or 1))]
+        for p in burners:
+            p.start()
+        try:
+            self.assertTrue(self.trigger.wait(10))
+            self.assertEqual(1, self.trigger.fired)
+        finally:
+            for p in burners:
+                p.terminate()
+                p.join()
+
+    def test_bad_kind(self):
+        with self.assertRaises(ValueError):
+            PressureTrigger("cpu", "most")
@@ -0,0 +1,102 @@
+#  Copyright (c) Eric Draken, 2021.
+"""
+Decode, filter and summarize what the daemon recorded. For example, what
+the stick showed between 02:55 and 03:05 today, and a summary of it:
+
+    cpufadestick history --since 02:55 --until 03:05
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from constants.DaemonConsts import RECORD_PATH
+from core.Recorder import Record, Recorder, readRecords
+
+
+def parseTime(text: str, now: Optional[datetime] = None) -> float:
+    """
+    Seconds since the epoch from an ISO date and time, a time of day today
+    (e.g. 03:00), or a number of seconds ago (e.g. 3600)
+    """
+    now = now or datetime.now()
+    try:
+        return (now - timedelta(seconds=float(text))).timestamp()
+    except ValueError:
+        pass
+    try:
+        return datetime.combine(now.date(), datetime.strptime(text, "%H:%M").time()).timestamp()
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+def select(records: Iterable[Record], since: Optional[float] = None, until: Optional[float] = None,
+           errors_only: bool = False, min_value: Optional[float] = None) -> Iterator[Record]:
+    for r in records:
+        if since is not None and r.wall < since:
+            continue
+        if until is not None and r.wall > until:
+            continue
+        if errors_only and not r.error:
+            continue
+        if min_value is not None and r.smoothed < min_value:
+            continue
+        yield r
+
+
+def formatRecord(r: Record) -> str:
+    when = datetime.fromtimestamp(r.wall).isoformat(sep=" ", timespec="milliseconds")
+    error = Recorder.ERRORS.get(r.error, str(r.error))
+    return f"{when} {r.metric} {r.value * 100.0:6.2f}% smoothed {r.smoothed * 100.0:6.2f}% " \
+           f"cpu {r.cpu * 100.0:6.2f}% #{r.red:02x}{r.green:02x}{r.blue:02x} " \
+           f"{r.latency_s * 1000.0:7.2f} ms {r.period_ms:4d} ms{' ' + error if error else ''}"
+
+
+def summarize(records: Sequence[Record]) -> List[str]:
+    if not records:
+        return ["No records."]
+    first = datetime.fromtimestamp(records[0].wall).isoformat(sep=" ", timespec="seconds")
+    last = datetime.fromtimestamp(records[-1].wall).isoformat(sep=" ", timespec="seconds")
+    values = [r.smoothed for r in records]
+    errors = Counter(Recorder.ERRORS.get(r.error, str(r.error)) for r in records if r.error)
+    colors = Counter(f"#{r.red:02x}{r.green:02x}{r.blue:02x}" for r in records)
+    return [
+        f"{len(records)} records from {first} to {last}",
+        f"smoothed value min {min(values) * 100.0:.2f}%, mean {statistics.fmean(values) * 100.0:.2f}%, "
+        f"max {max(values) * 100.0:.2f}%",
+        f"transfer latency max {max(r.latency_s for r in records) * 1000.0:.2f} ms",
+        "errors " + (", ".join(f"{k} {v}" for k, v in errors.most_common()) or "none"),
+        "most shown " + ", ".join(f"{c} {n}" for c, n in colors.most_common(3)),
+    ]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="history", description=__doc__.splitlines()[1])
+    parser.add_argument("--file", default=RECORD_PATH)
+    parser.add_argument("--since", help="ISO time, HH:MM today, or seconds ago")
+    parser.add_argument("--until", help="ISO time, HH:MM today, or seconds ago")
+    parser.add_argument("--errors", action="store_true", help="Only ticks with an error")
+    parser.add_argument("--min-value", type=float, help="Only ticks with a smoothed value of at least this (0-1)")
+    parser.add_argument("--summary", action="store_true", help="Summarize without listing records")
+    args = parser.parse_args(argv)
+
+    try:
+        records = list(select(readRecords(args.file),
+                              parseTime(args.since) if args.since else None,
+                              parseTime(args.until) if args.until else None,
+                              args.errors, args.min_value))
+    except (OSError, ValueError) as e:
+        print(f"Cannot read history: {e}")
+        return 1
+    if not args.summary:
+        for r in records:
+            print(formatRecord(r))
+    print("\n".join(summarize(records)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
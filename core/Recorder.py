@@ -0,0 +1,151 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import mmap
+import os
+import stat
+import struct
+import time
+from typing import Callable, Final, Iterator, NamedTuple, Optional
+
+from constants.DaemonConsts import RECORD_PATH
+from core.MetricSource import METRIC_SOURCES
+
+
+class Record(NamedTuple):
+    seq: int
+    monotonic: float
+    wall: float
+    cpu: float
+    value: float
+    smoothed: float
+    metric: str
+    red: int
+    green: int
+    blue: int
+    latency_s: float
+    error: int
+    period_ms: int
+
+
+class Recorder:
+    """
+    Appends one fixed-width binary record per tick to a memory-mapped ring
+    file, so the full history of a day survives the daemon without a line
+    of syslog per tick. A record is a struct.pack_into() into the mapping;
+    the kernel writes the pages back on its own schedule.
+
+    Each record carries its sequence number, so a reader can tell a slot
+    being overwritten, or left over from an older ring, from a valid one.
+    """
+    MAGIC: Final = b"FSRC"
+    VERSION: Final = 1
+    DEFAULT_CAPACITY: Final = 86_400  # A day at one tick per second
+
+    # magic, version, record size, capacity, records written
+    HEADER: Final = struct.Struct("<4sHHIQ")
+    HEADER_SIZE: Final = 64
+    _WRITTEN: Final = struct.Struct("<Q")
+    _WRITTEN_OFFSET: Final = HEADER.size - _WRITTEN.size
+    # seq, monotonic, wall, cpu, value, smoothed, metric, r, g, b, latency_us, error, period_ms
+    RECORD: Final = struct.Struct("<QddfffBBBBIHH")
+
+    # Error codes
+    ERR_NONE: Final = 0
+    ERR_TICK: Final = 1
+    ERR_TRANSFER: Final = 2
+    ERR_NO_STICK: Final = 3
+    ERRORS: Final = {ERR_NONE: "", ERR_TICK: "tick", ERR_TRANSFER: "transfer", ERR_NO_STICK: "no-stick"}
+
+    METRICS: Final = tuple(METRIC_SOURCES)
+    _METRIC_IDS: Final = {name: i for i, name in enumerate(METRICS)}
+
+    def __init__(self, path: str = RECORD_PATH, capacity: int = DEFAULT_CAPACITY,
+                 clock: Callable[[], float] = time.monotonic,
+                 wall_clock: Callable[[], float] = time.time) -> None:
+        """
+        :param capacity: Records kept before the oldest is overwritten
+        """
+        self.path: Final = path
+        self.capacity: Final = capacity
+        self._clock = clock
+        self._wall_clock = wall_clock
+        size = self.HEADER_SIZE + capacity * self.RECORD.size
+        fd = self._open(path)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._mm: Optional[mmap.mmap] = mmap.mmap(fd, size)
+        finally:
+            # The mapping keeps the file open
+            os.close(fd)
+        magic, version, record_size, ring, written = self.HEADER.unpack_from(self._mm, 0)
+        if (magic, version, record_size, ring) == (self.MAGIC, self.VERSION, self.RECORD.size, capacity):
+            # Carry on from the last daemon's history
+            self.written: int = written
+        else:
+            self.written = 0
+            self._mm[:] = bytes(size)
+            self.HEADER.pack_into(self._mm, 0, self.MAGIC, self.VERSION, self.RECORD.size, capacity, 0)
+
+    def __enter__(self) -> Recorder:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def record(self, cpu: float, value: float, smoothed: float, metric: str, color,
+               latency_s: float = 0.0, error: int = ERR_NONE, period_ms: int = 0) -> None:
+        seq = self.written
+        red, green, blue = color
+        self.RECORD.pack_into(
+            self._mm, self.HEADER_SIZE + (seq % self.capacity) * self.RECORD.size,
+            seq + 1, self._clock(), self._wall_clock(), cpu, value, smoothed,
+            self._METRIC_IDS[metric], red, green, blue,
+            min(int(latency_s * 1e6), 0xFFFFFFFF), error, min(period_ms, 0xFFFF))
+        self.written = seq + 1
+        # Publish the record only once it is complete
+        self._WRITTEN.pack_into(self._mm, self._WRITTEN_OFFSET, self.written)
+
+    def close(self) -> None:
+        if self._mm:
+            self._mm.close()
+            self._mm = None
+
+    # Internals #
+
+    @staticmethod
+    def _open(path: str) -> int:
+        """
+        Open the ring file without following a planted symlink in a shared
+        directory such as /tmp, and refuse anything but a regular file of
+        our own, as the file is truncated whenever its size is off
+        """
+        flags = os.O_RDWR | os.O_NOFOLLOW | os.O_CLOEXEC
+        try:
+            fd = os.open(path, flags)
+        except FileNotFoundError:
+            return os.open(path, flags | os.O_CREAT | os.O_EXCL, 0o644)
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode) or st.st_uid != os.geteuid() or st.st_nlink != 1:
+            os.close(fd)
+            raise ValueError(f"{path} is not a regular file owned by this user, refusing to record to it")
+        return fd
+
+
+def readRecords(path: str = RECORD_PATH) -> Iterator[Record]:
+    """Every valid record in a ring file, oldest first"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, record_size, capacity, written = Recorder.HEADER.unpack_from(data, 0)
+    if magic != Recorder.MAGIC or version != Recorder.VERSION or record_size != Recorder.RECORD.size:
+        raise ValueError(f"{path} is not a recorder file")
+    for seq in range(max(0, written - capacity), written):
+        fields = Recorder.RECORD.unpack_from(data, Recorder.HEADER_SIZE + (seq % capacity) * record_size)
+        # Seqs are stored one-based, so a zeroed slot never matches
+        if fields[0] != seq + 1:
+            continue
+        _, mono, wall, cpu, value, smoothed, metric, red, green, blue, latency_us, error, period_ms = fields
+        yield Record(seq, mono, wall, cpu, value, smoothed, Recorder.METRICS[metric],
+                     red, green, blue, latency_us / 1e6, error, period_ms)
@@ -0,0 +1,144 @@
+#  Copyright (c) Eric Draken, 2021.
+import os
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+from core.RecordReader import parseTime, select, summarize, formatRecord
+from core.Recorder import Recorder, readRecords
+from core.emulator.ClockEmulator import EmulatedClock
+from utils.Colors import RED, GREEN
+
+
+class TestRecorder(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "test.rec")
+        self.clock = EmulatedClock(1000.0)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.dir.cleanup()
+
+    def recorder(self, capacity: int = 8) -> Recorder:
+        return Recorder(self.path, capacity, clock=self.clock, wall_clock=self.clock.wall)
+
+    def fill(self, recorder: Recorder, ticks: int) -> None:
+        for n in range(ticks):
+            self.clock.now += 1.0
+            recorder.record(0.5, n / 100.0, n / 100.0, "memory", RED if n % 2 else GREEN,
+                            latency_s=0.002, error=Recorder.ERR_TRANSFER if n == 3 else Recorder.ERR_NONE,
+                            period_ms=1000)
+
+    def test_fixed_size(self):
+        with self.recorder() as recorder:
+            self.fill(recorder, 100)
+        self.assertEqual(Recorder.HEADER_SIZE + 8 * Recorder.RECORD.size, os.path.getsize(self.path))
+
+    def test_round_trip(self):
+        with self.recorder() as recorder:
+            self.fill(recorder, 5)
+        records = list(readRecords(self.path))
+        self.assertEqual(list(range(5)), [r.seq for r in records])
+        r = records[3]
+        self.assertEqual(("memory", RED, Recorder.ERR_TRANSFER, 1000),
+                         (r.metric, (r.red, r.green, r.blue), r.error, r.period_ms))
+        self.assertEqual(1004.0, r.monotonic)
+        self.assertAlmostEqual(0.03, r.value, places=6)
+        self.assertAlmostEqual(0.002, r.latency_s)
+
+    def test_ring_keeps_newest(self):
+        with self.recorder() as recorder:
+            self.fill(recorder, 20)
+        self.assertEqual(list(range(12, 20)), [r.seq for r in readRecords(self.path)])
+
+    def test_resume(self):
+        with self.recorder() as recorder:
+            self.fill(recorder, 5)
+        with self.recorder() as recorder:
+            self.assertEqual(5, recorder.written)
+            self.fill(recorder, 5)
+        self.assertEqual(list(range(2, 10)), [r.seq for r in readRecords(self.path)])
+
+    def test_new_capacity_starts_over(self):
+        with self.recorder() as recorder:
+            self.fill(recorder, 5)
+        with self.recorder(capacity=4):
+            pass
+        self.assertEqual([], list(readRecords(self.path)))
+
+    def test_refuses_symlink(self):
+        target = os.path.join(self.dir.name, "victim")
+        with open(target, "wb") as f:
+            f.write(b"precious")
+        os.symlink(target, self.path)
+        with self.assertRaises(OSError):
+            self.recorder()
+        with open(target, "rb") as f:
+            self.assertEqual(b"precious", f.read())
+
+    def test_refuses_other_files(self):
+        os.mkfifo(self.path)
+        with self.assertRaises(ValueError):
+            self.recorder()
+        os.remove(self.path)
+
+        target = os.path.join(self.dir.name, "victim")
+        with open(target, "wb") as f:
+            f.write(b"precious")
+        os.link(target, self.path)
+        with self.assertRaises(ValueError):
+            self.recorder()
+        self.assertEqual(8, os.path.getsize(target))
+
+    def test_not_a_recording(self):
+        with open(self.path, "wb") as f:
+            f.write(bytes(Recorder.HEADER_SIZE))
+        with self.assertRaises(ValueError):
+            list(readRecords(self.path))
+
+
+class TestRecordReader(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "test.rec")
+        clock = EmulatedClock(1000.0)
+        with Recorder(self.path, 16, clock=clock, wall_clock=clock.wall) as recorder:
+            for n in range(10):
+                clock.now += 1.0
+                recorder.record(0.5, n / 10.0, n / 10.0, "cpu", RED if n > 7 else GREEN,
+                                error=Recorder.ERR_TICK if n == 9 else Recorder.ERR_NONE)
+        self.records = list(readRecords(self.path))
+        self.start = self.records[0].wall
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.dir.cleanup()
+
+    def test_time_range(self):
+        selected = list(select(self.records, self.start + 2, self.start + 4))
+        self.assertEqual([2, 3, 4], [r.seq for r in selected])
+
+    def test_filters(self):
+        self.assertEqual([9], [r.seq for r in select(self.records, errors_only=True)])
+        self.assertEqual([8, 9], [r.seq for r in select(self.records, min_value=0.75)])
+
+    def test_summary(self):
+        lines = summarize(self.records)
+        self.assertTrue(lines[0].startswith("10 records from "))
+        self.assertIn("max 90.00%", lines[1])
+        self.assertEqual("errors tick 1", lines[3])
+        self.assertEqual(["No records."], summarize([]))
+
+    def test_format(self):
+        line = formatRecord(self.records[9])
+        self.assertIn("#ff0000", line)
+        self.assertTrue(line.endswith(" tick"))
+
+    def test_parse_time(self):
+        now = datetime(2021, 6, 1, 12, 0, 0)
+        self.assertEqual(now.timestamp() - 3600, parseTime("3600", now))
+        self.assertEqual(datetime(2021, 6, 1, 3, 0).timestamp(), parseTime("03:00", now))
+        self.assertEqual(datetime(2021, 5, 31, 23, 30).timestamp(), parseTime("2021-05-31T23:30", now))
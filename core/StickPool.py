@@ -0,0 +1,288 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from typing import Callable, Dict, Final, List, Mapping, Optional, Sequence, Set
+
+from usb.core import USBError
+
+from constants.DaemonConsts import SHUTDOWN_DEADLINE_S
+from core.CPUSampler import CPUSample
+from core.CircuitBreaker import CircuitBreaker
+from core.FadeStick import FadeStick
+from core.FadeStickUSB import getRegistry, findFadeStickBySerial
+from core.HotplugWatcher import HotplugWatcher
+from core.CPU import SmoothingFilter
+from core.LatencyHistogram import LatencyHistogram
+from core.StickWorker import StickWorker
+from core.pattern.GradientEngine import GRADIENTS
+from exceptions.FadeStickUSBException import FadeStickUSBException
+
+
+class StickPool:
+    """
+    One StickWorker per attached FadeStick, keyed by serial. Sticks are
+    found through the registry and opened on a scanner thread, which hands
+    them over on sync(), so the sampling loop never does USB I/O. A rescan
+    only opens sticks it has not seen, and a stick that fails is dropped
+    and picked up again once it is back on the bus.
+    """
+    # Workers give up on their sticks at SHUTDOWN_DEADLINE_S, so this only
+    # bounds a transfer that was already in flight
+    STOP_TIMEOUT_S: Final = SHUTDOWN_DEADLINE_S + 0.5
+
+    _log: Final = logging.getLogger("daemon")
+
+    def __init__(self, stick_cores: Optional[Mapping[str, Sequence[int]]] = None,
+                 color_delta: int = 2, max_stale_s: float = 30.0, rescan_s: Optional[float] = 5.0,
+                 retry_s: float = 5.0,
+                 usb_latency: Optional[LatencyHistogram] = None,
+                 smoothing: Optional[Callable[[], SmoothingFilter]] = None) -> None:
+        """
+        :param stick_cores: Serial to the CPU cores that stick shows; unlisted sticks show all cores
+        :param rescan_s: Look for newly attached sticks this often, or only when rescan() is called if None
+        :param retry_s: Scan again this soon after a scan fails
+        :param usb_latency: Histogram every worker records its morph transfer times in
+        :param smoothing: Makes a filter for each stick tied to cores
+        """
+        self._stick_cores: Final = dict(stick_cores) if stick_cores else {}
+        self._color_delta: Final = color_delta
+        self._max_stale_s: Final = max_stale_s
+        self._rescan_s: Optional[float] = rescan_s
+        self._retry_s: Final = retry_s
+        self._usb_latency: Final = usb_latency
+        self._smoothing: Final = smoothing
+        self._workers: Dict[str, StickWorker] = {}
+        # Scanner to daemon thread: (serial, worker), or (serial, None) once it has left the bus
+        self._found: queue.Queue = queue.Queue()
+        # Daemon to scanner thread: serials of failed workers, whose handles are stale
+        self._stale: queue.Queue = queue.Queue()
+        # Serials the scanner has handed over, only touched by scan()
+        self._opened: Set[str] = set()
+        self._hotplug: Optional[HotplugWatcher] = None
+        self._wake_scan: Final = threading.Event()
+        self._stopping: bool = False
+        self._scanner: Final = threading.Thread(target=self._scanLoop, name="stick-scanner", daemon=True)
+        # wake() runs in signal handlers, so wait() polls a pipe
+        self._ready_r, self._ready_w = os.pipe()
+        os.set_blocking(self._ready_w, False)
+        self._poll: Final = select.poll()
+        self._poll.register(self._ready_r, select.POLLIN)
+        # Sticks connected over the pool's lifetime, reconnects included
+        self.connects: int = 0
+        self._scan_errors: int = 0
+        # Counters of workers that have been dropped
+        self._retired_suppressed: int = 0
+        self._retired_transfers: int = 0
+        self._retired_errors: int = 0
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    def __iter__(self):
+        return iter(list(self._workers.values()))
+
+    def serials(self) -> List[str]:
+        return list(self._workers.keys())
+
+    @property
+    def suppressed(self) -> int:
+        return self._retired_suppressed + sum(w.color_filter.suppressed for w in self)
+
+    @property
+    def transfers(self) -> int:
+        return self._retired_transfers + sum(w.transfers for w in self)
+
+    @property
+    def errors(self) -> int:
+        return self._scan_errors + self._retired_errors + sum(w.errors for w in self)
+
+    @property
+    def circuits_open(self) -> int:
+        """Sticks whose transfers are paused after failing"""
+        return sum(1 for w in self if w.breaker.state == CircuitBreaker.OPEN)
+
+    def start(self, hotplug: Optional[HotplugWatcher] = None) -> None:
+        """
+        Start the scanner thread, which scans at once.
+        :param hotplug: Scan when it reports a stick rather than every rescan_s
+        """
+        if hotplug:
+            self._hotplug = hotplug
+            self._rescan_s = None
+        self._scanner.start()
+
+    def scan(self) -> int:
+        """
+        Sync with the bus: open sticks not seen before and report those that
+        have left, for the next sync(). Does USB I/O, so runs on the scanner
+        thread. Returns the number of sticks opened.
+        """
+        registry = getRegistry()
+        while True:
+            try:
+                serial = self._stale.get_nowait()
+            except queue.Empty:
+                break
+            # The next refresh reads its serial again
+            registry.remove(serial)
+            self._opened.discard(serial)
+
+        registry.refresh()
+        attached = set(registry.serials())
+        # Sticks that have left the bus, before a transfer to them has failed
+        gone = [serial for serial in self._opened if serial not in attached]
+        for serial in gone:
+            self._opened.discard(serial)
+            self._found.put((serial, None))
+        opened = 0
+        for serial in registry.serials():
+            if serial in self._opened:
+                continue
+            try:
+                fs = findFadeStickBySerial(serial)
+                if fs is None:
+                    continue
+                cores = self._stick_cores.get(serial)
+                worker = StickWorker(FadeStick(fs), cores, self._color_delta, self._max_stale_s,
+                                     self._usb_latency, self._smoothing() if cores and self._smoothing else None)
+            except (USBError, FadeStickUSBException) as e:
+                self._log.warning(f"FadeStick {serial} could not be opened: {e}")
+                continue
+            self._opened.add(serial)
+            self._found.put((serial, worker))
+            opened += 1
+        if gone or opened:
+            self.wake()
+        return opened
+
+    def sync(self) -> int:
+        """
+        Start workers for the sticks the scanner has opened and drop failed or
+        unplugged ones. Never does USB I/O. Returns the number started.
+        """
+        dead = [w for w in self if not w.isAlive()]
+        for worker in dead:
+            self._retire(worker)
+            self._stale.put(worker.serial)
+        if dead:
+            self.rescan()
+
+        started = 0
+        while True:
+            try:
+                serial, worker = self._found.get_nowait()
+            except queue.Empty:
+                break
+            previous = self._workers.get(serial)
+            if previous:
+                # Not joined: it may still be finishing a transfer to the unplugged stick
+                previous.stop(turn_off=False)
+                self._retire(previous)
+                self._log.info(f"FadeStick {serial} removed")
+            if worker is None:
+                continue
+            worker.start()
+            self._workers[serial] = worker
+            self._log.info(f"FadeStick {serial} connected")
+            started += 1
+        self.connects += started
+        return started
+
+    def wait(self, timeout_s: Optional[float] = None) -> bool:
+        """
+        Block until the scanner has sticks for sync(), wake() is called or the
+        timeout passes. Returns False on timeout.
+        """
+        if not self._poll.poll(None if timeout_s is None else timeout_s * 1000.0):
+            return False
+        os.read(self._ready_r, 512)
+        return True
+
+    def wake(self) -> None:
+        """Wake any wait() now; safe to call from a signal handler"""
+        if self._ready_w >= 0:
+            try:
+                os.write(self._ready_w, b"\0")
+            except BlockingIOError:
+                pass
+
+    def submit(self, sample: CPUSample, duration_ms: int, value: Optional[float] = None) -> int:
+        """
+        Post each stick its color for the sample. Returns the number of morphs queued.
+        :param value: The daemon's metric, shown by sticks not tied to CPU cores
+        """
+        queued = 0
+        for worker in self:
+            load = value if value is not None and not worker.cores else worker.smooth(worker.utilization(sample))
+            color = GRADIENTS.loadToRGB(load)
+            queued += worker.submit(color, duration_ms)
+        return queued
+
+    def rescan(self) -> None:
+        """Have the scanner scan the bus now, e.g. when a stick has failed"""
+        if self._hotplug:
+            self._hotplug.wake()
+        else:
+            self._wake_scan.set()
+
+    def reset(self) -> None:
+        """Make every stick resend its color on the next submit"""
+        for worker in self:
+            worker.color_filter.reset()
+
+    def stop(self, timeout: Optional[float] = STOP_TIMEOUT_S) -> None:
+        """
+        Stop the scanner, then turn every stick off concurrently and wait for the workers.
+        :param timeout: Longest wait for all of them together, or None for no limit
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._stopping = True
+        if self._scanner.is_alive():
+            self.rescan()
+            self._scanner.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        # Sticks opened since the last sync are turned off as well
+        self.sync()
+        workers = list(self)
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            self._retire(worker)
+        if self._ready_r >= 0:
+            ready_r, ready_w = self._ready_r, self._ready_w
+            self._ready_r = self._ready_w = -1
+            os.close(ready_r)
+            os.close(ready_w)
+
+    # Internals #
+
+    def _retire(self, worker: StickWorker) -> None:
+        if self._workers.pop(worker.serial, None) is worker:
+            self._retired_suppressed += worker.color_filter.suppressed
+            self._retired_transfers += worker.transfers
+            self._retired_errors += worker.errors
+
+    def _scanLoop(self) -> None:
+        while not self._stopping:
+            try:
+                self.scan()
+                delay_s = self._rescan_s
+            except (USBError, FadeStickUSBException, OSError) as e:
+                # E.g. a glitch while enumerating the bus
+                self._log.warning(f"FadeStick scan failed: {e}")
+                self._scan_errors += 1
+                delay_s = self._retry_s
+            if self._stopping:
+                break
+            if self._hotplug:
+                # Also returns after each settle delay following an attach
+                self._hotplug.wait(delay_s)
+            else:
+                self._wake_scan.wait(delay_s)
+                self._wake_scan.clear()
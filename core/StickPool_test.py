@@ -0,0 +1,230 @@
+#  Copyright (c) Eric Draken, 2021.
+import errno
+import time
+from array import array
+from typing import Optional
+from unittest import TestCase
+
+from usb.core import USBError
+
+from core.CPU import MaxFilter
+from core.CPUSampler import CPUSample
+from core.CircuitBreaker import CircuitBreaker
+from core.FadeStick import FadeStick
+from core.FadeStickUSB import setBackend, findFirstFadeStick
+from core.StickPool import StickPool
+from core.StickWorker import StickWorker
+from core.emulator.ClockEmulator import EmulatedClock
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+from core.pattern.GradientEngine import GRADIENTS
+from utils.Colors import RED
+
+
+def sample(total: float, *cores: float) -> CPUSample:
+    return CPUSample(total, 0.0, array("d", cores), array("d", [0.0] * len(cores)), 1.0)
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestStickPool(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.fast = EmulatedFadeStick(serial="BS000001-1.5")
+        self.slow = EmulatedFadeStick(serial="BS000002-1.5", latency_ms=200)
+        self.backend = EmulatorBackend([self.fast, self.slow])
+        self.previous = setBackend(self.backend)
+        self.pool = StickPool({"BS000001-1.5": [0, 1], "BS000002-1.5": [2, 3]}, rescan_s=60)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.slow.latency_ms = 0
+        self.pool.stop(5)
+        setBackend(self.previous)
+
+    def connect(self, pool: Optional[StickPool] = None) -> int:
+        """A scan as the scanner thread runs it, then the daemon thread's sync"""
+        pool = self.pool if pool is None else pool
+        pool.scan()
+        return pool.sync()
+
+    def test_one_worker_per_stick(self):
+        self.assertEqual(2, self.connect())
+        self.assertEqual(["BS000001-1.5", "BS000002-1.5"], sorted(self.pool.serials()))
+        self.assertEqual(0, self.connect())
+
+    def test_scanner_thread(self):
+        self.pool.start()
+        self.assertTrue(self.pool.wait(5))
+        self.assertEqual(2, self.pool.sync())
+        self.backend.attach(EmulatedFadeStick(serial="BS000003-1.5"))
+        self.pool.rescan()
+        self.assertTrue(self.pool.wait(5))
+        self.assertEqual(1, self.pool.sync())
+
+    def test_sync_never_waits_for_usb(self):
+        self.connect()
+        self.pool.submit(sample(1.0, 1.0, 1.0, 1.0, 1.0), 10)
+        time.sleep(0.05)
+        # The slow stick is unplugged while its transfer is in flight
+        self.backend.detach(self.slow.serial_number)
+        self.pool.scan()
+        start = time.monotonic()
+        self.assertEqual(0, self.pool.sync())
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(["BS000001-1.5"], self.pool.serials())
+
+    def test_scan_error(self):
+        self.pool.start()
+        self.assertTrue(self.pool.wait(5))
+        self.pool.sync()
+        find_devices = self.backend.findDevices
+
+        def glitch():
+            self.backend.findDevices = find_devices
+            raise USBError("enumeration glitch", errno=errno.EIO)
+        self.backend.findDevices = glitch
+        self.pool.rescan()
+        self.assertTrue(wait_for(lambda: self.pool.errors == 1))
+        # Nothing dropped, and scanning goes on
+        self.assertEqual(2, len(self.pool))
+
+    def test_per_stick_cores(self):
+        self.connect()
+        self.assertEqual(2, self.pool.submit(sample(0.5, 1.0, 0.8, 0.0, 0.2), 10))
+        colors = {w.serial: w.color for w in self.pool}
+        self.assertEqual(GRADIENTS.loadToRGB(0.9), colors["BS000001-1.5"])
+        self.assertEqual(GRADIENTS.loadToRGB(0.1), colors["BS000002-1.5"])
+
+    def test_per_stick_smoothing(self):
+        pool = StickPool({"BS000001-1.5": [0]}, rescan_s=60, smoothing=lambda: MaxFilter(3))
+        try:
+            self.connect(pool)
+            pool.submit(sample(0.5, 1.0), 10, 0.5)
+            pool.submit(sample(0.2, 0.0), 10, 0.2)
+            colors = {w.serial: w.color for w in pool}
+            # The core-tied stick holds its peak, the other shows the daemon's value
+            self.assertEqual(GRADIENTS.loadToRGB(1.0), colors["BS000001-1.5"])
+            self.assertEqual(GRADIENTS.loadToRGB(0.2), colors["BS000002-1.5"])
+        finally:
+            pool.stop(5)
+
+    def test_slow_stick_does_not_block(self):
+        self.connect()
+        start = time.monotonic()
+        for load in (0.0, 0.5, 1.0):
+            self.pool.submit(sample(load, load, load, load, load), 10)
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertTrue(wait_for(lambda: self.fast.transfers >= 2))
+        # The slow stick is still working through its first morph
+        self.assertLess(self.slow.transfers, self.fast.transfers)
+
+    def test_unplugged_stick_is_dropped_and_rediscovered(self):
+        self.connect()
+        self.backend.detach(self.slow.serial_number)
+        self.pool.submit(sample(1.0, 1.0, 1.0, 1.0, 1.0), 10)
+        worker = next(w for w in self.pool if w.serial == "BS000002-1.5")
+        self.assertTrue(wait_for(lambda: not worker.isAlive()))
+
+        # The other stick keeps going
+        self.pool.submit(sample(0.0, 0.0, 0.0, 0.0, 0.0), 10)
+        self.assertTrue(wait_for(lambda: self.fast.transfers >= 2))
+
+        self.assertEqual(0, self.connect())
+        self.assertEqual(["BS000001-1.5"], self.pool.serials())
+
+        # Looked for again on the next scan
+        self.backend.attach(self.slow)
+        self.assertEqual(0, self.pool.sync())
+        self.assertEqual(1, self.connect())
+        self.assertEqual(3, self.pool.connects)
+
+    def test_stop_turns_off(self):
+        self.slow.latency_ms = 0
+        self.connect()
+        self.pool.submit(sample(1.0, 1.0, 1.0, 1.0, 1.0), 10)
+        self.pool.stop(5)
+        self.assertEqual(0, len(self.pool))
+        for device in (self.fast, self.slow):
+            self.assertEqual((0, 0, 0), device._color)
+
+
+class TestStickShutdown(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.device = EmulatedFadeStick()
+        self.previous = setBackend(EmulatorBackend([self.device]))
+        self.worker = StickWorker(FadeStick(findFirstFadeStick()), shutdown_s=0.5)
+        self.worker.start()
+        self.worker.submit(RED, 10)
+        self.assertTrue(wait_for(lambda: self.worker.transfers == 1))
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        setBackend(self.previous)
+
+    def test_fades_off_in_one_upload(self):
+        transfers = self.device.transfers
+        start = time.monotonic()
+        self.worker.stop()
+        self.worker.join(5)
+        self.assertTrue(self.worker.off)
+        self.assertEqual((0, 0, 0), self.device.shownColor())
+        # One pattern upload, then a few buffer polls once the fade has played
+        self.assertLessEqual(self.device.transfers - transfers, 4)
+        self.assertLess(time.monotonic() - start, StickWorker.SHUTDOWN_FADE_MS / 1000.0 + 0.2)
+
+    def test_deadline(self):
+        self.device.failure_rate = 1.0
+        start = time.monotonic()
+        self.worker.stop()
+        self.worker.join(5)
+        self.assertFalse(self.worker.off)
+        self.assertLess(time.monotonic() - start, 0.5 + 0.1)
+        # Backoff keeps a dead stick from being flooded: each attempt is a
+        # transfer and its retry after reacquiring the stick
+        self.assertLess(self.device.failures, 2 * 10)
+
+
+class TestStickCircuit(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = EmulatedClock()
+        # A wedged stick: every transfer times out, without the real wait
+        self.device = EmulatedFadeStick(sleep=lambda _: None)
+        self.previous = setBackend(EmulatorBackend([self.device]))
+        self.breaker = CircuitBreaker(threshold=2, cooldown_s=60.0, clock=self.clock)
+        self.worker = StickWorker(FadeStick(findFirstFadeStick()), breaker=self.breaker, shutdown_s=0.1)
+        self.device.latency_ms = 10_000
+        self.worker.start()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.device.latency_ms = 0
+        self.worker.stop()
+        self.worker.join(5)
+        setBackend(self.previous)
+
+    def test_opens_and_recovers(self):
+        self.assertTrue(self.worker.submit(RED, 10))
+        self.assertTrue(wait_for(lambda: self.worker.errors == 1))
+        self.assertTrue(self.worker.submit(RED, 10))
+        self.assertTrue(wait_for(lambda: self.breaker.state == CircuitBreaker.OPEN))
+        # The stick is not retried, and not given up on either
+        self.assertFalse(self.worker.submit(RED, 10))
+        self.assertTrue(self.worker.isAlive())
+        self.assertEqual(2, self.worker.errors)
+
+        # One trial transfer once the cooldown has passed
+        self.device.latency_ms = 0
+        self.clock.now += 60.0
+        self.assertTrue(self.worker.submit(RED, 10))
+        self.assertTrue(wait_for(lambda: self.worker.transfers == 1))
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+
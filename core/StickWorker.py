@@ -0,0 +1,195 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Final, Optional, Sequence, Tuple
+
+from usb.core import USBError
+
+from constants.DaemonConsts import SHUTDOWN_DEADLINE_S
+from core.CPU import SmoothingFilter
+from core.CPUSampler import CPUSample
+from core.CircuitBreaker import CircuitBreaker
+from core.ColorChangeFilter import ColorChangeFilter
+from core.FadeStick import FadeStick
+from core.LatencyHistogram import LatencyHistogram
+from exceptions.FadeStickUSBException import FadeStickUSBException
+from utils.Colors import OFF
+from utils.Types import RGB
+
+# (color, duration_ms), or None to stop
+_Job = Optional[Tuple[RGB, int]]
+
+
+class StickWorker:
+    """
+    Drives one FadeStick from its own thread. The daemon only posts colors
+    to the worker's mailbox, so a slow or unplugged stick never delays the
+    others. The mailbox holds one color: a newer color replaces one that
+    has not been sent yet. Transfers that fail or time out trip a circuit
+    breaker, and colors are dropped while it is open rather than retried
+    against a wedged stick.
+    """
+    # Shutdown fades to off in one pattern transfer, then polls with
+    # exponential backoff until the pattern has drained
+    SHUTDOWN_FADE_MS: Final = 250
+    SHUTDOWN_FIRST_POLL_S: Final = 0.01
+    SHUTDOWN_MAX_POLL_S: Final = 0.2
+
+    _log: Final = logging.getLogger("daemon")
+
+    def __init__(self, fs: FadeStick, cores: Optional[Sequence[int]] = None,
+                 color_delta: int = 2, max_stale_s: float = 30.0,
+                 usb_latency: Optional[LatencyHistogram] = None,
+                 smoothing: Optional[SmoothingFilter] = None,
+                 shutdown_s: float = SHUTDOWN_DEADLINE_S,
+                 breaker: Optional[CircuitBreaker] = None) -> None:
+        """
+        :param cores: CPU cores this stick shows, or all of them if None
+        :param usb_latency: Histogram of morph transfer times, may be shared between workers
+        :param smoothing: Filter for this stick's load
+        :param shutdown_s: Hard deadline for turning the stick off once stopped
+        :param breaker: Stops transfers to a failing stick; a default one if None
+        """
+        self.fs: Final = fs
+        self.serial: Final[str] = fs.serial
+        self.cores: Final[Tuple[int, ...]] = tuple(cores) if cores else ()
+        self.color_filter: Final = ColorChangeFilter(color_delta, max_stale_s)
+        self.color: RGB = OFF
+        self.transfers: int = 0
+        self.errors: int = 0
+        self._usb_latency: Final = usb_latency
+        self._smoothing: Final = smoothing
+        self._shutdown_s: Final = shutdown_s
+        self.breaker: Final = breaker if breaker else CircuitBreaker()
+        self.off: bool = False
+        self._mailbox: queue.Queue = queue.Queue(maxsize=1)
+        self._alive: bool = True
+        self._turn_off: bool = True
+        self._thread: Final = threading.Thread(
+            target=self._work, name=f"stick-{self.serial}", daemon=True)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}[{self.serial}]>"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, turn_off: bool = True) -> None:
+        """
+        Ask the worker to exit; see join()
+        :param turn_off: Turn the stick off first, which is pointless once it has been unplugged
+        """
+        self._turn_off = turn_off
+        self._post(None)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+    def isAlive(self) -> bool:
+        """False once the stick has failed and needs to be rediscovered"""
+        return self._alive and self._thread.is_alive()
+
+    def utilization(self, sample: CPUSample) -> float:
+        """This stick's share of the sample: the mean over its cores"""
+        if not self.cores:
+            return sample.utilization
+        per_core = sample.core_utilization
+        loads = [per_core[c] for c in self.cores if c < len(per_core)]
+        return sum(loads) / len(loads) if loads else 0.0
+
+    def smooth(self, load: float) -> float:
+        return self._smoothing.update(load) if self._smoothing else load
+
+    def submit(self, color: RGB, duration_ms: int) -> bool:
+        """Queue a morph unless the color is unchanged. Never blocks."""
+        self.color = color
+        if not self._alive or self.breaker.retryIn() or not self.color_filter.shouldSend(color):
+            return False
+        self._post((color, duration_ms))
+        return True
+
+    # Internals #
+
+    def _post(self, job: _Job) -> None:
+        # Only the daemon thread posts, so a replaced job is never lost twice
+        while True:
+            try:
+                self._mailbox.put_nowait(job)
+                return
+            except queue.Full:
+                try:
+                    self._mailbox.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _work(self) -> None:
+        while True:
+            job = self._mailbox.get()
+            if job is None:
+                break
+            color, duration_ms = job
+            if not self.breaker.allow():
+                # Sent once the circuit lets a trial transfer through
+                self.color_filter.reset()
+                continue
+            try:
+                start = time.perf_counter()
+                self.fs.morph(color, duration_ms)
+                if self._usb_latency is not None:
+                    self._usb_latency.observe(time.perf_counter() - start)
+                self.transfers += 1
+                self.color_filter.markSent(color)
+                if self.breaker.state != CircuitBreaker.CLOSED:
+                    self._log.info(f"FadeStick {self.serial} is responding again")
+                self.breaker.success()
+            except FadeStickUSBException as e:
+                self._log.warning(f"FadeStick {self.serial} lost: {e}")
+                self.errors += 1
+                self._alive = False
+                return
+            except USBError as e:
+                # Still attached, e.g. a timeout or a stall
+                self.errors += 1
+                self.color_filter.reset()
+                if self.breaker.failure():
+                    self._log.warning(f"FadeStick {self.serial} failing, pausing transfers for "
+                                      f"{self.breaker.retryIn():.1f} s: {e}")
+            except Exception as e:
+                self._log.error(f"FadeStick {self.serial} exception: {e}")
+                self.errors += 1
+                # Resend on the next tick
+                self.color_filter.reset()
+        if self._turn_off:
+            self.off = self._turnOff()
+
+    def _turnOff(self) -> bool:
+        """Fade to off and confirm it, giving up at the shutdown deadline"""
+        deadline = time.monotonic() + self._shutdown_s
+        backoff = self.SHUTDOWN_FIRST_POLL_S
+        uploaded = False
+        while True:
+            try:
+                if not uploaded:
+                    self.fs.morph(OFF, self.SHUTDOWN_FADE_MS)
+                    uploaded = True
+                    # Nothing to confirm until the fade has played
+                    wait = self.SHUTDOWN_FADE_MS / 1000.0
+                elif len(self.fs._get_buffer_bytes()):
+                    # The firmware returns the buffer once the pattern has drained
+                    return True
+                else:
+                    wait = backoff
+                    backoff = min(backoff * 2, self.SHUTDOWN_MAX_POLL_S)
+            except Exception as e:
+                self._log.warning(f"FadeStick {self.serial} shutdown error: {e}")
+                wait = backoff
+                backoff = min(backoff * 2, self.SHUTDOWN_MAX_POLL_S)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._log.error(f"FadeStick {self.serial} not confirmed off within {self._shutdown_s} s")
+                return False
+            time.sleep(min(wait, remaining))
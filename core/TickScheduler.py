@@ -0,0 +1,101 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import os
+import select
+import time
+from typing import Callable, Final, Optional
+
+from utils.Types import RangeInt
+
+
+class TickScheduler:
+    """
+    Fixed-cadence ticks on absolute monotonic deadlines. The time spent
+    working in a tick is absorbed instead of added to the period, and
+    deadlines that have already passed are counted and skipped rather than
+    run back-to-back.
+    """
+    MAX_PERIOD_MS: Final = 3_600_000
+
+    def __init__(self, period_ms: int, clock: Callable[[], float] = time.monotonic,
+                 wait: Optional[Callable[[float], bool]] = None) -> None:
+        """
+        :param clock: Monotonic clock in seconds
+        :param wait: Blocks for the given seconds and returns True if woken early
+        """
+        self._clock = clock
+        self._stopped: bool = False
+        # stop() runs in signal handlers, so it wakes waits through a pipe
+        # rather than an Event, whose lock the interrupted thread may hold
+        self._wake_r, self._wake_w = os.pipe() if wait is None else (-1, -1)
+        if wait is None:
+            os.set_blocking(self._wake_w, False)
+            self._poll = select.poll()
+            self._poll.register(self._wake_r, select.POLLIN)
+        self._wait = wait if wait else self._pipeWait
+        self.period_s: float = RangeInt(period_ms, 1, self.MAX_PERIOD_MS, "period_ms") / 1000.0
+        self.missed: int = 0
+        self.ticks: int = 0
+        # Length of the last tick, which is the window the next sample covers
+        self.window_s: float = 0.0
+        self._last: float = clock()
+        self._deadline: float = self._last + self.period_s
+
+    def setPeriod(self, period_ms: int) -> None:
+        """Takes effect from the next deadline"""
+        self.period_s = RangeInt(period_ms, 1, self.MAX_PERIOD_MS, "period_ms") / 1000.0
+        self._deadline = self._last + self.period_s
+
+    def reset(self) -> None:
+        """Restart the cadence from now, e.g. after a reconnect"""
+        self._last = self._clock()
+        self._deadline = self._last + self.period_s
+
+    def wait(self) -> bool:
+        """
+        Sleep until the next deadline, or return at once if it has passed.
+        Returns False if woken by stop().
+        """
+        now = self._clock()
+        if now < self._deadline:
+            if self._wait(self._deadline - now):
+                return False
+            now = self._clock()
+            self._deadline += self.period_s
+        else:
+            # Run this tick late and skip deadlines that have fully passed
+            late = int((now - self._deadline) // self.period_s)
+            self.missed += late + 1
+            self._deadline += (late + 1) * self.period_s
+            if self._stopped:
+                return False
+
+        self.window_s = now - self._last
+        self._last = now
+        self.ticks += 1
+        return True
+
+    def sleep(self, seconds: float) -> bool:
+        """Interruptible sleep outside the cadence. Returns False if woken by stop()."""
+        return not self._wait(seconds)
+
+    def stop(self) -> None:
+        """Wake any wait() or sleep() now; safe to call from a signal handler"""
+        self._stopped = True
+        if self._wake_w >= 0:
+            try:
+                os.write(self._wake_w, b"\0")
+            except BlockingIOError:
+                pass
+
+    def isStopped(self) -> bool:
+        return self._stopped
+
+    # Internals #
+
+    def _pipeWait(self, seconds: float) -> bool:
+        if self._stopped:
+            return True
+        # The pipe is never drained, so every wait after stop() returns at once
+        return bool(self._poll.poll(max(0.0, seconds) * 1000.0))
@@ -0,0 +1,72 @@
+#  Copyright (c) Eric Draken, 2021.
+import threading
+import time
+from unittest import TestCase
+
+from core.TickScheduler import TickScheduler
+from core.emulator.ClockEmulator import EmulatedClock
+from exceptions.NumberExceptions import RangeIntException
+
+
+class TestTickScheduler(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = EmulatedClock()
+        self.scheduler = TickScheduler(1000, clock=self.clock, wait=self.clock.wait)
+
+    def test_work_is_absorbed(self):
+        for _ in range(3):
+            self.clock.now += 0.3  # Sampling and USB transfer
+            self.assertTrue(self.scheduler.wait())
+        self.assertEqual([0.7, 0.7, 0.7], self.clock.waits)
+        self.assertEqual(3.0, self.clock.now)
+        self.assertEqual(0, self.scheduler.missed)
+
+    def test_window(self):
+        self.clock.now += 0.25
+        self.scheduler.wait()
+        self.assertAlmostEqual(1.0, self.scheduler.window_s)
+
+    def test_late_tick_runs_now(self):
+        self.clock.now += 1.2
+        self.assertTrue(self.scheduler.wait())
+        self.assertEqual([], self.clock.waits)
+        self.assertEqual(1, self.scheduler.missed)
+        self.assertAlmostEqual(1.2, self.scheduler.window_s)
+
+        # Back on the original cadence
+        self.scheduler.wait()
+        self.assertAlmostEqual(2.0, self.clock.now)
+
+    def test_skipped_deadlines(self):
+        self.clock.now += 3.5
+        self.scheduler.wait()
+        self.assertEqual(3, self.scheduler.missed)
+        self.scheduler.wait()
+        self.assertAlmostEqual(4.0, self.clock.now)
+
+    def test_reset(self):
+        self.clock.now += 10.0
+        self.scheduler.reset()
+        self.scheduler.wait()
+        self.assertEqual(0, self.scheduler.missed)
+        self.assertAlmostEqual(11.0, self.clock.now)
+
+    def test_set_period(self):
+        self.scheduler.wait()
+        self.scheduler.setPeriod(500)
+        self.scheduler.wait()
+        self.assertAlmostEqual(1.5, self.clock.now)
+
+    def test_bad_period(self):
+        with self.assertRaises(RangeIntException):
+            TickScheduler(0)
+
+    def test_stop_wakes_wait(self):
+        scheduler = TickScheduler(60_000)
+        threading.Timer(0.05, scheduler.stop).start()
+        start = time.monotonic()
+        self.assertFalse(scheduler.wait())
+        self.assertLess(time.monotonic() - start, 5.0)
+        self.assertTrue(scheduler.isStopped())
+        self.assertFalse(scheduler.sleep(60))
@@ -0,0 +1,35 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+from typing import Final, List
+
+
+class EmulatedClock:
+    """
+    Stands in for time.monotonic() where a clock is injected. Time only
+    moves when a test advances `now`, or when the code under test calls
+    sleep() or wait(), which return at once.
+    """
+    # Where wall() starts, as a Unix time
+    EPOCH_S: Final = 1_600_000_000.0
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now: float = now
+        # Every wait() in seconds, rounded to the microsecond
+        self.waits: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+    def wait(self, seconds: float) -> bool:
+        """Like TickScheduler's wait: never woken early"""
+        self.waits.append(round(seconds, 6))
+        self.now += seconds
+        return False
+
+    def wall(self) -> float:
+        """A time.time() that moves with now"""
+        return self.EPOCH_S + self.now
@@ -0,0 +1,241 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import errno
+import random
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Final, Iterable, List, Optional, Tuple, Union
+
+from usb.core import USBError, USBTimeoutError
+
+from constants.FadeStickConsts import FS_MANUFACTURER, FS_MANUFACTURER_INDEX, \
+    FS_DESCRIPTION_INDEX, FS_SERIAL_INDEX, FS_USB_STRING, FS_MODE_COLOR, FS_MODE_PATTERN
+from core.FadeStickBackend import Backend
+from core.HotplugWatcher import HotplugWatcher
+from core.FadeStickUSB import R_USB_SEND, R_USB_RECV, R_SET_CONFIG, R_CLEAR_FEATURE
+from core.emulator.UeventEmulator import EmulatedUeventSource
+from core.pattern.Pattern import Pattern
+
+# (red, green, blue, duration_ms)
+_Step = Tuple[int, int, int, int]
+
+
+class EmulatedFadeStick:
+    """
+    Software FadeStick speaking the same control-transfer protocol as the
+    firmware. Patterns play back against a monotonic clock, so the pattern
+    buffer drains in real time just like on the device.
+    """
+    DESCRIPTION: Final = "FadeStick Emulator"
+
+    def __init__(self,
+                 serial: str = FS_USB_STRING,
+                 latency_ms: float = 0.0,
+                 failure_rate: float = 0.0,
+                 seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self.serial_number: Final[str] = serial
+        self.manufacturer: Final[str] = FS_MANUFACTURER
+        self.product: Final[str] = self.DESCRIPTION
+        self.latency_ms: float = latency_ms
+        self.failure_rate: float = failure_rate
+        self.attached: bool = True
+        self.transfers: int = 0
+        self.string_reads: int = 0
+        self.failures: int = 0
+
+        self._clock = clock
+        self._sleep = sleep
+        self._random = random.Random(seed)
+        self._fail_next: int = 0
+        self._lock = threading.Lock()
+
+        self._color: Tuple[int, int, int] = (0, 0, 0)
+        self._pattern: List[_Step] = []
+        self._pattern_start: float = 0.0
+        self._buffer: bytes = bytes(Pattern.PATTERN_BUFFER_BYTE_LENGTH)
+
+    def __repr__(self):
+        return "<" + self.__str__() + ">"
+
+    def __str__(self):
+        return f"{self.__class__.__name__}[{self.serial_number}]"
+
+    # Failure injection #
+
+    def failNext(self, count: int = 1) -> None:
+        """Make the next 'count' transfers raise a USBError"""
+        self._fail_next += count
+
+    def unplug(self) -> None:
+        self.attached = False
+
+    def plug(self) -> None:
+        self.attached = True
+
+    # Observation #
+
+    def shownColor(self) -> Tuple[int, int, int]:
+        """What the LED shows right now, without a transfer"""
+        with self._lock:
+            self._drain()
+            return self._color
+
+    # pyusb Device API #
+
+    def is_kernel_driver_active(self, _interface: int) -> bool:
+        return False
+
+    def detach_kernel_driver(self, _interface: int) -> None:
+        pass
+
+    def getString(self, index: int) -> str:
+        self._checkAttached()
+        self.string_reads += 1
+        if index == FS_MANUFACTURER_INDEX:
+            return self.manufacturer
+        if index == FS_DESCRIPTION_INDEX:
+            return self.product
+        if index == FS_SERIAL_INDEX:
+            return self.serial_number
+        raise USBError("Invalid string descriptor index", errno=errno.EPIPE)
+
+    def ctrl_transfer(self,
+                      bmRequestType: int,
+                      bRequest: int,
+                      wValue: int = 0,
+                      _wIndex: int = 0,
+                      data_or_wLength: Union[bytes, int, None] = None,
+                      timeout: Optional[int] = None) -> Union[int, array]:
+        self._checkAttached()
+        self._delay(timeout)
+
+        with self._lock:
+            self.transfers += 1
+            if self._fail_next:
+                self._fail_next -= 1
+                self.failures += 1
+                raise USBError("Input/Output Error (injected)", errno=errno.EIO)
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                self.failures += 1
+                raise USBError("Input/Output Error (injected)", errno=errno.EIO)
+
+            self._drain()
+            if bmRequestType == R_USB_SEND and bRequest == R_SET_CONFIG:
+                data = bytes(data_or_wLength)
+                if wValue == FS_MODE_COLOR:
+                    return self._writeColor(data)
+                if wValue == FS_MODE_PATTERN:
+                    return self._writePattern(data)
+            elif bmRequestType == R_USB_RECV:
+                if bRequest == R_CLEAR_FEATURE and wValue == FS_MODE_COLOR:
+                    return array("B", [FS_MODE_COLOR, *self._color])
+                if bRequest == R_SET_CONFIG and wValue == FS_MODE_PATTERN:
+                    # The firmware returns nothing while a pattern is processing
+                    if self._pattern:
+                        return array("B")
+                    return array("B", self._buffer[:int(data_or_wLength)])
+
+        raise USBError("Pipe error (unsupported request)", errno=errno.EPIPE)
+
+    # Internals #
+
+    def _checkAttached(self) -> None:
+        if not self.attached:
+            raise USBError("No such device (it may have been disconnected)", errno=errno.ENODEV)
+
+    def _delay(self, timeout: Optional[int]) -> None:
+        if timeout and self.latency_ms > timeout:
+            self._sleep(timeout / 1000.0)
+            raise USBTimeoutError("Operation timed out", errno=errno.ETIMEDOUT)
+        if self.latency_ms:
+            self._sleep(self.latency_ms / 1000.0)
+
+    def _writeColor(self, data: bytes) -> int:
+        # [mode, r, g, b]
+        if len(data) < 4:
+            raise USBError("Pipe error (short color report)", errno=errno.EPIPE)
+        self._pattern = []
+        self._color = (data[1], data[2], data[3])
+        return len(data)
+
+    def _writePattern(self, data: bytes) -> int:
+        # [mode, count, (r, g, b, duration / 10) * count]
+        if len(data) < 2 or len(data) < 2 + 4 * data[1] or data[1] > Pattern.MAX_BUFFER_SIZE:
+            raise USBError("Pipe error (malformed pattern)", errno=errno.EPIPE)
+        count = data[1]
+        resolution = int(Pattern.DURATION_RESOLUTION)
+        self._buffer = bytes(data[1:1 + Pattern.PATTERN_BUFFER_BYTE_LENGTH])
+        self._pattern = [(data[i], data[i + 1], data[i + 2], data[i + 3] * resolution)
+                         for i in range(2, 2 + 4 * count, 4)]
+        self._pattern_start = self._clock()
+        self._drain()
+        return len(data)
+
+    def _drain(self) -> None:
+        """Advance the running pattern to the current time"""
+        if not self._pattern:
+            return
+
+        elapsed_ms = (self._clock() - self._pattern_start) * 1000.0
+        for r, g, b, duration in self._pattern:
+            self._color = (r, g, b)
+            if elapsed_ms < duration:
+                return
+            elapsed_ms -= duration
+
+        # The last step has elapsed and the buffer is empty
+        self._pattern = []
+
+
+class EmulatorBackend(Backend):
+    """Backend of in-process EmulatedFadeSticks keyed by serial"""
+
+    def __init__(self, devices: Optional[Iterable[EmulatedFadeStick]] = None,
+                 uevents: Optional[EmulatedUeventSource] = None) -> None:
+        """
+        :param uevents: Reports each attach and detach to hotplug watchers, which are unavailable if None
+        """
+        self._devices: Dict[str, EmulatedFadeStick] = {}
+        self._ports: Dict[str, int] = {}
+        self.uevents: Final = uevents
+        for device in (devices if devices is not None else [EmulatedFadeStick()]):
+            self.attach(device)
+
+    def attach(self, device: EmulatedFadeStick) -> EmulatedFadeStick:
+        device.plug()
+        self._devices[device.serial_number] = device
+        if self.uevents:
+            self.uevents.attach(self._port(device.serial_number))
+        return device
+
+    def detach(self, serial: str) -> Optional[EmulatedFadeStick]:
+        device = self._devices.pop(serial, None)
+        if device:
+            device.unplug()
+            if self.uevents:
+                self.uevents.detach(self._port(serial))
+        return device
+
+    def devices(self) -> List[EmulatedFadeStick]:
+        return list(self._devices.values())
+
+    def findDevices(self) -> Iterable[EmulatedFadeStick]:
+        return iter(self.devices())
+
+    def getString(self, device: EmulatedFadeStick, index: int) -> str:
+        return device.getString(index)
+
+    def openHotplug(self) -> HotplugWatcher:
+        if not self.uevents:
+            return super().openHotplug()
+        return HotplugWatcher(sock=self.uevents.connect())
+
+    # Internals #
+
+    def _port(self, serial: str) -> int:
+        """Each serial keeps the root hub port it was first plugged into"""
+        return self._ports.setdefault(serial, len(self._ports) + 1)
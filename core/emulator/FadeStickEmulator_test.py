@@ -0,0 +1,137 @@
+#  Copyright (c) Eric Draken, 2021.
+from unittest import TestCase
+
+from usb.core import USBError, USBTimeoutError
+
+from core.FadeStick import FadeStick
+from core.FadeStickUSB import setBackend, findFirstFadeStick, findAllFadeSticks, \
+    findFadeStickBySerial, getManufacturer
+from core.emulator.ClockEmulator import EmulatedClock
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+from constants.FadeStickConsts import FS_MANUFACTURER, FS_WRITE_TIMEOUT_MS
+from exceptions.FadeStickUSBException import FadeStickUSBException
+from utils.Colors import RED, BLUE, OFF
+
+
+class TestFadeStickEmulator(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = EmulatedClock(100.0)
+        self.emulator = EmulatedFadeStick(clock=self.clock, sleep=self.clock.sleep)
+        self.backend = EmulatorBackend([self.emulator])
+        self.previous = setBackend(self.backend)
+        self.device = FadeStick(findFirstFadeStick())
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        setBackend(self.previous)
+
+    def test_find(self):
+        self.assertEqual(1, len(findAllFadeSticks()))
+        self.assertEqual(FS_MANUFACTURER, getManufacturer(self.device))
+        self.assertIs(self.emulator, findFadeStickBySerial(self.emulator.serial_number).device)
+
+    def test_set_get_color(self):
+        self.device.setColor(RED)
+        self.assertEqual(RED, self.device.getColor(fresh=True))
+
+    def test_pattern_drains_in_real_time(self):
+        self.device.setColor(RED)
+        self.device.morph(BLUE, 1000, 10)
+        self.assertEqual(0, len(self.device._get_buffer_bytes()))
+        self.assertNotEqual(BLUE, self.device.getColor(fresh=True))
+
+        self.clock.sleep(0.5)
+        self.assertNotIn(self.device.getColor(fresh=True), (RED, BLUE))
+
+        self.clock.sleep(0.6)
+        self.assertEqual(BLUE, self.device.getColor(fresh=True))
+        self.assertNotEqual(0, len(self.device._get_buffer_bytes()))
+
+    def test_blink_ends_off(self):
+        self.device.blink(RED, 2, 100)
+        self.assertEqual(RED, self.device.getColor(fresh=True))
+        self.clock.sleep(0.15)
+        self.assertEqual(OFF, self.device.getColor(fresh=True))
+        self.clock.sleep(0.1)
+        self.assertEqual(RED, self.device.getColor(fresh=True))
+        self.clock.sleep(0.1)
+        self.assertTrue(self.device.isOff())
+
+    def test_set_color_cancels_pattern(self):
+        self.device.morph(BLUE, 1000, 10)
+        self.device.setColor(RED)
+        self.clock.sleep(2)
+        self.assertEqual(RED, self.device.getColor(fresh=True))
+
+    def test_latency(self):
+        self.emulator.latency_ms = 20
+        start = self.clock.now
+        self.device.setColor(RED)
+        self.assertAlmostEqual(0.02, self.clock.now - start)
+
+    def test_timeout(self):
+        self.emulator.latency_ms = 10_000
+        with self.assertRaises(USBError):
+            self.emulator.ctrl_transfer(0xA0, 0x1, 1, 0, 4, 100)
+
+    def test_timeout_is_not_retried(self):
+        self.emulator.latency_ms = 10_000
+        reads = self.emulator.string_reads
+        start = self.clock.now
+        with self.assertRaises(USBTimeoutError):
+            self.device.setColor(RED)
+        # One write timeout, without reacquiring the stick and trying again
+        self.assertAlmostEqual(FS_WRITE_TIMEOUT_MS / 1000.0, self.clock.now - start)
+        self.assertEqual(reads, self.emulator.string_reads)
+
+    def test_fail_next(self):
+        self.emulator.failNext(2)
+        with self.assertRaises(USBError):
+            self.device.setColor(RED)
+        self.assertEqual(2, self.emulator.failures)
+        self.device.setColor(RED)
+        self.assertEqual(RED, self.device.getColor(fresh=True))
+
+    def test_failure_rate(self):
+        self.emulator.failure_rate = 1.0
+        with self.assertRaises(USBError):
+            self.device.setColor(RED)
+
+    def test_unplugged(self):
+        self.backend.detach(self.emulator.serial_number)
+        with self.assertRaises(FadeStickUSBException):
+            self.device.setColor(RED)
+        with self.assertRaises(FadeStickUSBException):
+            findFirstFadeStick()
+
+        self.backend.attach(self.emulator)
+        self.device.setColor(RED)
+        self.assertEqual(RED, self.device.getColor(fresh=True))
+
+    def test_morph_is_one_transfer(self):
+        self.device.setColor(RED)
+        transfers = self.emulator.transfers
+        self.device.morph(BLUE, 1000, 10)
+        self.device.morph(RED, 1000, 10)
+        self.assertEqual(transfers + 2, self.emulator.transfers)
+
+    def test_shadow_color(self):
+        self.device.morph(BLUE, 1000, 10)
+        self.assertEqual(BLUE, self.device.getColor())
+        self.device.blink(RED, 1, 100)
+        self.assertEqual(OFF, self.device.getColor())
+
+    def test_shadow_color_resync(self):
+        self.device.setColor(RED)
+        self.emulator.ctrl_transfer(0x20, 0x9, 1, 0, bytes([1, 0, 0, 255]), 100)
+        self.assertEqual(RED, self.device.getColor())
+        self.assertEqual(BLUE, self.device.resync())
+        self.assertEqual(BLUE, self.device.getColor())
+
+    def test_shadow_color_reset_on_reconnect(self):
+        self.device.setColor(RED)
+        self.backend.detach(self.emulator.serial_number)
+        fresh = self.backend.attach(EmulatedFadeStick(clock=self.clock, sleep=self.clock.sleep))
+        self.device.setDevice(fresh)
+        self.assertEqual(OFF, self.device.getColor())
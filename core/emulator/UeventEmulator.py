@@ -0,0 +1,65 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import socket
+from typing import Final, List
+
+from constants.FadeStickConsts import FS_VENDOR_ID, FS_PRODUCT_ID
+
+
+def uevent(action: str, devpath: str, **properties: str) -> bytes:
+    """A datagram as the kernel sends it: the summary, then NUL-separated KEY=value pairs"""
+    fields = [f"{action}@{devpath}", f"ACTION={action}", f"DEVPATH={devpath}"]
+    fields += [f"{k}={v}" for k, v in properties.items()]
+    return "\0".join(fields).encode("utf-8") + b"\0"
+
+
+class EmulatedUeventSource:
+    """
+    Stands in for the kernel uevent netlink socket. Every connect() returns
+    a datagram socket for a HotplugWatcher, and each event is sent to all
+    of them, like a multicast group.
+    """
+    # Where a stick on a root hub port appears in sysfs
+    DEVPATH: Final = "/devices/pci0000:00/0000:00:14.0/usb1/1-{port}"
+
+    def __init__(self) -> None:
+        self._senders: List[socket.socket] = []
+        self.sent: int = 0
+
+    def connect(self) -> socket.socket:
+        sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._senders.append(sender)
+        return receiver
+
+    def send(self, data: bytes) -> None:
+        for sender in list(self._senders):
+            try:
+                sender.send(data)
+            except OSError:
+                # The watcher has closed its end
+                self._senders.remove(sender)
+                sender.close()
+        self.sent += 1
+
+    def attach(self, port: int = 1, vendor_id: int = FS_VENDOR_ID, product_id: int = FS_PRODUCT_ID) -> None:
+        self._device("add", port, vendor_id, product_id)
+
+    def detach(self, port: int = 1, vendor_id: int = FS_VENDOR_ID, product_id: int = FS_PRODUCT_ID) -> None:
+        self._device("remove", port, vendor_id, product_id)
+
+    def close(self) -> None:
+        for sender in self._senders:
+            sender.close()
+        self._senders = []
+
+    # Internals #
+
+    def _device(self, action: str, port: int, vendor_id: int, product_id: int) -> None:
+        devpath = self.DEVPATH.format(port=port)
+        product = f"{vendor_id:x}/{product_id:x}/100"
+        # The kernel reports the device, then each of its interfaces
+        self.send(uevent(action, devpath, SUBSYSTEM="usb", DEVTYPE="usb_device", PRODUCT=product,
+                         BUSNUM="001", DEVNUM=f"{port + 1:03d}"))
+        self.send(uevent(action, f"{devpath}/1-{port}:1.0", SUBSYSTEM="usb", DEVTYPE="usb_interface",
+                         PRODUCT=product, INTERFACE="3/0/0"))
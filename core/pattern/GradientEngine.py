@@ -0,0 +1,98 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+from functools import lru_cache
+from math import floor
+from typing import Final, Iterator, List, Tuple
+
+from core.pattern.Pattern import Pattern
+from core.pattern.PatternOptimizer import PatternOptimizer
+from utils.Colors import scaleToRGB
+from utils.Types import RGB
+
+
+class GradientEngine:
+    """
+    Precomputed colors for the daemon. Load-to-color is a table lookup, and
+    morph patterns are memoized by (start, end, duration, entries) in a
+    bounded LRU, so a repeated fade is ready-to-send bytes.
+    Keyframe patterns merge the steps a fade rounds to the same color and
+    spend the freed entries on finer steps, down to the device's 10 ms.
+    Returned Patterns are shared and must not be modified.
+    """
+    LOAD_LEVELS: Final = 256
+    DEFAULT_CACHE_SIZE: Final = 128
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE, minIsGreen: bool = True) -> None:
+        top = self.LOAD_LEVELS - 1
+        self._load_table: Final[List[RGB]] = [
+            scaleToRGB(i / top, minIsGreen) for i in range(self.LOAD_LEVELS)]
+        self._keyframes = lru_cache(maxsize=cache_size)(self._buildKeyframes)
+        self.optimizer: Final = PatternOptimizer()
+
+    def loadToRGB(self, value: float) -> RGB:
+        """Table equivalent of scaleToRGB() for a 0.0 - 1.0 load"""
+        if value <= 0.0:
+            return self._load_table[0]
+        if value >= 1.0:
+            return self._load_table[-1]
+        return self._load_table[int(value * (self.LOAD_LEVELS - 1))]
+
+    def keyframePattern(self, start: RGB, end: RGB, duration: int,
+                        max_entries: int = Pattern.MAX_BUFFER_SIZE) -> Pattern:
+        """The smoothest fade over duration that fits in max_entries"""
+        # RangeInts are unhashable, so key on plain ints
+        steps, pattern = self._keyframes(start, end, int(duration), int(max_entries))
+        # Counted on every call, cache hits included, as each one is sent
+        self.optimizer.record(steps, len(pattern))
+        return pattern
+
+    def cacheInfo(self):
+        return self._keyframes.cache_info()
+
+    def cacheClear(self) -> None:
+        self._keyframes.cache_clear()
+
+    # noinspection DuplicatedCode
+    @staticmethod
+    def _morphSteps(start: RGB, end: RGB, steps: int, duration: int) -> Iterator[Tuple[RGB, int]]:
+        r_start, g_start, b_start = start
+        r_end, g_end, b_end = end
+        ms_delay = floor(float(duration) / float(steps))
+
+        for n in range(0, steps):  # Range is exclusive
+            d = 1.0 * (n + 1) / float(steps)
+            r = (r_start * (1 - d)) + (r_end * d)
+            g = (g_start * (1 - d)) + (g_end * d)
+            b = (b_start * (1 - d)) + (b_end * d)
+            # Between two valid colors, so always in range
+            yield RGB.trusted(int(r), int(g), int(b)), ms_delay
+
+    def _buildKeyframes(self, start: RGB, end: RGB, duration: int, max_entries: int) -> Tuple[int, Pattern]:
+        """The number of fade steps, and the pattern they compress to"""
+        def compressed(steps: int) -> List[Tuple[RGB, int]]:
+            return list(PatternOptimizer.merge(self._morphSteps(start, end, steps, duration)))
+
+        # One step per device tick is as smooth as the stick can show
+        fine = max(1, int(duration // Pattern.DURATION_RESOLUTION))
+        low = min(fine, max_entries)
+        best = compressed(low)
+        if fine > low:
+            pattern = compressed(fine)
+            if len(pattern) <= max_entries:
+                low, best = fine, pattern
+            else:
+                # Entries grow with steps, near enough, so find the most that still fit
+                high = fine - 1
+                while low < high:
+                    mid = (low + high + 1) // 2
+                    pattern = compressed(mid)
+                    if len(pattern) <= max_entries:
+                        low, best = mid, pattern
+                    else:
+                        high = mid - 1
+        return low, PatternOptimizer.build(best)
+
+
+# Shared by all FadeSticks and the daemon
+GRADIENTS: Final = GradientEngine()
@@ -0,0 +1,56 @@
+#  Copyright (c) Eric Draken, 2021.
+from unittest import TestCase
+
+from core.pattern.GradientEngine import GradientEngine
+from utils.Colors import RED, GREEN, BLUE, scaleToRGB
+from utils.Types import RGB
+
+
+class TestGradientEngine(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.engine = GradientEngine(cache_size=4)
+
+    def test_load_table_ends(self):
+        self.assertEqual(GREEN, self.engine.loadToRGB(0.0))
+        self.assertEqual(RED, self.engine.loadToRGB(1.0))
+
+    def test_load_table_clamped(self):
+        self.assertEqual(GREEN, self.engine.loadToRGB(-0.5))
+        self.assertEqual(RED, self.engine.loadToRGB(1.5))
+
+    def test_load_table_matches_scale(self):
+        for i in range(GradientEngine.LOAD_LEVELS):
+            value = i / (GradientEngine.LOAD_LEVELS - 1)
+            self.assertEqual(scaleToRGB(value), self.engine.loadToRGB(value))
+
+    def test_load_table_within_one_level(self):
+        for i in range(1000):
+            expected = scaleToRGB(i / 1000)
+            actual = self.engine.loadToRGB(i / 1000)
+            self.assertLessEqual(abs(expected.red - actual.red), 1)
+            self.assertLessEqual(abs(expected.green - actual.green), 1)
+
+    def test_morph_steps(self):
+        self.assertEqual([(RGB(191, 0, 63), 250), (RGB(127, 0, 127), 250),
+                          (RGB(63, 0, 191), 250), (BLUE, 250)],
+                         list(GradientEngine._morphSteps(RED, BLUE, 4, 1000)))
+
+    def test_keyframe_pattern_cached(self):
+        first = self.engine.keyframePattern(RED, BLUE, 1000)
+        second = self.engine.keyframePattern(RED, BLUE, 1000)
+        self.assertIs(first, second)
+        self.assertEqual(1, self.engine.cacheInfo().hits)
+        # Each call is a pattern sent, so hits count towards compression too
+        self.assertEqual(2, self.engine.optimizer.patterns)
+
+    def test_keyframe_pattern_key(self):
+        first = self.engine.keyframePattern(RED, BLUE, 1000)
+        self.assertIsNot(first, self.engine.keyframePattern(RED, BLUE, 900))
+        self.assertIsNot(first, self.engine.keyframePattern(RED, BLUE, 1000, 9))
+        self.assertIsNot(first, self.engine.keyframePattern(BLUE, RED, 1000))
+
+    def test_cache_bounded(self):
+        for i in range(10):
+            self.engine.keyframePattern(RED, RGB(0, 0, i), 1000)
+        self.assertEqual(4, self.engine.cacheInfo().currsize)
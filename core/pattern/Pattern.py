@@ -1,17 +1,29 @@
 #  Copyright (c) Eric Draken, 2021.
 from __future__ import annotations
 import logging
+from array import array
 from typing import List, Final, Any
-from utils.Types import RGB, RangeInt
+
+from constants.FadeStickConsts import FS_MODE_PATTERN
+from utils.Types import RGB, RangeInt, checkRange
 
 
 class ColorDuration:
+    __slots__ = ("color", "duration")
     MAX_DURATION: Final = 2_550
 
     def __init__(self, color: RGB, duration: int) -> None:
         self.color: Final[RGB] = color
         self.duration: Final[int] = RangeInt(duration, 0, self.MAX_DURATION, "duration")
 
+    @classmethod
+    def trusted(cls, color: RGB, duration: int) -> ColorDuration:
+        """Unchecked, for a duration already known to be in range"""
+        cd = object.__new__(cls)
+        cd.color = color
+        cd.duration = RangeInt.trusted(duration, 0, cls.MAX_DURATION, "duration")
+        return cd
+
     def __repr__(self):
         return "<" + self.__str__() + ">"
 
@@ -26,7 +38,13 @@ class Pattern:
     PATTERN_BUFFER_BYTE_LENGTH: Final = 255 - 2
     MAX_BUFFER_SIZE: Final[int] = (PATTERN_BUFFER_BYTE_LENGTH - 2) // 4
 
-    _pattern: List[ColorDuration]
+    # The transfer buffer is (mode + count + (r, g, b, delay_ms / 10) * count).
+    # It is an array('B') because pyusb hands those to the backend without copying.
+    _COUNT: Final = 1
+    _ENTRIES: Final = 2
+
+    _buffer: array
+    _durations: array
 
     def __new__(cls) -> Any:
         logging.basicConfig(level=logging.INFO)
@@ -34,46 +52,54 @@ class Pattern:
         return super().__new__(cls)
 
     def __init__(self) -> None:
-        self._pattern: List[ColorDuration] = []
+        self._buffer: array = array("B", bytes(1 + self.PATTERN_BUFFER_BYTE_LENGTH))
+        self._buffer[0] = FS_MODE_PATTERN
+        # Exact durations, as the buffer only holds them to DURATION_RESOLUTION
+        self._durations: array = array("H")
 
     def __repr__(self):
         return "<" + self.__str__() + ">"
 
     def __str__(self):
-        string = f"{self.__class__.__name__}[{self._pattern}]"
+        string = f"{self.__class__.__name__}[{self.getPattern()}]"
         return string
 
     def addColorAndDuration(self, color: RGB, duration: int):
-        if len(self._pattern) >= self.MAX_BUFFER_SIZE:
+        count = len(self._durations)
+        if count >= self.MAX_BUFFER_SIZE:
             self.log.warning(f"The max color buffer size is {self.MAX_BUFFER_SIZE}. "
                              f"Not adding new entry ({color}, {duration}).")
             return None
             # raise PatternException(f"The max color buffer size is {self.MAX_BUFFER_SIZE}")
 
-        self._pattern.append(ColorDuration(color, duration))
+        duration = checkRange(duration, 0, ColorDuration.MAX_DURATION, "duration")
+        i = self._ENTRIES + count * 4
+        buffer = self._buffer
+        buffer[i] = color[0]
+        buffer[i + 1] = color[1]
+        buffer[i + 2] = color[2]
+        buffer[i + 3] = round(duration / self.DURATION_RESOLUTION)
+        buffer[self._COUNT] = count + 1
+        self._durations.append(duration)
 
     def getPattern(self) -> List[ColorDuration]:
-        # REF: https://www.geeksforgeeks.org/python-cloning-copying-list/
-        # REF: https://stackoverflow.com/a/22796367/1938889
-        return self._pattern[:]
+        buffer = self._buffer
+        return [ColorDuration.trusted(RGB.trusted(buffer[i], buffer[i + 1], buffer[i + 2]), duration)
+                for i, duration in zip(range(self._ENTRIES, len(buffer), 4), self._durations)]
+
+    def getLastColor(self) -> RGB:
+        i = self._ENTRIES + (len(self._durations) - 1) * 4
+        return RGB.trusted(self._buffer[i], self._buffer[i + 1], self._buffer[i + 2])
 
     def getIntPattern(self) -> List[int]:
-        data: List[int] = [0] * self.PATTERN_BUFFER_BYTE_LENGTH
-        data[0] = len(self._pattern)
-
-        for i, p in enumerate(self._pattern):
-            data[(i*4)+1:(i*4)+4] = [
-                int(p.color.red),
-                int(p.color.green),
-                int(p.color.blue),
-                round(p.duration / self.DURATION_RESOLUTION)
-            ]
-        return data[:]
+        return self._buffer[self._COUNT:].tolist()
 
     def getBytePattern(self) -> bytes:
-        return bytes(self.getIntPattern())
-
-    def __len__(self) -> int:
-        return len(self._pattern)
+        return self._buffer[self._COUNT:].tobytes()
 
+    def getTransferBuffer(self) -> array:
+        """The live buffer with the mode byte in front, ready for sendControlTransfer()"""
+        return self._buffer
 
+    def __len__(self) -> int:
+        return len(self._durations)
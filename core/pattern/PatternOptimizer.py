@@ -0,0 +1,83 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import threading
+from typing import Iterable, Iterator, Tuple
+
+from core.pattern.Pattern import ColorDuration, Pattern
+from utils.Types import RGB
+
+
+class PatternOptimizer:
+    """
+    Shrinks patterns without changing what the stick shows. Consecutive
+    entries of the same color, which is what a fade's sub-LSB steps round
+    to, become one entry holding their summed duration. Zero-length
+    entries that are followed by another are never seen, so they go too.
+    Keeps a running compression ratio of the patterns it has seen.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.patterns: int = 0
+        self.entries_in: int = 0
+        self.entries_out: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Entries in per entry sent, 1.0 until something was compressed"""
+        return self.entries_in / self.entries_out if self.entries_out else 1.0
+
+    @staticmethod
+    def merge(steps: Iterable[Tuple[RGB, int]]) -> Iterator[Tuple[RGB, int]]:
+        """Merge runs of one color, splitting holds longer than one entry can express"""
+        color = None
+        duration = 0
+        for next_color, next_duration in PatternOptimizer._visible(steps):
+            if next_color == color:
+                duration += next_duration
+                continue
+            if color is not None:
+                yield from PatternOptimizer._hold(color, duration)
+            # Plain ints, as a RangeInt sum is checked against its own range
+            color, duration = next_color, int(next_duration)
+        if color is not None:
+            yield from PatternOptimizer._hold(color, duration)
+
+    @classmethod
+    def build(cls, steps: Iterable[Tuple[RGB, int]]) -> Pattern:
+        pattern = Pattern()
+        for color, duration in cls.merge(steps):
+            pattern.addColorAndDuration(color, duration)
+        return pattern
+
+    def compress(self, pattern: Pattern) -> Pattern:
+        compressed = self.build((cd.color, cd.duration) for cd in pattern.getPattern())
+        self.record(len(pattern), len(compressed))
+        return compressed
+
+    def record(self, entries_in: int, entries_out: int) -> None:
+        with self._lock:
+            self.patterns += 1
+            self.entries_in += entries_in
+            self.entries_out += entries_out
+
+    # Internals #
+
+    @staticmethod
+    def _visible(steps: Iterable[Tuple[RGB, int]]) -> Iterator[Tuple[RGB, int]]:
+        pending = None
+        for step in steps:
+            if pending is not None and pending[1]:
+                yield pending
+            pending = step
+        if pending is not None:
+            # The last entry is held after the pattern drains, however short
+            yield pending
+
+    @staticmethod
+    def _hold(color: RGB, duration: int) -> Iterator[Tuple[RGB, int]]:
+        while duration > ColorDuration.MAX_DURATION:
+            yield color, ColorDuration.MAX_DURATION
+            duration -= ColorDuration.MAX_DURATION
+        yield color, duration
@@ -0,0 +1,98 @@
+#  Copyright (c) Eric Draken, 2021.
+from typing import List
+from unittest import TestCase
+
+from core.pattern.GradientEngine import GradientEngine
+from core.pattern.Pattern import ColorDuration, Pattern
+from core.pattern.PatternOptimizer import PatternOptimizer
+from utils.Colors import RED, GREEN, BLUE, OFF
+from utils.Types import RGB
+
+
+def timeline(pattern: Pattern) -> List[RGB]:
+    """The color shown in each millisecond, then the color held once the pattern drains"""
+    shown = []
+    for cd in pattern.getPattern():
+        shown.extend([cd.color] * cd.duration)
+    return shown + [pattern.getLastColor()]
+
+
+def build(*steps) -> Pattern:
+    pattern = Pattern()
+    for color, duration in steps:
+        pattern.addColorAndDuration(color, duration)
+    return pattern
+
+
+class TestPatternOptimizer(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.optimizer = PatternOptimizer()
+
+    def test_merge_repeats(self):
+        pattern = build((RED, 100), (RED, 100), (GREEN, 50), (GREEN, 50), (RED, 10))
+        compressed = self.optimizer.compress(pattern)
+        self.assertEqual([(RED, 200), (GREEN, 100), (RED, 10)],
+                         [(cd.color, cd.duration) for cd in compressed.getPattern()])
+        self.assertEqual(timeline(pattern), timeline(compressed))
+
+    def test_merge_capped(self):
+        pattern = build(*[(BLUE, 1000)] * 6)
+        compressed = self.optimizer.compress(pattern)
+        self.assertEqual([ColorDuration.MAX_DURATION, ColorDuration.MAX_DURATION, 900],
+                         [cd.duration for cd in compressed.getPattern()])
+        self.assertEqual(timeline(pattern), timeline(compressed))
+
+    def test_drop_unseen(self):
+        # A zero-length entry is never shown unless it is the one held at the end
+        pattern = build((RED, 100), (BLUE, 0), (RED, 100), (OFF, 0))
+        compressed = self.optimizer.compress(pattern)
+        self.assertEqual([(RED, 200), (OFF, 0)], [(cd.color, cd.duration) for cd in compressed.getPattern()])
+        self.assertEqual(timeline(pattern), timeline(compressed))
+
+    def test_narrow_fade(self):
+        pattern = build(*GradientEngine._morphSteps(RGB(10, 245, 0), RGB(12, 243, 0), Pattern.MAX_BUFFER_SIZE, 2480))
+        compressed = self.optimizer.compress(pattern)
+        self.assertLessEqual(len(compressed), 4)
+        self.assertEqual(timeline(pattern), timeline(compressed))
+        self.assertEqual(self.optimizer.ratio, Pattern.MAX_BUFFER_SIZE / len(compressed))
+
+    def test_ratio(self):
+        self.assertEqual(1.0, self.optimizer.ratio)
+        self.optimizer.compress(build((RED, 10), (RED, 10), (RED, 10), (RED, 10)))
+        self.optimizer.compress(build((RED, 10), (GREEN, 10)))
+        self.assertEqual(2, self.optimizer.patterns)
+        self.assertEqual(2.0, self.optimizer.ratio)
+
+
+class TestKeyframes(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.engine = GradientEngine(cache_size=4)
+
+    def test_narrow_fade_at_full_resolution(self):
+        start, end = RGB(10, 245, 0), RGB(12, 243, 0)
+        keyframes = self.engine.keyframePattern(start, end, 1000)
+        # Every 10 ms step of the fade, in a handful of entries
+        fine = GradientEngine._morphSteps(start, end, 100, 1000)
+        self.assertEqual(timeline(PatternOptimizer.build(fine)), timeline(keyframes))
+        self.assertLessEqual(len(keyframes), 4)
+        self.assertEqual(100 / len(keyframes), self.engine.optimizer.ratio)
+
+    def test_wide_fade_fits(self):
+        keyframes = self.engine.keyframePattern(GREEN, RED, 2000)
+        self.assertLessEqual(len(keyframes), Pattern.MAX_BUFFER_SIZE)
+        self.assertEqual(RED, keyframes.getLastColor())
+        self.assertAlmostEqual(2000, sum(cd.duration for cd in keyframes.getPattern()), delta=50)
+
+    def test_max_entries(self):
+        keyframes = self.engine.keyframePattern(GREEN, RED, 1000, 8)
+        self.assertLessEqual(len(keyframes), 8)
+        self.assertEqual(RED, keyframes.getLastColor())
+
+    def test_short_fade(self):
+        keyframes = self.engine.keyframePattern(GREEN, RED, 5)
+        self.assertEqual([(RED, 5)], [(cd.color, cd.duration) for cd in keyframes.getPattern()])
+
+    def test_cached(self):
+        self.assertIs(self.engine.keyframePattern(GREEN, BLUE, 500), self.engine.keyframePattern(GREEN, BLUE, 500))
@@ -0,0 +1,100 @@
+#  Copyright (c) Eric Draken, 2021.
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Final, Iterable, Iterator, Optional, Tuple, Union
+
+from core.pattern.Pattern import ColorDuration, Pattern
+from core.pattern.PatternOptimizer import PatternOptimizer
+from utils.Types import RGB
+
+Step = Union[ColorDuration, Tuple[RGB, int]]
+
+
+class PatternStreamer:
+    """
+    Plays animations of any length on a FadeStick, one device buffer at a
+    time. A new pattern replaces the running one, so each chunk is sent
+    only once the previous one has drained: the streamer sleeps until just
+    before the predicted end, then polls the pattern buffer, which the
+    firmware returns empty while a pattern is still running.
+    """
+    MAX_STEPS: Final = Pattern.MAX_BUFFER_SIZE
+
+    def __init__(self, fs, lead_ms: int = 20, poll_ms: int = 2,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        """
+        :param fs: The FadeStick to play on
+        :param lead_ms: Start polling this long before a chunk is predicted to end
+        :param poll_ms: Delay between polls of the pattern buffer
+        """
+        self._fs = fs
+        self.lead_s: Final = lead_ms / 1000.0
+        self.poll_s: Final = poll_ms / 1000.0
+        self._clock = clock
+        self._sleep = sleep
+        self.uploads: int = 0
+        self.polls: int = 0
+
+    @staticmethod
+    def steps(animation: Iterable[Step]) -> Iterator[Tuple[RGB, int]]:
+        """Normalize steps, merging repeats and splitting holds longer than one entry can express"""
+        return PatternOptimizer.merge(
+            (step.color, step.duration) if isinstance(step, ColorDuration) else step for step in animation)
+
+    @classmethod
+    def chunks(cls, animation: Iterable[Step]) -> Iterator[Pattern]:
+        """Split an animation, lazily, into patterns that each fit the device buffer"""
+        pattern = Pattern()
+        for color, duration in cls.steps(animation):
+            if len(pattern) == cls.MAX_STEPS:
+                yield pattern
+                pattern = Pattern()
+            pattern.addColorAndDuration(color, duration)
+        if len(pattern):
+            yield pattern
+
+    @staticmethod
+    def deviceDuration(pattern: Pattern) -> float:
+        """Seconds the device takes to play a pattern, at its 10 ms resolution"""
+        # count, then (r, g, b, duration / 10) per entry
+        units = pattern.getIntPattern()[4::4][:len(pattern)]
+        return sum(units) * Pattern.DURATION_RESOLUTION / 1000.0
+
+    def play(self, animation: Iterable[Step], stop: Optional[threading.Event] = None) -> int:
+        """
+        Stream an animation and return once its last chunk is on the device.
+        The animation may be a generator of any length.
+        :param stop: Abandon the animation early when set
+        :return: The number of chunks sent
+        """
+        sent = 0
+        ends_at = self._clock()
+        for pattern in self.chunks(animation):
+            if sent:
+                self._awaitDrain(ends_at, stop)
+            if stop and stop.is_set():
+                break
+            self._fs._sendPattern(pattern)
+            ends_at = self._clock() + self.deviceDuration(pattern)
+            self.uploads += 1
+            sent += 1
+        return sent
+
+    # Internals #
+
+    def _awaitDrain(self, ends_at: float, stop: Optional[threading.Event]) -> None:
+        wait = ends_at - self.lead_s - self._clock()
+        if wait > 0:
+            if stop:
+                stop.wait(wait)
+            else:
+                self._sleep(wait)
+        # An empty buffer means the pattern is still running
+        while not (stop and stop.is_set()):
+            self.polls += 1
+            if len(self._fs._get_buffer_bytes()):
+                return
+            self._sleep(self.poll_s)
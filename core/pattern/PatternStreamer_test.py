@@ -0,0 +1,80 @@
+#  Copyright (c) Eric Draken, 2021.
+from unittest import TestCase
+
+from core.FadeStick import FadeStick
+from core.FadeStickUSB import setBackend, findFirstFadeStick
+from core.emulator.FadeStickEmulator import EmulatedFadeStick, EmulatorBackend
+from core.emulator.ClockEmulator import EmulatedClock
+from core.pattern.Pattern import ColorDuration, Pattern
+from core.pattern.PatternStreamer import PatternStreamer
+from utils.Types import RGB
+
+
+class RecordingFadeStick(EmulatedFadeStick):
+    """Records when each pattern arrives and whether it cut the previous one short"""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.uploads = []
+
+    def _writePattern(self, data: bytes) -> int:
+        self.uploads.append((self._clock(), bool(self._pattern)))
+        return super()._writePattern(data)
+
+
+def rainbow(steps: int, duration: int = 100):
+    for n in range(steps):
+        yield RGB(n % 256, 255 - n % 256, 0), duration
+
+
+class TestPatternStreamer(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = EmulatedClock(100.0)
+        self.emulator = RecordingFadeStick(clock=self.clock, sleep=self.clock.sleep, latency_ms=1)
+        self.previous = setBackend(EmulatorBackend([self.emulator]))
+        self.device = FadeStick(findFirstFadeStick())
+        self.streamer = PatternStreamer(self.device, clock=self.clock, sleep=self.clock.sleep)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        setBackend(self.previous)
+
+    def test_chunks(self):
+        chunks = list(PatternStreamer.chunks(rainbow(150)))
+        self.assertEqual([Pattern.MAX_BUFFER_SIZE, Pattern.MAX_BUFFER_SIZE, 150 - 2 * Pattern.MAX_BUFFER_SIZE],
+                         [len(c) for c in chunks])
+
+    def test_long_hold_is_split(self):
+        steps = list(PatternStreamer.steps([ColorDuration(RGB(1, 2, 3), 2000), (RGB(4, 5, 6), 6000)]))
+        self.assertEqual([2000, 2550, 2550, 900], [d for _, d in steps])
+
+    def test_device_duration(self):
+        pattern = Pattern()
+        pattern.addColorAndDuration(RGB(0, 0, 0), 104)
+        pattern.addColorAndDuration(RGB(0, 0, 0), 2550)
+        self.assertAlmostEqual(2.65, PatternStreamer.deviceDuration(pattern))
+
+    def test_gapless(self):
+        start = self.clock.now
+        self.assertEqual(3, self.streamer.play(rainbow(150)))
+        self.assertEqual(3, self.streamer.uploads)
+
+        # No chunk replaced one that was still playing
+        self.assertEqual([False] * 3, [cut for _, cut in self.emulator.uploads])
+        # Each chunk followed the previous one within a few polls
+        for (previous, _), (upload, _) in zip(self.emulator.uploads, self.emulator.uploads[1:]):
+            self.assertAlmostEqual(Pattern.MAX_BUFFER_SIZE * 0.1, upload - previous, delta=0.02)
+
+        # The last chunk is on the device, and the stick knows where it ends
+        self.assertLess(self.clock.now - start, 2 * Pattern.MAX_BUFFER_SIZE * 0.1 + 0.05)
+        self.assertEqual(RGB(149, 106, 0), self.device.getColor())
+
+    def test_few_polls(self):
+        self.streamer.play(rainbow(4 * Pattern.MAX_BUFFER_SIZE))
+        # Polling only starts lead_ms before each predicted end
+        self.assertLess(self.streamer.polls, 3 * 20)
+
+    def test_fits_one_buffer(self):
+        self.assertEqual(1, self.device.play(rainbow(10)))
+        self.assertEqual(0, self.streamer.polls)
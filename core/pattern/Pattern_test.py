@@ -2,6 +2,7 @@
 from typing import Final
 from unittest import TestCase
 
+from constants.FadeStickConsts import FS_MODE_PATTERN
 from core.pattern.Pattern import ColorDuration, Pattern
 from exceptions.NumberExceptions import RangeIntException
 from utils.Colors import colorToRGB
@@ -103,3 +104,35 @@ class TestPattern(TestCase):
         p = Pattern()
         p.addColorAndDuration(self.red, 4)
         self.assertEqual([1, 255, 0, 0, 0], p.getIntPattern()[:5])
+
+    def test_get_byte_pattern(self):
+        p = Pattern()
+        p.addColorAndDuration(self.red, 100)
+        self.assertEqual(bytes(p.getIntPattern()), p.getBytePattern())
+
+    def test_get_transfer_buffer(self):
+        p = Pattern()
+        p.addColorAndDuration(self.green, 2550)
+        buffer = p.getTransferBuffer()
+        self.assertEqual(1 + Pattern.PATTERN_BUFFER_BYTE_LENGTH, len(buffer))
+        self.assertEqual([FS_MODE_PATTERN, 1, 0, 255, 0, 255], buffer[:6].tolist())
+
+    def test_get_transfer_buffer_in_place(self):
+        p = Pattern()
+        buffer = p.getTransferBuffer()
+        p.addColorAndDuration(self.blue, 10)
+        self.assertIs(buffer, p.getTransferBuffer())
+        self.assertEqual([1, 0, 0, 255, 1], buffer[1:6].tolist())
+
+    def test_get_last_color(self):
+        p = Pattern()
+        p.addColorAndDuration(self.red, 100)
+        p.addColorAndDuration(self.blue, 100)
+        self.assertEqual(self.blue, p.getLastColor())
+
+    def test_bad_duration_not_added(self):
+        p = Pattern()
+        with self.assertRaises(RangeIntException):
+            p.addColorAndDuration(self.red, ColorDuration.MAX_DURATION + 1)
+        self.assertEqual(0, len(p))
+        self.assertEqual([0] * Pattern.PATTERN_BUFFER_BYTE_LENGTH, p.getIntPattern())
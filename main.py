@@ -1,15 +1,18 @@
 #  Copyright (c) Eric Draken, 2021.
+import logging
 import os
 import sys
-from typing import Final, Union
+from typing import Union
 
-from core.CPUDaemon import CPUDaemon
 from exceptions.FadeStickException import FadeStickException
 
 if sys.platform == "win32":
     raise FadeStickException("Windows is not supported")
 
-daemon: Final = CPUDaemon()
+# Commands that only talk to a running daemon or read its files. They
+# skip importing CPUDaemon, with python-daemon, pyusb and its syslog
+# connection.
+CLIENT_COMMANDS = ("stop", "kill", "status", "metrics", "set-period", "history")
 
 
 def print_if_not_none(msg: Union[str, None]):
@@ -17,21 +20,41 @@ def print_if_not_none(msg: Union[str, None]):
         print(msg)
 
 
+def client():
+    from core.DaemonClient import DaemonClient
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(logging.WARNING)
+    logging.getLogger("main").addHandler(console)
+    return DaemonClient()
+
+
+def daemon():
+    from core.CPUDaemon import CPUDaemon
+    return CPUDaemon()
+
+
 def main():
     filename = os.path.basename(sys.argv[0])
     cmd = None if len(sys.argv) <= 1 else str(sys.argv[1]).strip().lower()
     if cmd == "start":
         print("Starting daemon.")
-        print_if_not_none(daemon.start())
+        print_if_not_none(daemon().start())
     elif cmd == "stop":
-        print_if_not_none(daemon.stop())
+        print_if_not_none(client().stop())
     elif cmd == "kill":
-        print_if_not_none(daemon.kill())
+        print_if_not_none(client().kill())
     elif cmd == "restart":
         print("Restarting daemon.")
-        print_if_not_none(daemon.restart())
+        print_if_not_none(daemon().restart())
     elif cmd == "status":
-        print_if_not_none(daemon.status())
+        print_if_not_none(client().status())
+    elif cmd == "metrics":
+        print_if_not_none(client().metrics())
+    elif cmd == "set-period" and len(sys.argv) > 2 and sys.argv[2].isdigit():
+        print_if_not_none(client().set_period(int(sys.argv[2])))
+    elif cmd == "history":
+        from core.RecordReader import main as history
+        return history(sys.argv[2:])
     else:
         print(f"Usage: {filename} [action]")
         print("    start     : Start the daemon")
@@ -39,6 +62,9 @@ def main():
         print("    kill      : Kill the daemon")
         print("    restart   : Restart the daemon")
         print("    status    : Get the daemon status")
+        print("    metrics   : Get the daemon metrics")
+        print("    set-period [ms] : Set the sampling period")
+        print("    history [--since T] [--until T] [--errors] [--summary] : Show recorded ticks")
         return 1
 
 
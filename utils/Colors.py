@@ -42,20 +42,14 @@ def hexToRGB(hex_str: str) -> RGB:
     return RGB(int(hex_lower[0:2], 16), int(hex_lower[2:4], 16), int(hex_lower[4:6], 16))
 
 def intsToRGB(red: int = 0, green: int = 0, blue: int = 0) -> RGB:
-    if not all([
-        0 <= red <= 255,
-        0 <= green <= 255,
-        0 <= blue <= 255,
-    ]):
-        raise FadeStickColorException(f"One ore more colors are "
-                                      f"below 0 or above 255. Given {red}, {green}, {blue}.")
+    # RGB raises FadeStickColorException itself
     return RGB(red, green, blue)
 
 def colorToRGB(color: str) -> RGB:
     return hexToRGB(colorToHex(color))
 
 def invertRGB(rgb: RGB) -> RGB:
-    return RGB(255 - rgb.red, 255 - rgb.green, 255 - rgb.blue)
+    return RGB.trusted(255 - rgb.red, 255 - rgb.green, 255 - rgb.blue)
 
 def scaleToRGB(value: float, minIsGreen: bool = True, minScale: float = 0.0, maxScale: float = 1.0) -> RGB:
     boundedValue = min(maxScale, max(minScale, value))
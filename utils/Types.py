@@ -1,5 +1,5 @@
 #  Copyright (c) Eric Draken, 2021.
-from typing import NamedTuple, Any, Final
+from typing import NamedTuple
 from usb.core import Device
 
 # Assignment over alias preferred for export
@@ -9,39 +9,50 @@ from exceptions.NumberExceptions import RangeIntException
 USBDevice = Device
 
 class RGB(NamedTuple("RGB", [("red", int), ("green", int), ("blue", int)])):
+    __slots__ = ()
+
     def __new__(cls, red, green, blue):
-        if not all([
-            0 <= red <= 255,
-            0 <= green <= 255,
-            0 <= blue <= 255,
-        ]):
+        if not (0 <= red <= 255 and 0 <= green <= 255 and 0 <= blue <= 255):
             raise FadeStickColorException(f"One ore more colors are "
                                           f"below 0 or above 255. Given {red}, {green}, {blue}.")
-        # noinspection PyArgumentList
-        return super().__new__(cls, int(red), int(green), int(blue))
+        return tuple.__new__(cls, (int(red), int(green), int(blue)))
+
+    @classmethod
+    def trusted(cls, red: int, green: int, blue: int) -> "RGB":
+        """Unchecked, for ints already known to be 0 - 255, such as device bytes"""
+        return tuple.__new__(cls, (red, green, blue))
+
+
+def checkRange(val: int, min: int, max: int, nice_name: str) -> int:
+    """What RangeInt checks, returning a plain int, for hot paths that need no wrapper"""
+    _val = int(val)
+    if not min < max:
+        raise RangeIntException(f"{nice_name} has "
+                                f"a bad range [{int(min)}..{int(max)}]: {_val}")
+    if not min <= _val <= max:
+        raise RangeIntException(f"{nice_name} is "
+                                f"out of range [{int(min)}..{int(max)}]: {_val}")
+    return _val
 
 
 class RangeInt(int):
-    def __init__(self, val: int, min: int, max: int, nice_name: str) -> None:
-        self._min: int = min
-        self._max: int = max
-        self._nice_name: str = nice_name
-        self._val: Final[int] = val
-
-    def __new__(cls, *value):
-        _val = int(value[0])
-        _min = int(value[1])
-        _max = int(value[2])
-        _nice_name = str(value[3])
-
-        if not _min < _max:
-            raise RangeIntException(f"{_nice_name} has "
-                                    f"a bad range [{_min}..{_max}]: {_val}")
-
-        if not _min <= _val <= _max:
-            raise RangeIntException(f"{_nice_name} is "
-                                    f"out of range [{_min}..{_max}]: {_val}")
-        return int.__new__(cls, _val)
+    _min: int
+    _max: int
+    _nice_name: str
+    _val: int
+
+    def __new__(cls, val: int, min: int, max: int, nice_name: str):
+        return cls.trusted(checkRange(val, min, max, nice_name), min, max, nice_name)
+
+    @classmethod
+    def trusted(cls, val: int, min: int, max: int, nice_name: str) -> "RangeInt":
+        """Unchecked, for a val already known to be within [min..max]"""
+        self = int.__new__(cls, val)
+        self._min = min
+        self._max = max
+        self._nice_name = nice_name
+        self._val = val
+        return self
 
     def __add__(self, val: int):
         if isinstance(val, RangeInt):
@@ -58,4 +69,3 @@ class RangeInt(int):
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self._nice_name}, [{self._min}..{self._max}]: {self._val})"
-
@@ -4,7 +4,7 @@ from unittest import TestCase
 
 from exceptions.FadeStickColorException import FadeStickColorException
 from exceptions.NumberExceptions import RangeIntException
-from utils.Types import RGB, RangeInt
+from utils.Types import RGB, RangeInt, checkRange
 
 
 class TestRGB(TestCase):
@@ -41,6 +41,20 @@ class TestRGB(TestCase):
         with self.assertRaises(FadeStickColorException):
             RGB(0, 0, 256)
 
+    def test_float(self):
+        self.assertEqual((1, 2, 3), RGB(1.5, 2.0, 3.9))
+        self.assertIs(int, type(RGB(1.5, 2.0, 3.9).red))
+
+    def test_trusted(self):
+        rgb = RGB.trusted(1, 2, 3)
+        self.assertIs(RGB, type(rgb))
+        self.assertEqual(RGB(1, 2, 3), rgb)
+        self.assertEqual(3, rgb.blue)
+
+    def test_no_dict(self):
+        with self.assertRaises(AttributeError):
+            RGB(1, 2, 3).alpha = 0
+
 
 class TestRangeInt(TestCase):
     def test_simple(self):
@@ -84,3 +98,25 @@ class TestRangeInt(TestCase):
     def test_repr(self):
         self.assertEqual(f"{'RangeInt'}({'test'}, [{0}..{255}]: {1})"
                          , repr(RangeInt(1, 0, 255, "test")))
+
+    def test_add(self):
+        self.assertEqual(3, RangeInt(1, 0, 255, "test") + RangeInt(2, 0, 255, "test"))
+        with self.assertRaises(RangeIntException):
+            RangeInt(200, 0, 255, "test") + RangeInt(100, 0, 255, "test")
+
+    def test_trusted(self):
+        self.assertEqual(repr(RangeInt(1, 0, 255, "test")), repr(RangeInt.trusted(1, 0, 255, "test")))
+
+
+class TestCheckRange(TestCase):
+    def test_simple(self):
+        self.assertIs(int, type(checkRange(1.0, 0, 255, "test")))
+        self.assertEqual(1, checkRange(1.0, 0, 255, "test"))
+
+    def test_same_errors(self):
+        for args in ((-1, 0, 255, "test"), (0, 0, 0, "test")):
+            with self.assertRaises(RangeIntException) as expected:
+                RangeInt(*args)
+            with self.assertRaises(RangeIntException) as actual:
+                checkRange(*args)
+            self.assertEqual(str(expected.exception), str(actual.exception))